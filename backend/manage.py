@@ -0,0 +1,95 @@
+"""Maintenance commands for the SubTrack backend.
+
+Usage:
+    python manage.py restore --user default
+    python manage.py seed --subscriptions 1000000 --seed 42
+"""
+
+import asyncio
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import typer
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from utils.backups import request_full_backup, restore_backup
+from utils.budgets import invalidate_budgets
+from utils.constants import BACKUP_DIR_NAME, DEFAULT_USER_ID
+from utils.export_cache import bump_data_version
+from utils.seeding import seed_data
+from utils.tenancy import user_scope
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+cli = typer.Typer(help="Wartungsbefehle für den Abo-Tracker")
+
+
+def _connect():
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    return client, client[os.environ.get('DB_NAME', 'subscription_tracker')]
+
+
+@cli.command()
+def restore(
+    user: str = typer.Option(DEFAULT_USER_ID, help="Benutzer, dessen Daten ersetzt werden"),
+    directory: Path = typer.Option(
+        Path(os.environ.get('BACKUP_DIR', ROOT_DIR / BACKUP_DIR_NAME)),
+        help="Sicherungsverzeichnis"
+    ),
+    until: Optional[datetime] = typer.Option(None, help="Nur Sicherungen bis zu diesem Zeitpunkt (UTC)")
+):
+    """Restore a user's data from the latest full backup plus incrementals."""
+    async def run():
+        client, db = _connect()
+        try:
+            return await restore_backup(db, directory, user, until)
+        finally:
+            client.close()
+
+    try:
+        counts = asyncio.run(run())
+    except FileNotFoundError as e:
+        typer.echo(str(e), err=True)
+        raise typer.Exit(code=1)
+    typer.echo(
+        f"{counts['snapshots']} Sicherung(en) eingespielt: "
+        f"{counts['subscriptions']} Abonnements, {counts['expenses']} Fixkosten"
+    )
+
+
+@cli.command()
+def seed(
+    subscriptions: int = typer.Option(1000, min=0, help="Anzahl Abonnements"),
+    expenses: int = typer.Option(0, min=0, help="Anzahl Fixkosten"),
+    user: str = typer.Option(DEFAULT_USER_ID, help="Benutzer, dem die Daten gehören"),
+    rng_seed: Optional[int] = typer.Option(None, "--seed", help="Startwert des Zufallsgenerators"),
+    clear: bool = typer.Option(True, help="Vorhandene Abonnements und Fixkosten des Benutzers löschen")
+):
+    """Generate synthetic subscriptions and expenses for load tests."""
+    async def run():
+        client, db = _connect()
+        try:
+            counts = await seed_data(db, user, subscriptions, expenses, seed=rng_seed, clear=clear)
+            await bump_data_version(db, user)
+            await invalidate_budgets(db, user)
+            with user_scope(user):
+                await request_full_backup(db)
+            return counts
+        finally:
+            client.close()
+
+    started = time.monotonic()
+    counts = asyncio.run(run())
+    typer.echo(
+        f"{counts['subscriptions']} Abonnements und {counts['expenses']} Fixkosten "
+        f"in {time.monotonic() - started:.1f} s angelegt"
+    )
+
+
+if __name__ == "__main__":
+    cli()
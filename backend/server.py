@@ -1,17 +1,21 @@
-from fastapi import FastAPI, APIRouter, HTTPException, UploadFile, File, Request
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, APIRouter, HTTPException, UploadFile, File, Request, Response, Depends, Header, Query
+from fastapi.responses import JSONResponse, StreamingResponse, FileResponse
+from starlette.background import BackgroundTask
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import asyncio
 import logging
 import json
 import csv
 import io
+import gzip
+import re
 from pathlib import Path
 from pydantic import BaseModel, Field, field_validator
-from typing import List, Optional, Dict, Any
-from datetime import datetime, timedelta
+from typing import List, Optional, Dict, Any, AsyncIterator, Callable, Awaitable, Tuple
+from datetime import date, datetime, timedelta
 from bson import ObjectId
 from enum import Enum
 
@@ -21,6 +25,8 @@ from utils.errors import (
     ValidationError,
     NotFoundError,
     DatabaseError,
+    ConflictError,
+    PermissionDeniedError,
     subtrack_exception_handler,
     http_exception_handler,
     general_exception_handler,
@@ -35,12 +41,100 @@ from utils.validators import (
     sanitize_string
 )
 from utils.database import (
+    safe_find_one,
     safe_find_one_or_404,
     safe_insert_one,
-    safe_update_one,
+    safe_insert_many,
+    safe_upsert_one,
+    safe_find_one_and_update,
     safe_delete_one,
+    safe_find_one_and_delete,
+    safe_delete_many,
     safe_find
 )
+from utils.tenancy import current_user_id, set_current_user, resolve_user_id
+from utils.indexes import assign_unowned_documents, ensure_indexes
+from utils.scheduler import PeriodicTask
+from utils.backups import BackupManager, record_deletion, request_full_backup
+from utils.price_history import (
+    record_price_change,
+    get_price_history,
+    find_price_increases,
+    change_percent
+)
+from utils.analytics import category_totals
+from utils.columnar import KINDS, ColumnarStore
+from utils.currency import FxRates, display_currency, load_display_currency
+from utils.budgets import (
+    OVERALL,
+    apply_item_change,
+    budget_status,
+    describe_budget,
+    invalidate_budgets,
+    recent_alerts,
+    recompute_budgets
+)
+from utils.arrow_export import FORMATS as COLUMNAR_EXPORT_FORMATS, stream_export
+from utils.export_cache import ExportCache, bump_data_version, data_version
+from utils.negotiation import CompressionMiddleware, NegotiatedResponse, accepts_encoding, negotiate_format
+from utils.logs import RequestIdMiddleware, configure_logging
+from utils.slow_queries import slow_query_log
+from utils.trends import choose_granularity, spending_trend, take_daily_snapshots
+from utils.notifications import (
+    NotificationDispatcher,
+    WebhookSink,
+    due_notifications,
+    serialize_outbox_entry
+)
+from utils.idempotency import request_fingerprint, run_idempotent
+from utils.ratelimit import (
+    ConcurrencyLimiter,
+    MemoryRateLimitStore,
+    MongoRateLimitStore,
+    RateLimiter,
+    client_address,
+    parse_networks,
+)
+from utils.seeding import seed_data
+from utils.dedupe import (
+    EXPENSE_HASHED_FIELDS,
+    HASHED_FIELDS,
+    dedupe_fields,
+    existing_hashes,
+    find_near_duplicates,
+    split_duplicates
+)
+from utils.reset import fast_reset, purge_trash
+from utils.migrations import run_migrations
+from utils.orphans import sweep_orphaned_notification_settings
+from utils.events import ChangeEventBroker, format_sse
+from utils.singleflight import SingleFlight
+from utils.jobs import JobManager, JobContext, JobStatus, purge_job_files, serialize_job
+from utils.constants import (
+    SSE_KEEPALIVE_SECONDS,
+    IMPORT_BATCH_SIZE,
+    EXPORT_DIR_NAME,
+    JOB_SPOOL_DIR_NAME,
+    JOB_FILE_PURGE_INTERVAL_SECONDS,
+    EXPORT_CACHE_DIR_NAME,
+    READ_CACHE_TTL_SECONDS,
+    BACKUP_DIR_NAME,
+    BACKUP_CHECK_INTERVAL_SECONDS,
+    SNAPSHOT_CHECK_INTERVAL_SECONDS,
+    DEFAULT_NOTIFICATION_DAYS,
+    NOTIFICATION_CHECK_INTERVAL_SECONDS,
+    RATE_LIMITS,
+    HEAVY_CONCURRENCY,
+    SEED_MAX_DOCUMENTS,
+    TRASH_PURGE_INTERVAL_SECONDS,
+    VERSION_CONFLICT_ATTEMPTS,
+    ORPHAN_SWEEP_INTERVAL_SECONDS,
+    SLOW_QUERY_THRESHOLD_MS,
+    DEFAULT_CURRENCY,
+    FX_RATES_FILE_NAME,
+    DEFAULT_BUDGET_THRESHOLDS,
+    MAX_BUDGET_ALERTS
+)
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -50,6 +144,125 @@ mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ.get('DB_NAME', 'subscription_tracker')]
 
+# Shared change stream watcher feeding /api/events
+change_broker = ChangeEventBroker(db)
+
+# Background jobs for long-running import, export and reset operations
+EXPORT_DIR = Path(os.environ.get('EXPORT_DIR', ROOT_DIR / EXPORT_DIR_NAME))
+JOB_SPOOL_DIR = Path(os.environ.get('JOB_SPOOL_DIR', ROOT_DIR / JOB_SPOOL_DIR_NAME))
+job_manager = JobManager(db.jobs, JOB_SPOOL_DIR)
+
+# Export files are reused until the user's data version changes
+export_cache = ExportCache(Path(os.environ.get('EXPORT_CACHE_DIR', ROOT_DIR / EXPORT_CACHE_DIR_NAME)))
+
+# Exchange rates for totals in the display currency, reloaded when the file changes
+fx_rates = FxRates(Path(os.environ.get('FX_RATES_FILE', ROOT_DIR / FX_RATES_FILE_NAME)))
+
+# Scheduled full and incremental backups following AppSettings.backup_interval
+BACKUP_DIR = Path(os.environ.get('BACKUP_DIR', ROOT_DIR / BACKUP_DIR_NAME))
+backup_manager = BackupManager(db, BACKUP_DIR)
+backup_task = PeriodicTask(
+    "backups",
+    BACKUP_CHECK_INTERVAL_SECONDS,
+    lambda: backup_manager.run_due(),
+    initial_delay=60
+)
+
+# Daily per-category spending snapshots feeding /api/analytics/trend
+snapshot_task = PeriodicTask(
+    "spending-snapshots",
+    SNAPSHOT_CHECK_INTERVAL_SECONDS,
+    lambda: take_daily_snapshots(db, fx_rates.table()),
+    initial_delay=30
+)
+
+# Renewal reminders delivered through an outbox when a webhook is configured
+NOTIFICATION_WEBHOOK_URL = os.environ.get('NOTIFICATION_WEBHOOK_URL')
+notification_task = None
+if NOTIFICATION_WEBHOOK_URL:
+    notification_dispatcher = NotificationDispatcher(db, WebhookSink(NOTIFICATION_WEBHOOK_URL))
+    notification_task = PeriodicTask(
+        "notifications",
+        NOTIFICATION_CHECK_INTERVAL_SECONDS,
+        notification_dispatcher.run,
+        initial_delay=45
+    )
+
+# Collections emptied by a factory reset, with their names for error
+# messages; renamed-away copies are dropped later
+RESET_COLLECTIONS = {
+    "subscriptions": "Abonnements",
+    "expenses": "Fixkosten",
+    "notification_settings": "Benachrichtigungseinstellungen",
+    "notification_outbox": "Erinnerungen",
+    "price_history": "Preisverlauf",
+    "spending_snapshots": "Verlauf",
+    "budgets": "Budgets",
+    "alerts": "Budgetwarnungen",
+}
+trash_task = PeriodicTask(
+    "trash",
+    TRASH_PURGE_INTERVAL_SECONDS,
+    lambda: purge_trash(db)
+)
+
+# Finished export files and inputs of crashed jobs are deleted after a day
+job_files_task = PeriodicTask(
+    "job-files",
+    JOB_FILE_PURGE_INTERVAL_SECONDS,
+    lambda: asyncio.to_thread(purge_job_files, [EXPORT_DIR, JOB_SPOOL_DIR])
+)
+
+# Removes notification settings whose subscription no longer exists
+orphan_task = PeriodicTask(
+    "orphan-sweeper",
+    ORPHAN_SWEEP_INTERVAL_SECONDS,
+    lambda: sweep_orphaned_notification_settings(db),
+    initial_delay=120
+)
+
+# Concurrent identical reads of expensive endpoints share one computation
+read_coalescer = SingleFlight(
+    cache_ttl=float(os.environ.get('READ_CACHE_TTL', READ_CACHE_TTL_SECONDS))
+)
+
+# COLUMNAR_ANALYTICS=true answers analytics from in-memory columnar snapshots
+columnar_store = ColumnarStore(db) if os.environ.get('COLUMNAR_ANALYTICS') == 'true' else None
+
+
+def _columns_changed(collection_name: str, doc: Dict[str, Any]):
+    """Apply a created or updated document to the current user's columnar snapshot"""
+    if columnar_store is not None:
+        columnar_store.apply(current_user_id(), collection_name, doc)
+
+
+def _columns_removed(doc_id: ObjectId):
+    """Drop a deleted document from the current user's columnar snapshot"""
+    if columnar_store is not None:
+        columnar_store.remove(current_user_id(), doc_id)
+
+
+def _columns_invalidated():
+    """Rebuild the current user's columnar snapshot on next use after bulk changes"""
+    if columnar_store is not None:
+        columnar_store.invalidate(current_user_id())
+
+
+async def _budgets_changed(before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]):
+    """Update the current user's budgets for one created, updated or deleted item"""
+    await apply_item_change(db, fx_rates.table(), before, after)
+
+
+async def _load_display_currency() -> str:
+    return await load_display_currency(db)
+
+
+def _check_currency(currency: str) -> str:
+    """Reject currencies the exchange rate table cannot convert"""
+    fx_rates.table().factor(currency, currency)
+    return currency
+
+
 # Create the main app
 app = FastAPI(
     title="Abonnement & Fixkosten Tracker",
@@ -62,8 +275,75 @@ app.add_exception_handler(SubTrackException, subtrack_exception_handler)
 app.add_exception_handler(HTTPException, http_exception_handler)
 app.add_exception_handler(Exception, general_exception_handler)
 
+# JWT secret; without it the API runs in single-user mode
+AUTH_SECRET = os.environ.get('AUTH_SECRET')
+
+
+async def bind_current_user(authorization: Optional[str] = Header(None)):
+    """Scope all database access of the request to the authenticated user"""
+    set_current_user(resolve_user_id(authorization, AUTH_SECRET))
+
+
+# Token buckets per client and endpoint class; RATE_LIMIT_BACKEND=mongo shares them between processes
+if os.environ.get('RATE_LIMIT_BACKEND') == 'mongo':
+    rate_limiter = RateLimiter(MongoRateLimitStore(db.rate_limits), RATE_LIMITS)
+else:
+    rate_limiter = RateLimiter(MemoryRateLimitStore(), RATE_LIMITS)
+heavy_operations = ConcurrencyLimiter(int(os.environ.get('HEAVY_CONCURRENCY', HEAVY_CONCURRENCY)))
+
+
+# Reverse proxies whose X-Forwarded-For is believed, e.g. TRUSTED_PROXIES=10.0.0.0/8,127.0.0.1
+TRUSTED_PROXIES = parse_networks(os.environ.get('TRUSTED_PROXIES', ''))
+
+
+def _client_key(request: Request) -> str:
+    """Authenticated user, or the client address in single-user mode"""
+    user_id = current_user_id()
+    if AUTH_SECRET is not None:
+        return user_id
+    return client_address(
+        request.client.host if request.client else None,
+        request.headers.get("x-forwarded-for"),
+        TRUSTED_PROXIES
+    )
+
+
+async def limit_request_rate(request: Request):
+    """Apply the default per-client rate limit"""
+    await rate_limiter.check(_client_key(request), "default")
+
+
+async def limit_heavy_rate(request: Request):
+    """Apply the heavy rate limit; streaming endpoints take their concurrency slot themselves"""
+    await rate_limiter.check(_client_key(request), "heavy")
+
+
+async def limit_heavy_operation(request: Request):
+    """Apply the heavy rate limit and hold a concurrency slot while the handler runs"""
+    await limit_heavy_rate(request)
+    async with heavy_operations.slot():
+        yield
+
+
+# Users allowed on /api/admin; in single-user mode the only user is admin
+ADMIN_USER_IDS = {user_id for user_id in os.environ.get('ADMIN_USER_IDS', '').split(',') if user_id}
+
+
+async def require_admin():
+    """Reject requests of users not listed in ADMIN_USER_IDS"""
+    if AUTH_SECRET is not None and current_user_id() not in ADMIN_USER_IDS:
+        raise PermissionDeniedError("Nur für Administratoren")
+
+
+# Database operations slower than this are recorded and explained
+slow_query_log.threshold_ms = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', SLOW_QUERY_THRESHOLD_MS))
+
+
 # Create a router with the /api prefix
-api_router = APIRouter(prefix="/api")
+api_router = APIRouter(
+    prefix="/api",
+    dependencies=[Depends(bind_current_user), Depends(limit_request_rate), Depends(negotiate_format)]
+)
 
 
 # Enums
@@ -89,6 +369,16 @@ def str_to_objectid(id_str: str) -> ObjectId:
     return validate_objectid(id_str, "Resource")
 
 
+def _normalize_currency(v: Optional[str]) -> Optional[str]:
+    """Uppercase a currency code and check its ISO 4217 shape."""
+    if v is None or v.strip() == '':
+        return None
+    v = v.strip().upper()
+    if not re.fullmatch(r'[A-Z]{3}', v):
+        raise ValueError('Währung muss ein dreistelliger ISO-4217-Code sein')
+    return v
+
+
 # Subscription Models
 class SubscriptionBase(BaseModel):
     name: str
@@ -98,6 +388,13 @@ class SubscriptionBase(BaseModel):
     start_date: str  # ISO date string
     notes: Optional[str] = None
     cancel_url: Optional[str] = None
+    currency: Optional[str] = Field(None, description="ISO-4217-Code; ohne Angabe die Anzeigewährung")
+
+    @field_validator('currency')
+    @classmethod
+    def validate_currency(cls, v):
+        """Validate currency code format."""
+        return _normalize_currency(v)
 
     @field_validator('cancel_url')
     @classmethod
@@ -132,11 +429,19 @@ class SubscriptionUpdate(BaseModel):
     start_date: Optional[str] = None
     notes: Optional[str] = None
     cancel_url: Optional[str] = None
+    currency: Optional[str] = None
+
+    @field_validator('currency')
+    @classmethod
+    def validate_currency(cls, v):
+        """Validate currency code format."""
+        return _normalize_currency(v)
 
 
 class Subscription(SubscriptionBase):
     id: str
     created_at: datetime
+    version: int = 0
 
 
 # Expense Models
@@ -146,6 +451,13 @@ class ExpenseBase(BaseModel):
     amount_cents: int = Field(..., gt=0, description="Betrag in Cent")
     billing_cycle: BillingCycle
     notes: Optional[str] = None
+    currency: Optional[str] = Field(None, description="ISO-4217-Code; ohne Angabe die Anzeigewährung")
+
+    @field_validator('currency')
+    @classmethod
+    def validate_currency(cls, v):
+        """Validate currency code format."""
+        return _normalize_currency(v)
 
 
 class ExpenseCreate(ExpenseBase):
@@ -158,11 +470,19 @@ class ExpenseUpdate(BaseModel):
     amount_cents: Optional[int] = Field(None, gt=0)
     billing_cycle: Optional[BillingCycle] = None
     notes: Optional[str] = None
+    currency: Optional[str] = None
+
+    @field_validator('currency')
+    @classmethod
+    def validate_currency(cls, v):
+        """Validate currency code format."""
+        return _normalize_currency(v)
 
 
 class Expense(ExpenseBase):
     id: str
     created_at: datetime
+    version: int = 0
 
 
 # Dashboard Model
@@ -173,6 +493,121 @@ class DashboardSummary(BaseModel):
     yearly_total: int  # in cents
     subscription_count: int
     expense_count: int
+    currency: str = DEFAULT_CURRENCY
+
+
+def _to_subscription(sub: Dict[str, Any]) -> Subscription:
+    """Convert a subscription document into its API model"""
+    return Subscription(
+        id=str(sub["_id"]),
+        name=sub["name"],
+        category=sub["category"],
+        amount_cents=sub["amount_cents"],
+        billing_cycle=sub["billing_cycle"],
+        start_date=sub["start_date"],
+        notes=sub.get("notes"),
+        cancel_url=sub.get("cancel_url"),
+        currency=sub.get("currency"),
+        created_at=sub.get("created_at", datetime.utcnow()),
+        version=sub.get("version", 0)
+    )
+
+
+def _to_expense(exp: Dict[str, Any]) -> Expense:
+    """Convert an expense document into its API model"""
+    return Expense(
+        id=str(exp["_id"]),
+        name=exp["name"],
+        category=exp["category"],
+        amount_cents=exp["amount_cents"],
+        billing_cycle=exp["billing_cycle"],
+        notes=exp.get("notes"),
+        currency=exp.get("currency"),
+        created_at=exp.get("created_at", datetime.utcnow()),
+        version=exp.get("version", 0)
+    )
+
+
+def _etag(version: int) -> str:
+    return f'"{version}"'
+
+
+def _parse_if_match(if_match: Optional[str]) -> Optional[int]:
+    """Version required by an If-Match header (None when absent or "*")"""
+    if if_match is None or if_match.strip() == "*":
+        return None
+    value = if_match.strip()
+    if value.startswith("W/"):
+        value = value[2:]
+    try:
+        return int(value.strip('"'))
+    except ValueError:
+        raise ValidationError("Ungültiger If-Match-Header", details={"If-Match": if_match})
+
+
+async def _update_versioned(
+    collection,
+    obj_id: ObjectId,
+    resource_id: str,
+    resource_name: str,
+    update_data: Dict[str, Any],
+    if_match: Optional[str],
+    hashed_fields: Tuple[str, ...] = HASHED_FIELDS
+) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Apply an update in one round trip.
+
+    The content hash covers ``hashed_fields``. An update that replaces all
+    of them (like the edit form, which sends the whole entry) or none of
+    them is a single write; only one that replaces some of them reads the
+    document first to hash the merged result.
+
+    Returns:
+        The document before the update (None if it was not read) and after it
+    """
+    expected_version = _parse_if_match(if_match)
+    if all(field in update_data for field in hashed_fields):
+        # The update itself returns the previous state
+        data = {**update_data, **dedupe_fields(update_data, update_data["currency"])}
+        before = await safe_find_one_and_update(
+            collection,
+            {"_id": obj_id},
+            data,
+            resource_name=resource_name,
+            resource_id=resource_id,
+            expected_version=expected_version,
+            return_before=True
+        )
+        return before, {**before, **data, "version": before.get("version", 0) + 1}
+    for attempt in range(1, VERSION_CONFLICT_ATTEMPTS + 1):
+        current = None
+        data = dict(update_data)
+        version = expected_version
+        if any(field in data for field in hashed_fields):
+            current = await safe_find_one_or_404(
+                collection,
+                {"_id": obj_id},
+                resource_name=resource_name,
+                resource_id=resource_id
+            )
+            if version is None:
+                # Guard our own read-modify-write against concurrent edits
+                version = current.get("version", 0)
+            data.update(dedupe_fields({**current, **data}, await _load_display_currency()))
+        try:
+            updated = await safe_find_one_and_update(
+                collection,
+                {"_id": obj_id},
+                data,
+                resource_name=resource_name,
+                resource_id=resource_id,
+                expected_version=version
+            )
+            return current, updated
+        except ConflictError as e:
+            # Without If-Match the client did not ask for a version check: retry with fresh data
+            if expected_version is not None or "version" not in e.details or attempt == VERSION_CONFLICT_ATTEMPTS:
+                raise
 
 
 # Root endpoint
@@ -183,7 +618,7 @@ async def root():
 
 # ===== SUBSCRIPTION ENDPOINTS =====
 
-@api_router.get("/subscriptions", response_model=List[Subscription])
+@api_router.get("/subscriptions", response_model=List[Subscription], response_class=NegotiatedResponse)
 async def get_subscriptions():
     """Alle Abonnements abrufen"""
     try:
@@ -193,30 +628,23 @@ async def get_subscriptions():
             sort_order=1,
             resource_name="Abonnements"
         )
-        return [
-            Subscription(
-                id=str(sub["_id"]),
-                name=sub["name"],
-                category=sub["category"],
-                amount_cents=sub["amount_cents"],
-                billing_cycle=sub["billing_cycle"],
-                start_date=sub["start_date"],
-                notes=sub.get("notes"),
-                cancel_url=sub.get("cancel_url"),
-                created_at=sub.get("created_at", datetime.utcnow())
-            )
-            for sub in subscriptions
-        ]
+        return [_to_subscription(sub) for sub in subscriptions]
     except DatabaseError:
         raise
     except Exception as e:
-        logger.error(f"Error fetching subscriptions: {str(e)}")
+        logger.error("Error fetching subscriptions: %s", e)
         raise DatabaseError("Fehler beim Abrufen der Abonnements")
 
 
 @api_router.get("/subscriptions/{subscription_id}", response_model=Subscription)
-async def get_subscription(subscription_id: str):
+async def get_subscription(subscription_id: str, response: Response):
     """Ein Abonnement abrufen"""
+    sub = await _load_subscription(subscription_id)
+    response.headers["ETag"] = _etag(sub.version)
+    return sub
+
+
+async def _load_subscription(subscription_id: str) -> Subscription:
     try:
         obj_id = validate_objectid(subscription_id, "Abonnement")
         sub = await safe_find_one_or_404(
@@ -225,27 +653,29 @@ async def get_subscription(subscription_id: str):
             resource_name="Abonnement",
             resource_id=subscription_id
         )
-        return Subscription(
-            id=str(sub["_id"]),
-            name=sub["name"],
-            category=sub["category"],
-            amount_cents=sub["amount_cents"],
-            billing_cycle=sub["billing_cycle"],
-            start_date=sub["start_date"],
-            notes=sub.get("notes"),
-            cancel_url=sub.get("cancel_url"),
-            created_at=sub.get("created_at", datetime.utcnow())
-        )
+        return _to_subscription(sub)
     except (ValidationError, NotFoundError):
         raise
     except Exception as e:
-        logger.error(f"Error fetching subscription {subscription_id}: {str(e)}")
+        logger.error("Error fetching subscription %s: %s", subscription_id, e)
         raise DatabaseError("Fehler beim Abrufen des Abonnements")
 
 
 @api_router.post("/subscriptions", response_model=Subscription)
-async def create_subscription(subscription: SubscriptionCreate):
+async def create_subscription(
+    subscription: SubscriptionCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
     """Neues Abonnement erstellen"""
+    return await run_idempotent(
+        db.idempotency_keys,
+        idempotency_key,
+        request_fingerprint("POST /subscriptions", subscription),
+        lambda: _create_subscription(subscription)
+    )
+
+
+async def _create_subscription(subscription: SubscriptionCreate) -> Subscription:
     try:
         sub_dict = subscription.model_dump()
         
@@ -261,23 +691,36 @@ async def create_subscription(subscription: SubscriptionCreate):
         if not sub_dict["category"]:
             raise ValidationError("Kategorie darf nicht leer sein")
         
+        # New items keep their currency even if the display currency changes
+        sub_dict["currency"] = _check_currency(sub_dict.get("currency") or await _load_display_currency())
+        sub_dict.update(dedupe_fields(sub_dict, sub_dict["currency"]))
+        sub_dict["version"] = 1
         inserted_id = await safe_insert_one(
             db.subscriptions,
             sub_dict,
             resource_name="Abonnement"
         )
+        await record_price_change(db, inserted_id, None, sub_dict["amount_cents"])
+        _columns_changed("subscriptions", sub_dict)
+        await _budgets_changed(None, sub_dict)
+        await bump_data_version(db)
         sub_dict["id"] = inserted_id
         sub_dict["created_at"] = datetime.utcnow()
         return Subscription(**sub_dict)
-    except ValidationError:
+    except (ValidationError, ConflictError):
         raise
     except Exception as e:
-        logger.error(f"Error creating subscription: {str(e)}")
+        logger.error("Error creating subscription: %s", e)
         raise DatabaseError("Fehler beim Erstellen des Abonnements")
 
 
 @api_router.put("/subscriptions/{subscription_id}", response_model=Subscription)
-async def update_subscription(subscription_id: str, subscription: SubscriptionUpdate):
+async def update_subscription(
+    subscription_id: str,
+    subscription: SubscriptionUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None, alias="If-Match")
+):
     """Abonnement aktualisieren"""
     try:
         obj_id = validate_objectid(subscription_id, "Abonnement")
@@ -299,20 +742,32 @@ async def update_subscription(subscription_id: str, subscription: SubscriptionUp
             update_data["notes"] = sanitize_string(update_data.get("notes"), max_length=1000)
         if "cancel_url" in update_data:
             update_data["cancel_url"] = sanitize_string(update_data.get("cancel_url"), max_length=500)
+        if "currency" in update_data:
+            _check_currency(update_data["currency"])
         
-        await safe_update_one(
+        before, sub = await _update_versioned(
             db.subscriptions,
-            {"_id": obj_id},
+            obj_id,
+            subscription_id,
+            "Abonnement",
             update_data,
-            resource_name="Abonnement",
-            resource_id=subscription_id
+            if_match
         )
+        _columns_changed("subscriptions", sub)
+        if before is not None:
+            # Without a read nothing that affects the monthly cost changed
+            await _budgets_changed(before, sub)
+        await bump_data_version(db)
         
-        return await get_subscription(subscription_id)
-    except (ValidationError, NotFoundError):
+        if before is not None and before["amount_cents"] != sub["amount_cents"]:
+            await record_price_change(db, subscription_id, before["amount_cents"], sub["amount_cents"])
+        
+        response.headers["ETag"] = _etag(sub["version"])
+        return _to_subscription(sub)
+    except (ValidationError, NotFoundError, ConflictError):
         raise
     except Exception as e:
-        logger.error(f"Error updating subscription {subscription_id}: {str(e)}")
+        logger.error("Error updating subscription %s: %s", subscription_id, e)
         raise DatabaseError("Fehler beim Aktualisieren des Abonnements")
 
 
@@ -321,12 +776,27 @@ async def delete_subscription(subscription_id: str):
     """Abonnement löschen"""
     try:
         obj_id = validate_objectid(subscription_id, "Abonnement")
-        await safe_delete_one(
+        deleted = await safe_find_one_and_delete(
             db.subscriptions,
             {"_id": obj_id},
             resource_name="Abonnement",
             resource_id=subscription_id
         )
+        _columns_removed(obj_id)
+        await _budgets_changed(deleted, None)
+        await bump_data_version(db)
+        await record_deletion(db, "subscriptions", subscription_id)
+        # Best-effort cascade without a transaction (standalone servers have
+        # none): the orphan sweeper removes whatever a failure leaves behind,
+        # so a failure here must not report the completed delete as failed
+        try:
+            await safe_delete_many(
+                db.notification_settings,
+                {"subscription_id": subscription_id},
+                resource_name="Benachrichtigungseinstellungen"
+            )
+        except DatabaseError as e:
+            logger.warning("Cascade for subscription %s left to the orphan sweeper: %s", subscription_id, e.message)
         return create_success_response(
             data={"id": subscription_id},
             message="Abonnement gelöscht"
@@ -334,13 +804,36 @@ async def delete_subscription(subscription_id: str):
     except (ValidationError, NotFoundError):
         raise
     except Exception as e:
-        logger.error(f"Error deleting subscription {subscription_id}: {str(e)}")
+        logger.error("Error deleting subscription %s: %s", subscription_id, e)
         raise DatabaseError("Fehler beim Löschen des Abonnements")
 
 
+@api_router.get("/subscriptions/{subscription_id}/price-history")
+async def get_subscription_price_history(subscription_id: str):
+    """Preisverlauf eines Abonnements"""
+    sub = await _load_subscription(subscription_id)
+    points = await get_price_history(db, subscription_id)
+    first_cents = points[0]["new_cents"] if points else sub.amount_cents
+    return {
+        "subscription_id": subscription_id,
+        "current_cents": sub.amount_cents,
+        "first_cents": first_cents,
+        "change_percent": change_percent(first_cents, sub.amount_cents),
+        "points": [
+            {
+                "at": point["at"].isoformat(),
+                "old_cents": point["old_cents"],
+                "new_cents": point["new_cents"],
+                "change_percent": change_percent(point["old_cents"], point["new_cents"])
+            }
+            for point in points
+        ]
+    }
+
+
 # ===== EXPENSE ENDPOINTS =====
 
-@api_router.get("/expenses", response_model=List[Expense])
+@api_router.get("/expenses", response_model=List[Expense], response_class=NegotiatedResponse)
 async def get_expenses():
     """Alle Fixkosten abrufen"""
     try:
@@ -350,27 +843,16 @@ async def get_expenses():
             sort_order=1,
             resource_name="Fixkosten"
         )
-        return [
-            Expense(
-                id=str(exp["_id"]),
-                name=exp["name"],
-                category=exp["category"],
-                amount_cents=exp["amount_cents"],
-                billing_cycle=exp["billing_cycle"],
-                notes=exp.get("notes"),
-                created_at=exp.get("created_at", datetime.utcnow())
-            )
-            for exp in expenses
-        ]
+        return [_to_expense(exp) for exp in expenses]
     except DatabaseError:
         raise
     except Exception as e:
-        logger.error(f"Error fetching expenses: {str(e)}")
+        logger.error("Error fetching expenses: %s", e)
         raise DatabaseError("Fehler beim Abrufen der Fixkosten")
 
 
 @api_router.get("/expenses/{expense_id}", response_model=Expense)
-async def get_expense(expense_id: str):
+async def get_expense(expense_id: str, response: Response):
     """Eine Fixkosten abrufen"""
     try:
         obj_id = validate_objectid(expense_id, "Fixkosten")
@@ -380,25 +862,30 @@ async def get_expense(expense_id: str):
             resource_name="Fixkosten",
             resource_id=expense_id
         )
-        return Expense(
-            id=str(exp["_id"]),
-            name=exp["name"],
-            category=exp["category"],
-            amount_cents=exp["amount_cents"],
-            billing_cycle=exp["billing_cycle"],
-            notes=exp.get("notes"),
-            created_at=exp.get("created_at", datetime.utcnow())
-        )
+        response.headers["ETag"] = _etag(exp.get("version", 0))
+        return _to_expense(exp)
     except (ValidationError, NotFoundError):
         raise
     except Exception as e:
-        logger.error(f"Error fetching expense {expense_id}: {str(e)}")
+        logger.error("Error fetching expense %s: %s", expense_id, e)
         raise DatabaseError("Fehler beim Abrufen der Fixkosten")
 
 
 @api_router.post("/expenses", response_model=Expense)
-async def create_expense(expense: ExpenseCreate):
+async def create_expense(
+    expense: ExpenseCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
     """Neue Fixkosten erstellen"""
+    return await run_idempotent(
+        db.idempotency_keys,
+        idempotency_key,
+        request_fingerprint("POST /expenses", expense),
+        lambda: _create_expense(expense)
+    )
+
+
+async def _create_expense(expense: ExpenseCreate) -> Expense:
     try:
         exp_dict = expense.model_dump()
         
@@ -413,23 +900,34 @@ async def create_expense(expense: ExpenseCreate):
         if not exp_dict["category"]:
             raise ValidationError("Kategorie darf nicht leer sein")
         
+        exp_dict["currency"] = _check_currency(exp_dict.get("currency") or await _load_display_currency())
+        exp_dict.update(dedupe_fields(exp_dict, exp_dict["currency"]))
+        exp_dict["version"] = 1
         inserted_id = await safe_insert_one(
             db.expenses,
             exp_dict,
             resource_name="Fixkosten"
         )
+        _columns_changed("expenses", exp_dict)
+        await _budgets_changed(None, exp_dict)
+        await bump_data_version(db)
         exp_dict["id"] = inserted_id
         exp_dict["created_at"] = datetime.utcnow()
         return Expense(**exp_dict)
-    except ValidationError:
+    except (ValidationError, ConflictError):
         raise
     except Exception as e:
-        logger.error(f"Error creating expense: {str(e)}")
+        logger.error("Error creating expense: %s", e)
         raise DatabaseError("Fehler beim Erstellen der Fixkosten")
 
 
 @api_router.put("/expenses/{expense_id}", response_model=Expense)
-async def update_expense(expense_id: str, expense: ExpenseUpdate):
+async def update_expense(
+    expense_id: str,
+    expense: ExpenseUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None, alias="If-Match")
+):
     """Fixkosten aktualisieren"""
     try:
         obj_id = validate_objectid(expense_id, "Fixkosten")
@@ -449,20 +947,29 @@ async def update_expense(expense_id: str, expense: ExpenseUpdate):
                 raise ValidationError("Kategorie darf nicht leer sein")
         if "notes" in update_data:
             update_data["notes"] = sanitize_string(update_data.get("notes"), max_length=1000)
+        if "currency" in update_data:
+            _check_currency(update_data["currency"])
         
-        await safe_update_one(
+        before, exp = await _update_versioned(
             db.expenses,
-            {"_id": obj_id},
+            obj_id,
+            expense_id,
+            "Fixkosten",
             update_data,
-            resource_name="Fixkosten",
-            resource_id=expense_id
+            if_match,
+            EXPENSE_HASHED_FIELDS
         )
+        _columns_changed("expenses", exp)
+        if before is not None:
+            await _budgets_changed(before, exp)
+        await bump_data_version(db)
         
-        return await get_expense(expense_id)
-    except (ValidationError, NotFoundError):
+        response.headers["ETag"] = _etag(exp["version"])
+        return _to_expense(exp)
+    except (ValidationError, NotFoundError, ConflictError):
         raise
     except Exception as e:
-        logger.error(f"Error updating expense {expense_id}: {str(e)}")
+        logger.error("Error updating expense %s: %s", expense_id, e)
         raise DatabaseError("Fehler beim Aktualisieren der Fixkosten")
 
 
@@ -471,12 +978,16 @@ async def delete_expense(expense_id: str):
     """Fixkosten löschen"""
     try:
         obj_id = validate_objectid(expense_id, "Fixkosten")
-        await safe_delete_one(
+        deleted = await safe_find_one_and_delete(
             db.expenses,
             {"_id": obj_id},
             resource_name="Fixkosten",
             resource_id=expense_id
         )
+        _columns_removed(obj_id)
+        await _budgets_changed(deleted, None)
+        await bump_data_version(db)
+        await record_deletion(db, "expenses", expense_id)
         return create_success_response(
             data={"id": expense_id},
             message="Fixkosten gelöscht"
@@ -484,68 +995,145 @@ async def delete_expense(expense_id: str):
     except (ValidationError, NotFoundError):
         raise
     except Exception as e:
-        logger.error(f"Error deleting expense {expense_id}: {str(e)}")
+        logger.error("Error deleting expense %s: %s", expense_id, e)
         raise DatabaseError("Fehler beim Löschen der Fixkosten")
 
 
 # ===== DASHBOARD ENDPOINT =====
 
-@api_router.get("/dashboard", response_model=DashboardSummary)
+@api_router.get("/dashboard", response_model=DashboardSummary, response_class=NegotiatedResponse)
 async def get_dashboard():
     """Dashboard-Übersicht mit Summen"""
+    return await read_coalescer.do((current_user_id(), "dashboard"), _load_dashboard)
+
+
+def _summarize_dashboard(
+    subscriptions: List[Dict[str, Any]],
+    expenses: List[Dict[str, Any]],
+    currency: str
+) -> DashboardSummary:
+    """Calculate dashboard totals in ``currency`` from already loaded documents"""
+    fx = fx_rates.table()
+    subscriptions = fx.in_currency(subscriptions, currency)
+    expenses = fx.in_currency(expenses, currency)
+    # Calculate monthly amounts
+    monthly_subs = 0
+    yearly_subs_only = 0
+    for sub in subscriptions:
+        if sub["billing_cycle"] == "MONTHLY":
+            monthly_subs += sub["amount_cents"]
+        else:  # YEARLY
+            monthly_subs += sub["amount_cents"] // 12
+            yearly_subs_only += sub["amount_cents"]
+    
+    monthly_exps = 0
+    yearly_exps_only = 0
+    for exp in expenses:
+        if exp["billing_cycle"] == "MONTHLY":
+            monthly_exps += exp["amount_cents"]
+        else:  # YEARLY
+            monthly_exps += exp["amount_cents"] // 12
+            yearly_exps_only += exp["amount_cents"]
+    
+    total_monthly = monthly_subs + monthly_exps
+    
+    # Yearly calculation: monthly * 12 + yearly items
+    monthly_only_subs = sum(s["amount_cents"] for s in subscriptions if s["billing_cycle"] == "MONTHLY")
+    monthly_only_exps = sum(e["amount_cents"] for e in expenses if e["billing_cycle"] == "MONTHLY")
+    yearly_total = (monthly_only_subs + monthly_only_exps) * 12 + yearly_subs_only + yearly_exps_only
+    
+    return DashboardSummary(
+        monthly_subscriptions=monthly_subs,
+        monthly_expenses=monthly_exps,
+        total_monthly=total_monthly,
+        yearly_total=yearly_total,
+        subscription_count=len(subscriptions),
+        expense_count=len(expenses),
+        currency=currency
+    )
+
+
+async def _load_dashboard() -> DashboardSummary:
     try:
-        subscriptions = await safe_find(db.subscriptions, resource_name="Abonnements")
-        expenses = await safe_find(db.expenses, resource_name="Fixkosten")
-        
-        # Calculate monthly amounts
-        monthly_subs = 0
-        yearly_subs_only = 0
-        for sub in subscriptions:
-            if sub["billing_cycle"] == "MONTHLY":
-                monthly_subs += sub["amount_cents"]
-            else:  # YEARLY
-                monthly_subs += sub["amount_cents"] // 12
-                yearly_subs_only += sub["amount_cents"]
-        
-        monthly_exps = 0
-        yearly_exps_only = 0
-        for exp in expenses:
-            if exp["billing_cycle"] == "MONTHLY":
-                monthly_exps += exp["amount_cents"]
-            else:  # YEARLY
-                monthly_exps += exp["amount_cents"] // 12
-                yearly_exps_only += exp["amount_cents"]
-        
-        total_monthly = monthly_subs + monthly_exps
-        
-        # Yearly calculation: monthly * 12 + yearly items
-        monthly_only_subs = sum(s["amount_cents"] for s in subscriptions if s["billing_cycle"] == "MONTHLY")
-        monthly_only_exps = sum(e["amount_cents"] for e in expenses if e["billing_cycle"] == "MONTHLY")
-        yearly_total = (monthly_only_subs + monthly_only_exps) * 12 + yearly_subs_only + yearly_exps_only
-        
-        return DashboardSummary(
-            monthly_subscriptions=monthly_subs,
-            monthly_expenses=monthly_exps,
-            total_monthly=total_monthly,
-            yearly_total=yearly_total,
-            subscription_count=len(subscriptions),
-            expense_count=len(expenses)
+        if columnar_store is not None:
+            columns, currency = await asyncio.gather(
+                columnar_store.get(current_user_id()),
+                _load_display_currency()
+            )
+            return DashboardSummary(**columns.dashboard(fx_rates.table(), currency), currency=currency)
+        subscriptions, expenses, currency = await asyncio.gather(
+            safe_find(db.subscriptions, resource_name="Abonnements"),
+            safe_find(db.expenses, resource_name="Fixkosten"),
+            _load_display_currency()
         )
+        return _summarize_dashboard(subscriptions, expenses, currency)
     except DatabaseError:
         raise
     except Exception as e:
-        logger.error(f"Error fetching dashboard: {str(e)}")
+        logger.error("Error fetching dashboard: %s", e)
         raise DatabaseError("Fehler beim Abrufen des Dashboards")
 
 
+# ===== BOOTSTRAP ENDPOINT =====
+
+class BootstrapData(BaseModel):
+    subscriptions: List[Subscription]
+    expenses: List[Expense]
+    dashboard: DashboardSummary
+    settings: Dict[str, Any]
+
+
+@api_router.get("/bootstrap", response_model=BootstrapData, response_class=NegotiatedResponse)
+async def get_bootstrap():
+    """Alle Startdaten der App in einer Antwort"""
+    try:
+        subscriptions, expenses, settings = await asyncio.gather(
+            safe_find(
+                db.subscriptions,
+                sort_field="name",
+                sort_order=1,
+                resource_name="Abonnements"
+            ),
+            safe_find(
+                db.expenses,
+                sort_field="name",
+                sort_order=1,
+                resource_name="Fixkosten"
+            ),
+            safe_find_one(db.settings, {"type": "app_settings"}, resource_name="Einstellungen")
+        )
+        return BootstrapData(
+            subscriptions=[_to_subscription(sub) for sub in subscriptions],
+            expenses=[_to_expense(exp) for exp in expenses],
+            dashboard=_summarize_dashboard(subscriptions, expenses, display_currency(settings)),
+            settings=_settings_response(settings)
+        )
+    except DatabaseError:
+        raise
+    except Exception as e:
+        logger.error("Error fetching bootstrap data: %s", e)
+        raise DatabaseError("Fehler beim Abrufen der Startdaten")
+
+
 # ===== DEMO DATA ENDPOINT =====
 
-@api_router.post("/demo-data")
-async def create_demo_data():
-    """Demo-Daten anlegen"""
+@api_router.post("/demo-data", dependencies=[Depends(limit_heavy_operation)])
+async def create_demo_data(
+    subscriptions: Optional[int] = Query(None, ge=0, le=SEED_MAX_DOCUMENTS),
+    expenses: Optional[int] = Query(None, ge=0, le=SEED_MAX_DOCUMENTS),
+    seed: Optional[int] = None,
+    background: bool = False
+):
+    """Demo-Daten anlegen, optional als synthetische Daten in beliebiger Menge"""
+    if subscriptions is not None or expenses is not None:
+        params = {"subscriptions": subscriptions or 0, "expenses": expenses or 0, "seed": seed}
+        if background:
+            return await _submit_job("seed", params)
+        return await _seed_synthetic_data(params)
+
     # Clear existing data
-    await db.subscriptions.delete_many({})
-    await db.expenses.delete_many({})
+    await safe_delete_many(db.subscriptions, resource_name="Abonnements")
+    await safe_delete_many(db.expenses, resource_name="Fixkosten")
     
     # Demo subscriptions
     demo_subs = [
@@ -635,12 +1223,35 @@ async def create_demo_data():
         }
     ]
     
-    await db.subscriptions.insert_many(demo_subs)
-    await db.expenses.insert_many(demo_exps)
+    currency = await _load_display_currency()
+    for doc in demo_subs + demo_exps:
+        doc.update(dedupe_fields(doc, currency))
+    await safe_insert_many(db.subscriptions, demo_subs, resource_name="Abonnements")
+    await safe_insert_many(db.expenses, demo_exps, resource_name="Fixkosten")
+    _columns_invalidated()
+    await invalidate_budgets(db)
+    await bump_data_version(db)
+    await request_full_backup(db)
     
     return {"message": "Demo-Daten erfolgreich angelegt", "subscriptions": len(demo_subs), "expenses": len(demo_exps)}
 
 
+async def _seed_synthetic_data(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Replace the current user's data with generated subscriptions and expenses"""
+    counts = await seed_data(
+        db,
+        current_user_id(),
+        params["subscriptions"],
+        params["expenses"],
+        seed=params.get("seed")
+    )
+    _columns_invalidated()
+    await invalidate_budgets(db)
+    await bump_data_version(db)
+    await request_full_backup(db)
+    return {"message": "Synthetische Daten erfolgreich angelegt", **counts, "seed": params.get("seed")}
+
+
 # ===== EXPORT ENDPOINTS =====
 
 class ExportData(BaseModel):
@@ -657,25 +1268,35 @@ class ImportData(BaseModel):
     merge: bool = False  # If False, replace all data
 
 
-@api_router.get("/export/json")
-async def export_json():
-    """Export all data as JSON"""
-    subscriptions = await db.subscriptions.find().to_list(1000)
-    expenses = await db.expenses.find().to_list(1000)
-    settings = await db.settings.find_one({"type": "app_settings"})
+def _export_document(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Make a stored document JSON-serializable for export"""
+    doc.pop("user_id", None)
+    doc["id"] = str(doc.pop("_id"))
+    for key, value in doc.items():
+        if isinstance(value, datetime):
+            doc[key] = value.isoformat()
+    return doc
+
+
+async def _build_export_data() -> Dict[str, Any]:
+    """Collect all data in the JSON backup format"""
+    subscriptions, expenses, settings = await asyncio.gather(
+        safe_find(db.subscriptions, resource_name="Abonnements"),
+        safe_find(db.expenses, resource_name="Fixkosten"),
+        safe_find_one(db.settings, {"type": "app_settings"}, resource_name="Einstellungen")
+    )
     
-    # Convert ObjectIds to strings
-    for sub in subscriptions:
-        sub["id"] = str(sub.pop("_id"))
-        if "created_at" in sub and isinstance(sub["created_at"], datetime):
-            sub["created_at"] = sub["created_at"].isoformat()
+    # Convert ObjectIds and timestamps to strings
+    subscriptions = [_export_document(sub) for sub in subscriptions]
+    expenses = [_export_document(exp) for exp in expenses]
     
-    for exp in expenses:
-        exp["id"] = str(exp.pop("_id"))
-        if "created_at" in exp and isinstance(exp["created_at"], datetime):
-            exp["created_at"] = exp["created_at"].isoformat()
+    if settings:
+        settings.pop("_id", None)
+        settings.pop("user_id", None)
+        # Changes with every scheduled backup, which does not bump the data version
+        settings.pop("last_backup", None)
     
-    export_data = {
+    return {
         "version": "1.0",
         "app_name": "Abonnement & Fixkosten Tracker",
         "exported_at": datetime.utcnow().isoformat(),
@@ -683,19 +1304,63 @@ async def export_json():
         "expenses": expenses,
         "settings": settings if settings else {}
     }
-    
-    return JSONResponse(content=export_data)
 
 
-@api_router.get("/export/csv")
-async def export_csv():
+def _encode_json(content: Any) -> bytes:
+    """Serialize like JSONResponse, falling back to str for stray dates"""
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+async def _cached_export(
+    request: Request,
+    artifact: str,
+    build: Callable[[], Awaitable[Dict[str, Any]]]
+) -> FileResponse:
+    """Serve a JSON export from the export cache, gzip-compressed if the client accepts it"""
+    # Read the version before the data so the file is never older than its version
+    version = await data_version(db)
+
+    async def encode() -> bytes:
+        return _encode_json(await build())
+
+    async def encode_gzip() -> bytes:
+        # Compress the cached plain file so both variants carry the same export
+        plain = await export_cache.get(current_user_id(), version, artifact, encode)
+        return await asyncio.to_thread(lambda: gzip.compress(plain.read_bytes(), 6))
+
+    headers = {"Vary": "Accept-Encoding"}
+    if accepts_encoding(request.headers.get("accept-encoding", ""), "gzip"):
+        path = await export_cache.get(current_user_id(), version, f"{artifact}.gz", encode_gzip)
+        headers["Content-Encoding"] = "gzip"
+    else:
+        path = await export_cache.get(current_user_id(), version, artifact, encode)
+    return FileResponse(path, media_type="application/json", headers=headers)
+
+
+@api_router.get("/export/json", dependencies=[Depends(limit_heavy_operation)])
+async def export_json(request: Request, background: bool = False):
+    """Export all data as JSON"""
+    if background:
+        return await _submit_job("export")
+    return await _cached_export(request, "export.json", _build_export_data)
+
+
+@api_router.get("/export/csv", dependencies=[Depends(limit_heavy_operation)])
+async def export_csv(request: Request):
     """Export all data as CSV (returns JSON with CSV strings)"""
-    subscriptions = await db.subscriptions.find().to_list(1000)
-    expenses = await db.expenses.find().to_list(1000)
+    return await _cached_export(request, "export-csv.json", _build_csv_export)
+
+
+async def _build_csv_export() -> Dict[str, Any]:
+    """Collect subscriptions and expenses as CSV strings"""
+    subscriptions, expenses = await asyncio.gather(
+        safe_find(db.subscriptions, resource_name="Abonnements"),
+        safe_find(db.expenses, resource_name="Fixkosten")
+    )
     
     # Create subscriptions CSV
     sub_output = io.StringIO()
-    sub_fields = ["name", "category", "amount_cents", "billing_cycle", "start_date", "notes", "cancel_url"]
+    sub_fields = ["name", "category", "amount_cents", "currency", "billing_cycle", "start_date", "notes", "cancel_url"]
     sub_writer = csv.DictWriter(sub_output, fieldnames=sub_fields, extrasaction='ignore')
     sub_writer.writeheader()
     for sub in subscriptions:
@@ -703,7 +1368,7 @@ async def export_csv():
     
     # Create expenses CSV
     exp_output = io.StringIO()
-    exp_fields = ["name", "category", "amount_cents", "billing_cycle", "notes"]
+    exp_fields = ["name", "category", "amount_cents", "currency", "billing_cycle", "notes"]
     exp_writer = csv.DictWriter(exp_output, fieldnames=exp_fields, extrasaction='ignore')
     exp_writer.writeheader()
     for exp in expenses:
@@ -716,58 +1381,140 @@ async def export_csv():
     }
 
 
-@api_router.post("/import/json")
-async def import_json(data: ImportData):
-    """Import data from JSON backup"""
-    imported_subs = 0
-    imported_exps = 0
+@api_router.get("/export/parquet", dependencies=[Depends(limit_heavy_rate)])
+async def export_parquet():
+    """Export subscriptions and expenses as one Parquet table"""
+    return _columnar_export("parquet")
+
+
+@api_router.get("/export/arrow", dependencies=[Depends(limit_heavy_rate)])
+async def export_arrow():
+    """Export subscriptions and expenses as an Arrow IPC stream"""
+    return _columnar_export("arrow")
+
+
+def _columnar_export(fmt: str) -> StreamingResponse:
+    """Stream line items in a columnar format, batch by batch"""
+    media_type, extension = COLUMNAR_EXPORT_FORMATS[fmt]
+    filename = f"subtrack-export-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.{extension}"
+    # The body is produced after the handler (and its dependencies) returned,
+    # so the slot is held until the stream ends: the generator releases it
+    # when it finishes or fails, the background task if it never started
+    release = heavy_operations.acquire()
+    return StreamingResponse(
+        # Binds the current user now
+        _release_after(stream_export(db, fmt), release),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        background=BackgroundTask(release)
+    )
+
+
+async def _release_after(chunks: AsyncIterator[bytes], release: Callable[[], None]) -> AsyncIterator[bytes]:
+    """Pass ``chunks`` through and call ``release`` once they are exhausted or fail"""
+    try:
+        async for chunk in chunks:
+            yield chunk
+    finally:
+        release()
+
+
+def _prepare_import_document(doc: Dict[str, Any], currency: str) -> Dict[str, Any]:
+    """Strip ids and normalize timestamps of an imported document"""
+    # Remove id and owner fields if they exist, let MongoDB generate new ones
+    doc.pop("id", None)
+    doc.pop("_id", None)
+    doc.pop("user_id", None)
+    if "created_at" not in doc:
+        doc["created_at"] = datetime.utcnow()
+    elif isinstance(doc["created_at"], str):
+        try:
+            doc["created_at"] = datetime.fromisoformat(doc["created_at"].replace("Z", "+00:00"))
+        except ValueError:
+            doc["created_at"] = datetime.utcnow()
+    doc.update(dedupe_fields(doc, currency))
+    return doc
+
+
+async def _import_data(
+    data: ImportData,
+    progress: Optional[Callable[[int, int], Awaitable[None]]] = None
+) -> Dict[str, Any]:
+    """Import subscriptions and expenses in batches, reporting progress"""
+    subscriptions = data.subscriptions or []
+    expenses = data.expenses or []
+    total = len(subscriptions) + len(expenses)
+    done = 0
+    imported = {"Abonnements": 0, "Fixkosten": 0}
+    skipped = 0
+    # Imported items without a currency are in the display currency
+    currency = await _load_display_currency()
     
     if not data.merge:
         # Clear existing data if not merging
-        await db.subscriptions.delete_many({})
-        await db.expenses.delete_many({})
+        await safe_delete_many(db.subscriptions, resource_name="Abonnements")
+        await safe_delete_many(db.expenses, resource_name="Fixkosten")
     
-    if data.subscriptions:
-        for sub in data.subscriptions:
-            # Remove id field if exists, let MongoDB generate new one
-            sub.pop("id", None)
-            sub.pop("_id", None)
-            if "created_at" not in sub:
-                sub["created_at"] = datetime.utcnow()
-            elif isinstance(sub["created_at"], str):
-                try:
-                    sub["created_at"] = datetime.fromisoformat(sub["created_at"].replace("Z", "+00:00"))
-                except:
-                    sub["created_at"] = datetime.utcnow()
-            await db.subscriptions.insert_one(sub)
-            imported_subs += 1
+    for collection, items, resource_name in (
+        (db.subscriptions, subscriptions, "Abonnements"),
+        (db.expenses, expenses, "Fixkosten")
+    ):
+        for start in range(0, len(items), IMPORT_BATCH_SIZE):
+            batch = [_prepare_import_document(doc, currency) for doc in items[start:start + IMPORT_BATCH_SIZE]]
+            # Entries already stored or repeated in the file are skipped
+            known = await existing_hashes(collection, [doc["content_hash"] for doc in batch])
+            unique, duplicates = split_duplicates(batch, known)
+            inserted = await safe_insert_many(
+                collection,
+                unique,
+                resource_name=resource_name,
+                skip_duplicates=True
+            )
+            imported[resource_name] += len(inserted)
+            skipped += len(batch) - len(inserted)
+            done += len(batch)
+            if progress:
+                await progress(done, total)
     
-    if data.expenses:
-        for exp in data.expenses:
-            exp.pop("id", None)
-            exp.pop("_id", None)
-            if "created_at" not in exp:
-                exp["created_at"] = datetime.utcnow()
-            elif isinstance(exp["created_at"], str):
-                try:
-                    exp["created_at"] = datetime.fromisoformat(exp["created_at"].replace("Z", "+00:00"))
-                except:
-                    exp["created_at"] = datetime.utcnow()
-            await db.expenses.insert_one(exp)
-            imported_exps += 1
+    _columns_invalidated()
+    await invalidate_budgets(db)
+    await bump_data_version(db)
+    # Imported documents keep their original timestamps
+    await request_full_backup(db)
     
     return {
         "message": "Daten erfolgreich importiert",
-        "subscriptions_imported": imported_subs,
-        "expenses_imported": imported_exps,
+        "subscriptions_imported": imported["Abonnements"],
+        "expenses_imported": imported["Fixkosten"],
+        "duplicates_skipped": skipped,
         "merged": data.merge
     }
 
 
+@api_router.post("/import/json", dependencies=[Depends(limit_heavy_operation)])
+async def import_json(
+    data: ImportData,
+    background: bool = False,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    """Import data from JSON backup"""
+    async def run_import():
+        if background:
+            return await _submit_job("import", payload=data.model_dump())
+        return await _import_data(data)
+
+    return await run_idempotent(
+        db.idempotency_keys,
+        idempotency_key,
+        request_fingerprint("POST /import/json", {"background": background, "data": data}),
+        run_import
+    )
+
+
 # ===== SETTINGS ENDPOINTS =====
 
 class AppSettings(BaseModel):
-    currency: str = "EUR"
+    currency: str = DEFAULT_CURRENCY
     notification_enabled: bool = True
     notification_time: str = "09:00"  # HH:MM format
     notification_days_before: List[int] = [1, 3, 7]  # Days before renewal
@@ -775,34 +1522,126 @@ class AppSettings(BaseModel):
     backup_interval: str = "weekly"  # daily, weekly, monthly
     last_backup: Optional[str] = None
 
+    @field_validator('currency')
+    @classmethod
+    def validate_currency(cls, v):
+        """Validate currency code format."""
+        return _normalize_currency(v) or DEFAULT_CURRENCY
 
-@api_router.get("/settings")
-async def get_settings():
-    """Get app settings"""
-    settings = await db.settings.find_one({"type": "app_settings"})
+
+def _settings_response(settings: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Strip storage fields from a settings document, falling back to defaults"""
     if not settings:
         # Return default settings
         return AppSettings().model_dump()
     settings.pop("_id", None)
     settings.pop("type", None)
+    settings.pop("user_id", None)
     return settings
 
 
+@api_router.get("/settings")
+async def get_settings():
+    """Get app settings"""
+    return _settings_response(
+        await safe_find_one(db.settings, {"type": "app_settings"}, resource_name="Einstellungen")
+    )
+
+
 @api_router.put("/settings")
 async def update_settings(settings: AppSettings):
     """Update app settings"""
     settings_dict = settings.model_dump()
+    _check_currency(settings_dict["currency"])
     settings_dict["type"] = "app_settings"
     settings_dict["updated_at"] = datetime.utcnow().isoformat()
     
-    await db.settings.update_one(
+    await safe_upsert_one(
+        db.settings,
         {"type": "app_settings"},
-        {"$set": settings_dict},
-        upsert=True
+        settings_dict,
+        resource_name="Einstellungen"
     )
+    await bump_data_version(db)
     return settings_dict
 
 
+@api_router.get("/fx-rates")
+async def get_fx_rates():
+    """Wechselkurse, mit denen Summen in die Anzeigewährung umgerechnet werden"""
+    return fx_rates.table().describe()
+
+
+# ===== BUDGET ENDPOINTS =====
+
+class BudgetSettings(BaseModel):
+    category: Optional[str] = None  # None: budget over all categories
+    limit_cents: int = Field(..., gt=0, description="Monatliches Limit in Cent")
+    thresholds: List[int] = Field(default_factory=lambda: list(DEFAULT_BUDGET_THRESHOLDS))
+    currency: Optional[str] = Field(None, description="ISO-4217-Code; ohne Angabe die Anzeigewährung")
+
+    @field_validator('thresholds')
+    @classmethod
+    def validate_thresholds(cls, v):
+        """Validate alert thresholds (percent of the limit)."""
+        if not v or any(t < 1 or t > 1000 for t in v):
+            raise ValueError('Schwellenwerte müssen zwischen 1 und 1000 Prozent liegen')
+        return sorted(set(v))
+
+    @field_validator('currency')
+    @classmethod
+    def validate_currency(cls, v):
+        """Validate currency code format."""
+        return _normalize_currency(v)
+
+
+@api_router.get("/budgets/status", response_class=NegotiatedResponse)
+async def get_budget_status():
+    """Monatliche Ausgaben im Verhältnis zu allen Budgets"""
+    return {"budgets": await budget_status(db, fx_rates.table())}
+
+
+@api_router.put("/budgets")
+async def set_budget(budget: BudgetSettings):
+    """Budget für eine Kategorie oder für alle Ausgaben anlegen oder ändern"""
+    category = sanitize_string(budget.category, max_length=100) or OVERALL
+    currency = _check_currency(budget.currency or await _load_display_currency())
+    await safe_upsert_one(
+        db.budgets,
+        {"category": category},
+        {
+            "limit_cents": budget.limit_cents,
+            "thresholds": budget.thresholds,
+            "currency": currency,
+            # Incremental updates pause until the state is computed below
+            "stale": True,
+            "updated_at": datetime.utcnow()
+        },
+        resource_name="Budget"
+    )
+    stored = await safe_find_one_or_404(db.budgets, {"category": category}, resource_name="Budget")
+    refreshed = await recompute_budgets(db, fx_rates.table(), [stored])
+    return describe_budget(refreshed[0] if refreshed else stored)
+
+
+@api_router.delete("/budgets/{budget_id}")
+async def delete_budget(budget_id: str):
+    """Budget löschen"""
+    await safe_delete_one(
+        db.budgets,
+        {"_id": validate_objectid(budget_id, "Budget")},
+        resource_name="Budget",
+        resource_id=budget_id
+    )
+    return create_success_response(data={"id": budget_id}, message="Budget gelöscht")
+
+
+@api_router.get("/budgets/alerts")
+async def get_budget_alerts(limit: int = Query(50, ge=1, le=MAX_BUDGET_ALERTS)):
+    """Zuletzt ausgelöste Budget-Warnungen"""
+    return {"alerts": await recent_alerts(db, limit)}
+
+
 # ===== NOTIFICATION ENDPOINTS =====
 
 class NotificationSettings(BaseModel):
@@ -824,146 +1663,337 @@ class ScheduledNotification(BaseModel):
 @api_router.get("/notifications/scheduled")
 async def get_scheduled_notifications():
     """Get all scheduled notifications for upcoming renewals"""
-    subscriptions = await db.subscriptions.find().to_list(1000)
-    settings = await db.settings.find_one({"type": "app_settings"})
-    
-    days_before = [1, 3, 7]  # Default
-    if settings and "notification_days_before" in settings:
-        days_before = settings["notification_days_before"]
-    
-    notifications = []
-    today = datetime.utcnow().date()
+    return await read_coalescer.do(
+        (current_user_id(), "notifications/scheduled"),
+        _load_scheduled_notifications
+    )
+
+
+async def _load_scheduled_notifications() -> Dict[str, Any]:
+    subscriptions, settings, overrides = await asyncio.gather(
+        safe_find(db.subscriptions, resource_name="Abonnements"),
+        safe_find_one(db.settings, {"type": "app_settings"}, resource_name="Einstellungen"),
+        safe_find(db.notification_settings, resource_name="Benachrichtigungseinstellungen")
+    )
     
-    for sub in subscriptions:
-        try:
-            start_date = datetime.strptime(sub["start_date"], "%Y-%m-%d").date()
-            
-            # Calculate next renewal date
-            if sub["billing_cycle"] == "MONTHLY":
-                # Find next occurrence of the day
-                next_renewal = today.replace(day=start_date.day)
-                if next_renewal <= today:
-                    if today.month == 12:
-                        next_renewal = next_renewal.replace(year=today.year + 1, month=1)
-                    else:
-                        next_renewal = next_renewal.replace(month=today.month + 1)
-            else:  # YEARLY
-                next_renewal = start_date.replace(year=today.year)
-                if next_renewal <= today:
-                    next_renewal = next_renewal.replace(year=today.year + 1)
-            
-            # Check if notification should be shown
-            days_until = (next_renewal - today).days
-            
-            for days in days_before:
-                if days_until == days:
-                    notifications.append({
-                        "id": f"{sub['_id']}_{days}",
-                        "subscription_id": str(sub["_id"]),
-                        "subscription_name": sub["name"],
-                        "scheduled_date": next_renewal.isoformat(),
-                        "days_until": days_until,
-                        "message": f"{sub['name']} wird in {days_until} Tag(en) verlängert",
-                        "type": "renewal",
-                        "amount_cents": sub["amount_cents"]
-                    })
-        except Exception as e:
-            continue
+    days_before = (settings or {}).get("notification_days_before", DEFAULT_NOTIFICATION_DAYS)
+    notifications = due_notifications(
+        subscriptions,
+        days_before,
+        {doc["subscription_id"]: doc for doc in overrides},
+        datetime.utcnow().date()
+    )
     
     return {"notifications": notifications, "count": len(notifications)}
 
 
+@api_router.get("/notifications/history")
+async def get_notification_history(limit: int = Query(50, ge=1, le=500)):
+    """Get delivered and pending reminders from the outbox, newest first"""
+    entries = await safe_find(
+        db.notification_outbox,
+        sort_field="created_at",
+        sort_order=-1,
+        limit=limit,
+        resource_name="Benachrichtigungen"
+    )
+    return {"notifications": [serialize_outbox_entry(entry) for entry in entries]}
+
+
 @api_router.get("/notifications/subscription/{subscription_id}")
 async def get_subscription_notifications(subscription_id: str):
     """Get notification settings for a specific subscription"""
-    settings = await db.notification_settings.find_one({"subscription_id": subscription_id})
+    settings = await safe_find_one(
+        db.notification_settings,
+        {"subscription_id": subscription_id},
+        resource_name="Benachrichtigungseinstellungen"
+    )
     if not settings:
-        return {"subscription_id": subscription_id, "enabled": True, "days_before": [1, 3, 7]}
+        return {"subscription_id": subscription_id, "enabled": True, "days_before": DEFAULT_NOTIFICATION_DAYS}
     settings.pop("_id", None)
+    settings.pop("user_id", None)
     return settings
 
 
 @api_router.put("/notifications/subscription/{subscription_id}")
 async def update_subscription_notifications(subscription_id: str, settings: NotificationSettings):
     """Update notification settings for a specific subscription"""
+    await safe_find_one_or_404(
+        db.subscriptions,
+        {"_id": validate_objectid(subscription_id, "Abonnement")},
+        resource_name="Abonnement",
+        resource_id=subscription_id
+    )
     settings_dict = settings.model_dump()
-    await db.notification_settings.update_one(
+    # The path decides which subscription the settings belong to
+    settings_dict["subscription_id"] = subscription_id
+    await safe_upsert_one(
+        db.notification_settings,
         {"subscription_id": subscription_id},
-        {"$set": settings_dict},
-        upsert=True
+        settings_dict,
+        resource_name="Benachrichtigungseinstellungen"
     )
     return settings_dict
 
 
 # ===== ANALYTICS ENDPOINTS =====
 
-@api_router.get("/analytics/category-breakdown")
+@api_router.get("/analytics/category-breakdown", response_class=NegotiatedResponse)
 async def get_category_breakdown():
     """Get costs broken down by category"""
-    subscriptions = await db.subscriptions.find().to_list(1000)
-    expenses = await db.expenses.find().to_list(1000)
-    
-    categories = {}
-    
-    # Process subscriptions
-    for sub in subscriptions:
-        cat = sub["category"]
-        monthly = sub["amount_cents"] if sub["billing_cycle"] == "MONTHLY" else sub["amount_cents"] // 12
-        if cat not in categories:
-            categories[cat] = {"monthly": 0, "count": 0, "type": "mixed"}
-        categories[cat]["monthly"] += monthly
-        categories[cat]["count"] += 1
-    
-    # Process expenses
-    for exp in expenses:
-        cat = exp["category"]
-        monthly = exp["amount_cents"] if exp["billing_cycle"] == "MONTHLY" else exp["amount_cents"] // 12
-        if cat not in categories:
-            categories[cat] = {"monthly": 0, "count": 0, "type": "mixed"}
-        categories[cat]["monthly"] += monthly
-        categories[cat]["count"] += 1
-    
-    # Convert to list and sort by monthly cost
-    result = [
-        {"category": cat, "monthly_cents": data["monthly"], "count": data["count"]}
-        for cat, data in categories.items()
-    ]
-    result.sort(key=lambda x: x["monthly_cents"], reverse=True)
+    return await read_coalescer.do(
+        (current_user_id(), "analytics/category-breakdown"),
+        _load_category_breakdown
+    )
+
+
+async def _load_category_breakdown() -> Dict[str, Any]:
+    fx = fx_rates.table()
+    if columnar_store is not None:
+        columns, currency = await asyncio.gather(
+            columnar_store.get(current_user_id()),
+            _load_display_currency()
+        )
+        return {"categories": columns.category_totals(fx, currency), "currency": currency}
+    subscriptions, expenses, currency = await asyncio.gather(
+        safe_find(db.subscriptions, resource_name="Abonnements"),
+        safe_find(db.expenses, resource_name="Fixkosten"),
+        _load_display_currency()
+    )
     
-    return {"categories": result}
+    return {
+        "categories": category_totals(fx.in_currency(subscriptions, currency), fx.in_currency(expenses, currency)),
+        "currency": currency
+    }
 
 
-@api_router.get("/analytics/top-subscriptions")
+@api_router.get("/analytics/top-subscriptions", response_class=NegotiatedResponse)
 async def get_top_subscriptions(limit: int = 5):
     """Get top N most expensive subscriptions"""
-    subscriptions = await db.subscriptions.find().to_list(1000)
+    fx = fx_rates.table()
+    currency = await _load_display_currency()
+    if columnar_store is not None:
+        # Rank in memory, then load only the N winners
+        columns = await columnar_store.get(current_user_id())
+        ids = columns.top(KINDS["subscriptions"], limit, fx, currency)
+        found = await safe_find(db.subscriptions, {"_id": {"$in": ids}}, resource_name="Abonnements")
+        by_id = {sub["_id"]: sub for sub in found}
+        subscriptions = [by_id[obj_id] for obj_id in ids if obj_id in by_id]
+    else:
+        subscriptions = await safe_find(db.subscriptions, resource_name="Abonnements")
     
-    # Calculate monthly cost for each
+    # Calculate monthly cost for each, in the display currency
     for sub in subscriptions:
-        sub["monthly_cost"] = sub["amount_cents"] if sub["billing_cycle"] == "MONTHLY" else sub["amount_cents"] // 12
+        sub.pop("user_id", None)
+        amount = fx.convert(sub["amount_cents"], sub.get("currency") or currency, currency)
+        sub["monthly_cost"] = amount if sub["billing_cycle"] == "MONTHLY" else amount // 12
         sub["id"] = str(sub.pop("_id"))
     
     # Sort and limit
     subscriptions.sort(key=lambda x: x["monthly_cost"], reverse=True)
     
-    return {"top_subscriptions": subscriptions[:limit]}
-
-
-@api_router.delete("/data/all")
-async def delete_all_data():
-    """Delete all user data (factory reset)"""
-    await db.subscriptions.delete_many({})
-    await db.expenses.delete_many({})
-    await db.notification_settings.delete_many({})
+    return {"top_subscriptions": subscriptions[:limit], "currency": currency}
+
+
+async def _reset_all_data() -> Dict[str, Any]:
+    """Delete all user data and restore default settings"""
+    # Without authentication nobody else writes to the collections, so they
+    # can be swapped for empty ones; otherwise delete the user's documents
+    if AUTH_SECRET is None and await fast_reset(db, list(RESET_COLLECTIONS), current_user_id()):
+        logger.info("Factory reset by collection rename")
+        # The fresh collections do not record pre-images yet
+        await change_broker.enable_pre_images()
+    else:
+        for name, resource_name in RESET_COLLECTIONS.items():
+            await safe_delete_many(db[name], resource_name=resource_name)
+    _columns_invalidated()
+    await bump_data_version(db)
     # Keep settings but reset
-    await db.settings.update_one(
+    await safe_upsert_one(
+        db.settings,
         {"type": "app_settings"},
-        {"$set": AppSettings().model_dump()},
-        upsert=True
+        AppSettings().model_dump(),
+        resource_name="Einstellungen"
     )
+    await request_full_backup(db)
     return {"message": "Alle Daten wurden gelöscht"}
 
 
+@api_router.get("/analytics/price-increases", response_class=NegotiatedResponse)
+async def get_price_increases(months: int = Query(6, ge=1, le=120)):
+    """Get subscriptions whose price rose within the last N months"""
+    increases = await find_price_increases(db, months)
+    if increases:
+        ids = [validate_objectid(entry["subscription_id"], "Abonnement") for entry in increases]
+        subscriptions = await safe_find(
+            db.subscriptions,
+            {"_id": {"$in": ids}},
+            resource_name="Abonnements"
+        )
+        names = {str(sub["_id"]): sub["name"] for sub in subscriptions}
+        # Deleted subscriptions keep their history but are not reported
+        increases = [
+            {**entry, "name": names[entry["subscription_id"]]}
+            for entry in increases
+            if entry["subscription_id"] in names
+        ]
+    return {"months": months, "increases": increases}
+
+
+@api_router.get("/analytics/trend", response_class=NegotiatedResponse)
+async def get_spending_trend(
+    start: Optional[date] = Query(None, alias="from"),
+    end: Optional[date] = Query(None, alias="to"),
+    granularity: Optional[str] = None
+):
+    """Get monthly spending over time from daily snapshots, downsampled to day, week or month"""
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=365)
+    if start > end:
+        raise ValidationError(
+            message="Startdatum liegt nach dem Enddatum",
+            details={"from": start.isoformat(), "to": end.isoformat()}
+        )
+    granularity = choose_granularity(start, end, granularity)
+    points = await spending_trend(db, start, end, granularity)
+    return {
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "granularity": granularity,
+        "points": points
+    }
+
+
+@api_router.get("/admin/slow-queries", dependencies=[Depends(require_admin)])
+async def get_slow_queries():
+    """Slow database operations of this process with sampled explain plans"""
+    return slow_query_log.report()
+
+
+@api_router.delete("/admin/slow-queries", dependencies=[Depends(require_admin)])
+async def clear_slow_queries():
+    """Reset the slow-query log of this process"""
+    slow_query_log.clear()
+    return create_success_response(data={}, message="Langsame Abfragen zurückgesetzt")
+
+
+@api_router.get("/duplicates")
+async def get_duplicates():
+    """Get groups of subscriptions and expenses with the same normalized name"""
+    groups = await find_near_duplicates(db)
+    return {"groups": groups, "count": len(groups)}
+
+
+@api_router.delete("/data/all", dependencies=[Depends(limit_heavy_operation)])
+async def delete_all_data(background: bool = False):
+    """Delete all user data (factory reset)"""
+    if background:
+        return await _submit_job("reset")
+    return await _reset_all_data()
+
+
+# ===== BACKGROUND JOB ENDPOINTS =====
+
+async def _run_import_job(params: Dict[str, Any], ctx: JobContext) -> Dict[str, Any]:
+    return await _import_data(ImportData(**params["payload"]), ctx.report_progress)
+
+
+async def _run_export_job(params: Dict[str, Any], ctx: JobContext) -> Dict[str, Any]:
+    export_data = await _build_export_data()
+    EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+    path = EXPORT_DIR / f"{ctx.job_id}.json"
+    payload = json.dumps(export_data, default=str, ensure_ascii=False)
+    await asyncio.to_thread(path.write_text, payload, encoding="utf-8")
+    return {
+        "location": f"/api/jobs/{ctx.job_id}/result",
+        "subscriptions": len(export_data["subscriptions"]),
+        "expenses": len(export_data["expenses"])
+    }
+
+
+async def _run_reset_job(params: Dict[str, Any], ctx: JobContext) -> Dict[str, Any]:
+    return await _reset_all_data()
+
+
+async def _run_seed_job(params: Dict[str, Any], ctx: JobContext) -> Dict[str, Any]:
+    return await _seed_synthetic_data(params)
+
+
+job_manager.register("import", _run_import_job)
+job_manager.register("export", _run_export_job)
+job_manager.register("reset", _run_reset_job)
+job_manager.register("seed", _run_seed_job)
+
+
+async def _submit_job(
+    job_type: str,
+    params: Optional[Dict[str, Any]] = None,
+    payload: Any = None
+) -> JSONResponse:
+    """Queue a background job and answer with 202 and its status location"""
+    job = await job_manager.submit(job_type, params, payload)
+    location = f"/api/jobs/{job['id']}"
+    return JSONResponse(
+        status_code=202,
+        content={**job, "location": location},
+        headers={"Location": location}
+    )
+
+
+@api_router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get status, progress and result location of a background job"""
+    return serialize_job(await job_manager.get(job_id))
+
+
+@api_router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running background job"""
+    return serialize_job(await job_manager.cancel(job_id))
+
+
+@api_router.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """Download the file produced by a finished export job"""
+    job = await job_manager.get(job_id)
+    path = EXPORT_DIR / f"{job_id}.json"
+    if job["type"] != "export" or job["status"] != JobStatus.SUCCEEDED or not path.exists():
+        raise NotFoundError(resource="Exportdatei", resource_id=job_id)
+    return FileResponse(
+        path,
+        media_type="application/json",
+        filename=f"subtrack-export-{job_id}.json"
+    )
+
+
+# ===== LIVE EVENTS ENDPOINT =====
+
+@api_router.get("/events")
+async def stream_events(request: Request):
+    """Stream change events for subscriptions, expenses and settings (SSE)"""
+    queue = change_broker.subscribe(current_user_id())
+
+    async def event_stream():
+        try:
+            # Tell EventSource clients how long to wait before reconnecting
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(event)
+        finally:
+            change_broker.unsubscribe(queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 # Include the router in the main app
 app.include_router(api_router)
 
@@ -973,15 +2003,44 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Retry-After", "X-Request-ID"],
 )
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(RequestIdMiddleware)
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+# Configure logging; records are written by a background thread
+configure_logging(
+    level=os.environ.get('LOG_LEVEL', 'INFO'),
+    json_format=os.environ.get('LOG_FORMAT', 'json') == 'json'
 )
 logger = logging.getLogger(__name__)
 
+
+@app.on_event("startup")
+async def start_background_workers():
+    await assign_unowned_documents(db)
+    await ensure_indexes(db)
+    await change_broker.enable_pre_images()
+    await run_migrations(db)
+    await job_manager.start()
+    backup_task.start()
+    snapshot_task.start()
+    trash_task.start()
+    job_files_task.start()
+    orphan_task.start()
+    if notification_task:
+        notification_task.start()
+
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    if notification_task:
+        await notification_task.stop()
+    await orphan_task.stop()
+    await job_files_task.stop()
+    await trash_task.stop()
+    await snapshot_task.stop()
+    await backup_task.stop()
+    await job_manager.close()
+    await change_broker.close()
     client.close()
@@ -0,0 +1,35 @@
+"""Cost calculations shared by the analytics endpoints and background jobs."""
+
+from typing import Any, Dict, Iterable, List
+
+
+def monthly_cents(item: Dict[str, Any]) -> int:
+    """Monthly-equivalent amount of a subscription or expense in cents."""
+    if item["billing_cycle"] == "MONTHLY":
+        return item["amount_cents"]
+    return item["amount_cents"] // 12
+
+
+def category_totals(*item_lists: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Sum monthly-equivalent costs per category.
+
+    Args:
+        item_lists: Lists of subscription and/or expense documents
+
+    Returns:
+        Entries with category, monthly_cents and count, most expensive first
+    """
+    categories: Dict[str, Dict[str, int]] = {}
+    for items in item_lists:
+        for item in items:
+            totals = categories.setdefault(item["category"], {"monthly": 0, "count": 0})
+            totals["monthly"] += monthly_cents(item)
+            totals["count"] += 1
+
+    result = [
+        {"category": cat, "monthly_cents": data["monthly"], "count": data["count"]}
+        for cat, data in categories.items()
+    ]
+    result.sort(key=lambda x: x["monthly_cents"], reverse=True)
+    return result
@@ -0,0 +1,135 @@
+"""Columnar Parquet and Arrow IPC export of subscriptions and expenses."""
+
+import asyncio
+import io
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from .constants import EXPORT_BATCH_SIZE, EXPORT_COMPRESSION
+from .database import safe_find_batches
+
+# One table of line items; expenses leave the subscription-only columns empty
+LINE_ITEM_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("kind", pa.dictionary(pa.int8(), pa.string())),
+    ("name", pa.string()),
+    ("category", pa.dictionary(pa.int32(), pa.string())),
+    ("amount_cents", pa.int64()),
+    ("currency", pa.dictionary(pa.int8(), pa.string())),
+    ("billing_cycle", pa.dictionary(pa.int8(), pa.string())),
+    ("start_date", pa.string()),
+    ("notes", pa.string()),
+    ("cancel_url", pa.string()),
+    ("created_at", pa.timestamp("ms")),
+])
+
+_PROJECTION = {name: 1 for name in LINE_ITEM_SCHEMA.names if name not in ("id", "kind")}
+
+FORMATS = {
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+
+def _record_batch(kind: str, docs: List[Dict[str, Any]]) -> pa.RecordBatch:
+    columns: Dict[str, List[Any]] = {
+        "id": [str(doc["_id"]) for doc in docs],
+        "kind": [kind] * len(docs),
+    }
+    for name in _PROJECTION:
+        columns[name] = [doc.get(name) for doc in docs]
+    return pa.RecordBatch.from_pydict(columns, schema=LINE_ITEM_SCHEMA)
+
+
+def line_item_batches(db: AsyncIOMotorDatabase, batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[pa.RecordBatch]:
+    """
+    Yield the current user's subscriptions, then expenses, as typed record batches.
+
+    The user is bound when called, so the batches may be read later.
+    """
+    sources = [
+        (kind, safe_find_batches(db[name], projection=_PROJECTION, batch_size=batch_size, resource_name=resource))
+        for name, kind, resource in (
+            ("subscriptions", "subscription", "Abonnements"),
+            ("expenses", "expense", "Fixkosten"),
+        )
+    ]
+    return _record_batches(sources)
+
+
+async def _record_batches(
+    sources: List[Tuple[str, AsyncIterator[List[Dict[str, Any]]]]]
+) -> AsyncIterator[pa.RecordBatch]:
+    for kind, batches in sources:
+        async for docs in batches:
+            yield _record_batch(kind, docs)
+
+
+class _Drain(io.RawIOBase):
+    """Write-only sink whose contents are taken out after every batch."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        return self._position
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _open_writer(fmt: str, sink: _Drain):
+    if fmt == "parquet":
+        return pq.ParquetWriter(sink, LINE_ITEM_SCHEMA, compression=EXPORT_COMPRESSION)
+    options = ipc.IpcWriteOptions(compression=EXPORT_COMPRESSION)
+    return ipc.new_stream(sink, LINE_ITEM_SCHEMA, options=options)
+
+
+def stream_export(db: AsyncIOMotorDatabase, fmt: str, batch_size: Optional[int] = None) -> AsyncIterator[bytes]:
+    """
+    Encode the current user's line items as a Parquet file or Arrow IPC stream, chunk by chunk.
+
+    Each cursor batch becomes one record batch (a row group in Parquet)
+    that is compressed and sent before the next one is read, so memory
+    stays bounded by the batch size. Encoding runs in a worker thread.
+    The user is bound when called, so a streamed response can send the
+    chunks after the request handler returned.
+
+    Args:
+        db: Database
+        fmt: ``parquet`` or ``arrow``
+        batch_size: Rows per record batch
+    """
+    return _encode(line_item_batches(db, batch_size or EXPORT_BATCH_SIZE), fmt)
+
+
+async def _encode(batches: AsyncIterator[pa.RecordBatch], fmt: str) -> AsyncIterator[bytes]:
+    sink = _Drain()
+    writer = _open_writer(fmt, sink)
+    try:
+        async for batch in batches:
+            await asyncio.to_thread(writer.write_batch, batch)
+            chunk = sink.take()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+    # Parquet footer or end-of-stream marker
+    yield sink.take()
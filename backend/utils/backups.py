@@ -0,0 +1,332 @@
+"""Scheduled full and incremental backups to a local directory."""
+
+import asyncio
+import gzip
+import logging
+import re
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId, json_util
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from .constants import (
+    BACKUP_FULL_INTERVALS,
+    BACKUP_INCREMENTAL_INTERVAL_SECONDS,
+    BACKUP_LOCK_SECONDS,
+    BACKUP_RETAIN_FULL,
+    BACKUP_TOMBSTONE_TTL_SECONDS,
+    TENANT_FIELD,
+)
+from .budgets import invalidate_budgets
+from .database import (
+    safe_count,
+    safe_delete_many,
+    safe_distinct,
+    safe_find,
+    safe_find_batches,
+    safe_find_one,
+    safe_find_one_and_modify,
+    safe_insert_many,
+    safe_insert_one,
+    safe_modify,
+    safe_replace_one,
+)
+from .errors import ConflictError
+from .export_cache import bump_data_version
+from .tenancy import all_users, current_user_id, user_scope
+
+logger = logging.getLogger(__name__)
+
+# Collections whose documents are captured document by document
+BACKED_UP_COLLECTIONS = ["subscriptions", "expenses"]
+
+_FILE_PATTERN = re.compile(r"^(full|incr)-(\d{8}T\d{12})Z\.json\.gz$")
+_TIMESTAMP_FORMAT = "%Y%m%dT%H%M%S%f"
+
+
+async def record_deletion(db: AsyncIOMotorDatabase, collection_name: str, doc_id: str) -> None:
+    """Remember a deleted document so the next incremental backup drops it."""
+    await safe_insert_one(db.backup_tombstones, {
+        "collection": collection_name,
+        "doc_id": doc_id,
+        "deleted_at": datetime.utcnow()
+    }, resource_name="Löschvermerk")
+
+
+async def request_full_backup(db: AsyncIOMotorDatabase) -> None:
+    """
+    Make the next backup of the current user a full snapshot.
+
+    Used after bulk changes (import, reset, demo data) whose documents
+    cannot be told apart by their timestamps.
+    """
+    await _mark_full_required(db, current_user_id())
+
+
+async def _mark_full_required(db: AsyncIOMotorDatabase, user_id: str) -> None:
+    # Backup state is keyed by the user id itself
+    with all_users():
+        await safe_modify(
+            db.backup_state,
+            {"_id": user_id},
+            {"$set": {"full_required": True}},
+            resource_name="Sicherungsstatus",
+            upsert=True,
+            idempotent=True
+        )
+
+
+def _user_directory(directory: Path, user_id: str) -> Path:
+    return directory / re.sub(r"[^A-Za-z0-9_.-]", "_", user_id)
+
+
+def _list_backups(user_dir: Path) -> List[Tuple[datetime, str, Path]]:
+    """Return (taken_at, kind, path) of all backup files, oldest first."""
+    backups = []
+    if user_dir.exists():
+        for path in user_dir.iterdir():
+            match = _FILE_PATTERN.match(path.name)
+            if match:
+                taken_at = datetime.strptime(match.group(2), _TIMESTAMP_FORMAT)
+                backups.append((taken_at, match.group(1), path))
+    return sorted(backups)
+
+
+def _write_snapshot(path: Path, payload: Dict[str, Any]) -> None:
+    data = json_util.dumps(payload, json_options=json_util.RELAXED_JSON_OPTIONS)
+    tmp_path = path.with_suffix(".tmp")
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        f.write(data)
+    tmp_path.replace(path)
+
+
+def _read_snapshot(path: Path) -> Dict[str, Any]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return json_util.loads(f.read())
+
+
+class BackupManager:
+    """
+    Write per-user backups honoring ``AppSettings.backup_interval``.
+
+    A full snapshot is written once per configured interval. In between,
+    incremental snapshots contain only documents created or updated since
+    the previous run plus tombstones of deleted documents, so their cost
+    scales with what changed rather than with the size of the account.
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase, directory: Path):
+        self.db = db
+        self.directory = directory
+
+    async def run_due(self) -> None:
+        """Back up every user whose next snapshot is due."""
+        users = set()
+        with all_users():
+            for name in BACKED_UP_COLLECTIONS + ["settings"]:
+                users.update(await safe_distinct(self.db[name], TENANT_FIELD, resource_name="Benutzer"))
+        for user_id in sorted(users):
+            try:
+                await self.backup_user(user_id)
+            except Exception as e:
+                logger.error("Backup for user %s failed: %s", user_id, e)
+
+    async def backup_user(self, user_id: str, now: Optional[datetime] = None) -> Optional[Path]:
+        """
+        Write a full or incremental snapshot for one user if one is due.
+
+        Returns:
+            Path of the written snapshot, or None if nothing was due,
+            nothing changed since the last snapshot or another process
+            holds the user's backup lock
+        """
+        now = now or datetime.utcnow()
+        try:
+            # Backup state is keyed by the user id itself
+            with all_users():
+                state = await safe_find_one_and_modify(
+                    self.db.backup_state,
+                    {"_id": user_id, "$or": [
+                        {"lock_until": {"$exists": False}},
+                        {"lock_until": {"$lt": now}}
+                    ]},
+                    {"$set": {"lock_until": now + timedelta(seconds=BACKUP_LOCK_SECONDS)}},
+                    resource_name="Sicherungsstatus",
+                    upsert=True
+                )
+        except ConflictError:
+            return None
+
+        try:
+            with user_scope(user_id):
+                settings = await safe_find_one(
+                    self.db.settings,
+                    {"type": "app_settings"},
+                    resource_name="Einstellungen",
+                    projection={"backup_interval": 1}
+                ) or {}
+                full_interval = timedelta(
+                    days=BACKUP_FULL_INTERVALS.get(settings.get("backup_interval"), BACKUP_FULL_INTERVALS["weekly"])
+                )
+                last_full_at = state.get("last_full_at")
+                last_run_at = state.get("last_run_at")
+
+                if (
+                    state.get("full_required")
+                    or last_full_at is None
+                    or now - last_full_at >= full_interval
+                    # Tombstones older than this may already have expired
+                    or now - last_run_at >= timedelta(seconds=BACKUP_TOMBSTONE_TTL_SECONDS)
+                ):
+                    path = await self._write(user_id, now, since=None)
+                    update = {"last_full_at": now, "last_run_at": now, "full_required": False}
+                elif now - last_run_at >= timedelta(seconds=BACKUP_INCREMENTAL_INTERVAL_SECONDS):
+                    path = await self._write(user_id, now, since=last_run_at)
+                    update = {"last_run_at": now}
+                else:
+                    return None
+
+                if path is not None:
+                    # Not part of exports, so the export data version stays
+                    await safe_modify(
+                        self.db.settings,
+                        {"type": "app_settings"},
+                        {"$set": {"last_backup": now.isoformat()}},
+                        resource_name="Einstellungen",
+                        idempotent=True
+                    )
+                with all_users():
+                    await safe_modify(
+                        self.db.backup_state, {"_id": user_id}, {"$set": update},
+                        resource_name="Sicherungsstatus", idempotent=True
+                    )
+                return path
+        finally:
+            with all_users():
+                await safe_modify(
+                    self.db.backup_state,
+                    {"_id": user_id},
+                    {"$unset": {"lock_until": ""}},
+                    resource_name="Sicherungsstatus",
+                    idempotent=True
+                )
+
+    async def _write(self, user_id: str, now: datetime, since: Optional[datetime]) -> Optional[Path]:
+        """Write a snapshot of the current user; an incremental one is skipped (None) if nothing changed."""
+        changed_filter: Dict[str, Any] = {}
+        if since is not None:
+            changed_filter["$or"] = [
+                {"created_at": {"$gt": since}},
+                {"updated_at": {"$gt": since}}
+            ]
+
+        payload: Dict[str, Any] = {
+            "kind": "incremental" if since else "full",
+            TENANT_FIELD: user_id,
+            "taken_at": now,
+            "since": since,
+            "settings": await safe_find_one(self.db.settings, {"type": "app_settings"}, resource_name="Einstellungen"),
+            "deletions": []
+        }
+        for name in BACKED_UP_COLLECTIONS:
+            payload[name] = [
+                doc
+                async for batch in safe_find_batches(self.db[name], changed_filter, resource_name="Einträge")
+                for doc in batch
+            ]
+        if since is not None:
+            payload["deletions"] = await safe_find(
+                self.db.backup_tombstones,
+                {"deleted_at": {"$gt": since}},
+                limit=None,
+                resource_name="Löschvermerke",
+                projection={"_id": 0, "collection": 1, "doc_id": 1}
+            )
+            # Settings keep their change time as an ISO string
+            settings_changed = ((payload["settings"] or {}).get("updated_at") or "") > since.isoformat()
+            if not settings_changed and not payload["deletions"] and not any(
+                payload[name] for name in BACKED_UP_COLLECTIONS
+            ):
+                return None
+
+        user_dir = _user_directory(self.directory, user_id)
+        user_dir.mkdir(parents=True, exist_ok=True)
+        kind = "incr" if since else "full"
+        path = user_dir / f"{kind}-{now.strftime(_TIMESTAMP_FORMAT)}Z.json.gz"
+        await asyncio.to_thread(_write_snapshot, path, payload)
+        if since is None:
+            await asyncio.to_thread(self._prune, user_dir)
+        return path
+
+    @staticmethod
+    def _prune(user_dir: Path) -> None:
+        """Keep the newest full snapshots and everything written after them."""
+        fulls = [taken_at for taken_at, kind, _ in _list_backups(user_dir) if kind == "full"]
+        if len(fulls) <= BACKUP_RETAIN_FULL:
+            return
+        cutoff = fulls[-BACKUP_RETAIN_FULL]
+        for taken_at, _, path in _list_backups(user_dir):
+            if taken_at < cutoff:
+                path.unlink(missing_ok=True)
+
+
+async def restore_backup(
+    db: AsyncIOMotorDatabase,
+    directory: Path,
+    user_id: str,
+    until: Optional[datetime] = None
+) -> Dict[str, int]:
+    """
+    Restore a user's data from the latest full snapshot plus incrementals.
+
+    Args:
+        db: Target database
+        directory: Backup root directory
+        user_id: User whose data is restored (replaced)
+        until: Ignore snapshots taken after this point in time
+
+    Returns:
+        Number of applied snapshots and restored documents per collection
+
+    Raises:
+        FileNotFoundError: If there is no full snapshot to start from
+    """
+    backups = [
+        backup for backup in _list_backups(_user_directory(directory, user_id))
+        if until is None or backup[0] <= until
+    ]
+    full_indexes = [i for i, (_, kind, _) in enumerate(backups) if kind == "full"]
+    if not full_indexes:
+        raise FileNotFoundError(f"Keine vollständige Sicherung für {user_id} gefunden")
+    chain = [path for _, _, path in backups[full_indexes[-1]:]]
+
+    with user_scope(user_id):
+        for i, path in enumerate(chain):
+            snapshot = await asyncio.to_thread(_read_snapshot, path)
+            for name in BACKED_UP_COLLECTIONS:
+                documents = snapshot.get(name) or []
+                if i == 0:
+                    await safe_delete_many(db[name], resource_name="Einträge")
+                    await safe_insert_many(db[name], documents, resource_name="Einträge")
+                else:
+                    for doc in documents:
+                        await safe_replace_one(db[name], {"_id": doc["_id"]}, doc, resource_name="Eintrag", upsert=True)
+            for tombstone in snapshot.get("deletions") or []:
+                await safe_delete_many(
+                    db[tombstone["collection"]], {"_id": ObjectId(tombstone["doc_id"])}, resource_name="Eintrag"
+                )
+            if snapshot.get("settings"):
+                settings = dict(snapshot["settings"])
+                settings.pop("_id", None)
+                await safe_replace_one(
+                    db.settings, {"type": "app_settings"}, settings, resource_name="Einstellungen", upsert=True
+                )
+
+        await _mark_full_required(db, user_id)
+        await bump_data_version(db)
+        await invalidate_budgets(db)
+        counts = {name: await safe_count(db[name], resource_name="Einträge") for name in BACKED_UP_COLLECTIONS}
+    counts["snapshots"] = len(chain)
+    return counts
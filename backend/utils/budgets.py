@@ -0,0 +1,232 @@
+"""Monthly budgets whose spending state is kept up to date by every write."""
+
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from .analytics import category_totals, monthly_cents
+from .constants import MAX_BUDGET_ALERTS, TENANT_FIELD
+from .currency import FxTable, item_currency, load_display_currency
+from .database import safe_find, safe_find_one_and_modify, safe_insert_many, safe_modify
+from .tenancy import current_user_id, user_scope
+
+logger = logging.getLogger(__name__)
+
+# Category of the budget that covers all subscriptions and expenses
+OVERALL = None
+
+_ITEM_PROJECTION = {"category": 1, "amount_cents": 1, "billing_cycle": 1, "currency": 1}
+
+
+def _cost(doc: Optional[Dict[str, Any]], budget: Dict[str, Any], fx: FxTable, display: str) -> int:
+    """Monthly-equivalent cost of an item that counts toward a budget, in its currency."""
+    if doc is None or (budget["category"] is not OVERALL and doc["category"] != budget["category"]):
+        return 0
+    currency = budget["currency"]
+    amount = fx.convert(doc["amount_cents"], item_currency(doc, display), currency)
+    return monthly_cents({"amount_cents": amount, "billing_cycle": doc["billing_cycle"]})
+
+
+def _crossed(budget: Dict[str, Any], spent_before: int) -> List[int]:
+    """Thresholds (percent of the limit) passed on the way up from ``spent_before``."""
+    limit = budget["limit_cents"]
+    return [
+        threshold for threshold in budget["thresholds"]
+        if spent_before * 100 < limit * threshold <= budget["spent_cents"] * 100
+    ]
+
+
+async def _raise_alerts(db: AsyncIOMotorDatabase, budget: Dict[str, Any], spent_before: int) -> int:
+    thresholds = _crossed(budget, spent_before)
+    if not thresholds:
+        return 0
+    now = datetime.utcnow()
+    await safe_insert_many(db.alerts, [
+        {
+            "type": "budget",
+            "budget_id": str(budget["_id"]),
+            "category": budget["category"],
+            "threshold": threshold,
+            "limit_cents": budget["limit_cents"],
+            "spent_cents": budget["spent_cents"],
+            "currency": budget["currency"],
+            "created_at": now,
+        }
+        for threshold in thresholds
+    ], resource_name="Budgetwarnungen")
+    logger.info(
+        "Budget %s crossed %s%%",
+        budget["category"] or "overall",
+        thresholds[-1],
+        extra={"spent_cents": budget["spent_cents"], "limit_cents": budget["limit_cents"]}
+    )
+    return len(thresholds)
+
+
+async def apply_item_change(
+    db: AsyncIOMotorDatabase,
+    fx: FxTable,
+    before: Optional[Dict[str, Any]],
+    after: Optional[Dict[str, Any]]
+) -> int:
+    """
+    Move the monthly cost of one written item between the current user's budgets.
+
+    Only budgets of the item's old and new category and the overall budget
+    are touched, each with one atomic ``$inc`` of the cost difference, so
+    a write never rescans the collections. Budgets left stale by a bulk
+    change have no total to add to and are recomputed instead. Items
+    without a currency count as being in the user's display currency.
+
+    Args:
+        db: Database
+        fx: Exchange rates for items in another currency than a budget
+        before: Item before the write (None when it was created)
+        after: Item after the write (None when it was deleted)
+
+    Returns:
+        Number of alerts raised
+    """
+    categories = {doc["category"] for doc in (before, after) if doc is not None}
+    budgets = await safe_find(
+        db.budgets,
+        {"category": {"$in": [*categories, OVERALL]}},
+        limit=None,
+        resource_name="Budgets"
+    )
+    if not budgets:
+        return 0
+
+    raised = 0
+    stale = {budget["_id"]: budget for budget in budgets if budget.get("stale")}
+    if stale:
+        # The full scan already includes this write
+        for budget in await recompute_budgets(db, fx, stale.values()):
+            raised += len(_crossed(budget, stale[budget["_id"]].get("spent_cents", 0)))
+        budgets = [budget for budget in budgets if budget["_id"] not in stale]
+        if not budgets:
+            return raised
+    display = await load_display_currency(db)
+
+    for budget in budgets:
+        delta = _cost(after, budget, fx, display) - _cost(before, budget, fx, display)
+        if not delta:
+            continue
+        updated = await safe_find_one_and_modify(
+            db.budgets,
+            {"_id": budget["_id"], "stale": {"$ne": True}},
+            {"$inc": {"spent_cents": delta}},
+            resource_name="Budget"
+        )
+        if updated is not None:
+            raised += await _raise_alerts(db, updated, updated["spent_cents"] - delta)
+    return raised
+
+
+async def invalidate_budgets(db: AsyncIOMotorDatabase, user_id: Optional[str] = None) -> None:
+    """Have a user's budgets (default: the current user's) recomputed on their next write or read."""
+    with user_scope(user_id or current_user_id()):
+        await safe_modify(db.budgets, {}, {"$set": {"stale": True}}, resource_name="Budgets", many=True, idempotent=True)
+
+
+async def recompute_budgets(
+    db: AsyncIOMotorDatabase,
+    fx: FxTable,
+    budgets: Iterable[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """
+    Set the spending state of the given budgets of the current user from a full scan.
+
+    Used when a budget is created and after bulk changes or new exchange
+    rates; crossing a threshold here raises alerts like any other write.
+
+    Returns:
+        The budgets with their new state
+    """
+    budgets = list(budgets)
+    if not budgets:
+        return []
+    subscriptions = await safe_find(
+        db.subscriptions, limit=None, resource_name="Abonnements", projection=_ITEM_PROJECTION
+    )
+    expenses = await safe_find(db.expenses, limit=None, resource_name="Fixkosten", projection=_ITEM_PROJECTION)
+    display = await load_display_currency(db)
+
+    totals_by_currency: Dict[str, Dict[Optional[str], int]] = {}
+    updated = []
+    for budget in budgets:
+        currency = budget["currency"]
+        totals = totals_by_currency.get(currency)
+        if totals is None:
+            categories = category_totals(
+                fx.in_currency(subscriptions, currency, display),
+                fx.in_currency(expenses, currency, display)
+            )
+            totals = {entry["category"]: entry["monthly_cents"] for entry in categories}
+            totals[OVERALL] = sum(totals.values())
+            totals_by_currency[currency] = totals
+        spent_before = budget.get("spent_cents", 0)
+        budget = await safe_find_one_and_modify(
+            db.budgets,
+            {"_id": budget["_id"]},
+            {"$set": {"spent_cents": totals.get(budget["category"], 0), "stale": False, "fx_version": fx.version}},
+            resource_name="Budget",
+            idempotent=True
+        )
+        if budget is not None:
+            await _raise_alerts(db, budget, spent_before)
+            updated.append(budget)
+    return updated
+
+
+def describe_budget(budget: Dict[str, Any]) -> Dict[str, Any]:
+    """Status of a budget as returned by the API."""
+    spent, limit = budget["spent_cents"], budget["limit_cents"]
+    reached = [threshold for threshold in budget["thresholds"] if spent * 100 >= limit * threshold]
+    return {
+        "id": str(budget["_id"]),
+        "category": budget["category"],
+        "limit_cents": limit,
+        "spent_cents": spent,
+        "remaining_cents": limit - spent,
+        "percent": round(spent * 100 / limit, 1),
+        "currency": budget["currency"],
+        "thresholds": budget["thresholds"],
+        "reached_threshold": max(reached, default=None),
+        "exceeded": spent > limit,
+    }
+
+
+async def budget_status(db: AsyncIOMotorDatabase, fx: FxTable) -> List[Dict[str, Any]]:
+    """
+    Spending against every budget of the current user.
+
+    Reads only the budget documents; budgets marked stale or computed with
+    other exchange rates are recomputed first.
+    """
+    budgets = await safe_find(db.budgets, limit=None, resource_name="Budgets")
+    outdated = [budget for budget in budgets if budget.get("stale", True) or budget.get("fx_version") != fx.version]
+    if outdated:
+        refreshed = {budget["_id"]: budget for budget in await recompute_budgets(db, fx, outdated)}
+        budgets = [refreshed.get(budget["_id"], budget) for budget in budgets]
+    # Overall budget first, then by category
+    budgets.sort(key=lambda budget: (budget["category"] is not OVERALL, budget["category"] or ""))
+    return [describe_budget(budget) for budget in budgets]
+
+
+async def recent_alerts(db: AsyncIOMotorDatabase, limit: int = MAX_BUDGET_ALERTS) -> List[Dict[str, Any]]:
+    """Budget alerts of the current user, newest first."""
+    alerts = await safe_find(
+        db.alerts,
+        {"type": "budget"},
+        sort_field="created_at",
+        sort_order=-1,
+        limit=min(limit, MAX_BUDGET_ALERTS),
+        resource_name="Budgetwarnungen",
+        projection={TENANT_FIELD: 0}
+    )
+    for alert in alerts:
+        alert["id"] = str(alert.pop("_id"))
+    return alerts
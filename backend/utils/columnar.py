@@ -0,0 +1,279 @@
+"""In-process columnar snapshot of line items for vectorized analytics."""
+
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from .constants import COLUMNAR_MAX_AGE_SECONDS, COLUMNAR_MAX_USERS, FX_SCALE
+from .currency import FxTable
+from .database import safe_find_batches
+from .singleflight import SingleFlight
+from .tenancy import user_scope
+
+# Item kinds, in the order of the collections they come from
+KINDS = {"subscriptions": 0, "expenses": 1}
+CYCLE_MONTHLY = 0
+CYCLE_YEARLY = 1
+
+_PROJECTION = {"amount_cents": 1, "billing_cycle": 1, "category": 1, "currency": 1}
+
+
+def _key(doc_id: ObjectId) -> bytes:
+    """Id as stored in the ``S12`` column, which drops trailing NUL bytes."""
+    return doc_id.binary.rstrip(b"\0")
+
+
+class LineItemColumns:
+    """
+    Subscriptions and expenses of one user as parallel NumPy arrays.
+
+    Per item this holds 12 bytes of id plus 16 bytes of amount, cycle,
+    kind, category and currency code, and nothing else: rows are kept
+    sorted by id, so an id is found by binary search instead of through
+    a per-item Python mapping. Category names and currencies are stored
+    once. Inserting or deleting a row shifts the rows after it; ObjectIds
+    grow over time, so new items usually land at the end. Amounts are
+    kept in their own currency and converted per query with one
+    fixed-point factor per currency.
+    """
+
+    _COLUMNS = ("ids", "amount", "cycle", "kind", "category", "currency")
+
+    def __init__(self, capacity: int = 64):
+        self.size = 0
+        self.built_at = time.monotonic()
+        self.ids = np.zeros(capacity, dtype="S12")
+        self.amount = np.zeros(capacity, dtype=np.int64)
+        self.cycle = np.zeros(capacity, dtype=np.int8)
+        self.kind = np.zeros(capacity, dtype=np.int8)
+        self.category = np.zeros(capacity, dtype=np.int32)
+        self.currency = np.zeros(capacity, dtype=np.int16)
+        self.categories: List[str] = []
+        self._category_codes: Dict[str, int] = {}
+        # "" stands for items without a currency, i.e. in the display currency
+        self.currencies: List[str] = []
+        self._currency_codes: Dict[str, int] = {}
+
+    def _grow(self, needed: int = 1) -> None:
+        capacity = max(64, len(self.amount) * 2, self.size + needed)
+        for name in self._COLUMNS:
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            setattr(self, name, grown)
+
+    @staticmethod
+    def _code(value: str, codes: Dict[str, int], values: List[str]) -> int:
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(values)
+            values.append(value)
+        return code
+
+    def _find(self, key: bytes) -> Tuple[int, bool]:
+        """Row of ``key``, or where it would be inserted, and whether it is present."""
+        row = int(np.searchsorted(self.ids[:self.size], key))
+        return row, row < self.size and self.ids[row] == key
+
+    def _set(self, row: int, kind: int, doc: Dict[str, Any]) -> None:
+        self.amount[row] = doc["amount_cents"]
+        self.cycle[row] = CYCLE_MONTHLY if doc["billing_cycle"] == "MONTHLY" else CYCLE_YEARLY
+        self.kind[row] = kind
+        self.category[row] = self._code(doc["category"], self._category_codes, self.categories)
+        self.currency[row] = self._code(doc.get("currency") or "", self._currency_codes, self.currencies)
+
+    def extend(self, kind: int, docs: List[Dict[str, Any]]) -> None:
+        """
+        Append documents not yet present, e.g. while building from a scan.
+
+        Rows are sorted once by ``finish`` instead of on every append.
+        """
+        if self.size + len(docs) > len(self.amount):
+            self._grow(len(docs))
+        for doc in docs:
+            self.ids[self.size] = _key(doc["_id"])
+            self._set(self.size, kind, doc)
+            self.size += 1
+
+    def finish(self) -> None:
+        """Sort rows by id after ``extend``; of rows with the same id the last appended is kept."""
+        order = np.argsort(self.ids[:self.size], kind="stable")
+        ids = self.ids[:self.size][order]
+        keep = np.ones(self.size, dtype=bool)
+        keep[:-1] = ids[1:] != ids[:-1]
+        order = order[keep]
+        for name in self._COLUMNS:
+            column = getattr(self, name)
+            column[:order.size] = column[:self.size][order]
+        self.size = order.size
+
+    def upsert(self, kind: int, doc: Dict[str, Any]) -> None:
+        """Insert or replace the row of a document."""
+        key = _key(doc["_id"])
+        row, present = self._find(key)
+        if not present:
+            if self.size == len(self.amount):
+                self._grow()
+            for name in self._COLUMNS:
+                column = getattr(self, name)
+                column[row + 1:self.size + 1] = column[row:self.size]
+            self.ids[row] = key
+            self.size += 1
+        self._set(row, kind, doc)
+
+    def remove(self, doc_id: ObjectId) -> None:
+        """Drop the row of a document if present."""
+        row, present = self._find(_key(doc_id))
+        if not present:
+            return
+        for name in self._COLUMNS:
+            column = getattr(self, name)
+            column[row:self.size - 1] = column[row + 1:self.size]
+        self.size -= 1
+
+    def converted(self, fx: FxTable, target: str) -> np.ndarray:
+        """Amount per row in ``target``, rounded half up to whole cents."""
+        amount = self.amount[:self.size]
+        factors = np.array(
+            [FX_SCALE if currency in ("", target) else fx.factor(currency, target) for currency in self.currencies],
+            dtype=np.int64
+        )
+        if not factors.size or (factors == FX_SCALE).all():
+            return amount
+        return (amount * factors[self.currency[:self.size]] + FX_SCALE // 2) // FX_SCALE
+
+    def monthly(self, amount: np.ndarray) -> np.ndarray:
+        """Monthly-equivalent amount per row (yearly amounts floor-divided by 12)."""
+        return np.where(self.cycle[:self.size] == CYCLE_MONTHLY, amount, amount // 12)
+
+    def dashboard(self, fx: FxTable, target: str) -> Dict[str, int]:
+        """Totals in ``target`` in the shape of DashboardSummary."""
+        amount = self.converted(fx, target)
+        monthly = self.monthly(amount)
+        is_subscription = self.kind[:self.size] == KINDS["subscriptions"]
+        is_monthly = self.cycle[:self.size] == CYCLE_MONTHLY
+        monthly_subs = int(monthly[is_subscription].sum())
+        monthly_exps = int(monthly[~is_subscription].sum())
+        return {
+            "monthly_subscriptions": monthly_subs,
+            "monthly_expenses": monthly_exps,
+            "total_monthly": monthly_subs + monthly_exps,
+            "yearly_total": int(amount[is_monthly].sum()) * 12 + int(amount[~is_monthly].sum()),
+            "subscription_count": int(is_subscription.sum()),
+            "expense_count": int(self.size - is_subscription.sum())
+        }
+
+    def category_totals(self, fx: FxTable, target: str) -> List[Dict[str, Any]]:
+        """Per-category monthly totals in ``target`` in the shape of analytics.category_totals."""
+        codes = self.category[:self.size]
+        minlength = len(self.categories)
+        # Float sums are exact far beyond any realistic total (2**53 cents)
+        totals = np.bincount(codes, weights=self.monthly(self.converted(fx, target)), minlength=minlength)
+        counts = np.bincount(codes, minlength=minlength)
+        result = [
+            {"category": self.categories[code], "monthly_cents": int(totals[code]), "count": int(counts[code])}
+            for code in np.flatnonzero(counts)
+        ]
+        result.sort(key=lambda x: x["monthly_cents"], reverse=True)
+        return result
+
+    def top(self, kind: int, limit: int, fx: FxTable, target: str) -> List[ObjectId]:
+        """Ids of the ``limit`` items of ``kind`` with the highest monthly cost in ``target``, highest first."""
+        rows = np.flatnonzero(self.kind[:self.size] == kind)
+        if limit <= 0 or rows.size == 0:
+            return []
+        monthly = self.monthly(self.converted(fx, target))[rows]
+        if rows.size > limit:
+            best = np.argpartition(-monthly, limit - 1)[:limit]
+        else:
+            best = np.arange(rows.size)
+        best = best[np.argsort(-monthly[best], kind="stable")]
+        return [ObjectId(bytes(self.ids[rows[i]]).ljust(12, b"\0")) for i in best]
+
+
+class ColumnarStore:
+    """
+    Columnar snapshots per user, built on first use and kept current by write hooks.
+
+    Snapshots of the least recently used users are dropped beyond
+    ``max_users``. Snapshots older than ``max_age_seconds`` are rebuilt, which
+    bounds staleness from writes made by other processes. Writes made while
+    a snapshot is being built are buffered and replayed on it afterwards.
+    """
+
+    def __init__(
+        self,
+        db: AsyncIOMotorDatabase,
+        max_users: int = COLUMNAR_MAX_USERS,
+        max_age_seconds: float = COLUMNAR_MAX_AGE_SECONDS
+    ):
+        self.db = db
+        self.max_users = max_users
+        self.max_age_seconds = max_age_seconds
+        self._snapshots: "OrderedDict[str, LineItemColumns]" = OrderedDict()
+        self._builds = SingleFlight()
+        # Writes seen during a running build, per user; None once a bulk
+        # change invalidated the build
+        self._pending: Dict[str, Optional[List[Callable[[LineItemColumns], None]]]] = {}
+
+    async def get(self, user_id: str) -> LineItemColumns:
+        """Return the user's snapshot, building it if needed."""
+        columns = self._snapshots.get(user_id)
+        if columns is not None and time.monotonic() - columns.built_at < self.max_age_seconds:
+            self._snapshots.move_to_end(user_id)
+            return columns
+        return await self._builds.do(user_id, lambda: self._build(user_id))
+
+    async def _build(self, user_id: str) -> LineItemColumns:
+        self._pending[user_id] = []
+        try:
+            columns = LineItemColumns()
+            for name, kind in KINDS.items():
+                with user_scope(user_id):
+                    batches = safe_find_batches(self.db[name], projection=_PROJECTION, batch_size=10000)
+                async for docs in batches:
+                    columns.extend(kind, docs)
+            columns.finish()
+        finally:
+            pending = self._pending.pop(user_id)
+        if pending is None:
+            # Read partly before a bulk change: good for this caller only
+            return columns
+        for change in pending:
+            change(columns)
+        self._snapshots[user_id] = columns
+        self._snapshots.move_to_end(user_id)
+        while len(self._snapshots) > self.max_users:
+            self._snapshots.popitem(last=False)
+        return columns
+
+    def _write(self, user_id: str, change: Callable[[LineItemColumns], None]) -> None:
+        columns = self._snapshots.get(user_id)
+        if columns is not None:
+            change(columns)
+        pending = self._pending.get(user_id)
+        if pending is not None:
+            pending.append(change)
+
+    def apply(self, user_id: str, collection_name: str, doc: Dict[str, Any]) -> None:
+        """Write hook for a created or updated document."""
+        kind = KINDS[collection_name]
+        self._write(user_id, lambda columns: columns.upsert(kind, doc))
+
+    def remove(self, user_id: str, doc_id: ObjectId) -> None:
+        """Write hook for a deleted document."""
+        self._write(user_id, lambda columns: columns.remove(doc_id))
+
+    def invalidate(self, user_id: Optional[str] = None) -> None:
+        """Drop snapshots after bulk changes (all users if ``user_id`` is None)."""
+        if user_id is None:
+            self._snapshots.clear()
+            self._pending = dict.fromkeys(self._pending)
+        else:
+            self._snapshots.pop(user_id, None)
+            if user_id in self._pending:
+                self._pending[user_id] = None
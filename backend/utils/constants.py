@@ -19,3 +19,138 @@ MAX_URL_LENGTH = 500
 # Database limits
 MAX_QUERY_LIMIT = 1000
 DEFAULT_SORT_ORDER = 1  # Ascending
+
+# Live change events
+WATCHED_COLLECTIONS = ["subscriptions", "expenses", "settings", "alerts"]
+EVENT_QUEUE_SIZE = 100  # Per-client backlog before a resync is forced
+EVENT_WATCH_MAX_BACKOFF_SECONDS = 30.0
+SSE_KEEPALIVE_SECONDS = 15.0
+
+# Background jobs
+JOB_WORKERS = 2
+JOB_QUEUE_SIZE = 50
+JOB_LEASE_SECONDS = 60  # Running jobs whose lease was not renewed for this long are requeued on start
+JOB_HEARTBEAT_SECONDS = JOB_LEASE_SECONDS / 3  # Lease renewal interval of running jobs
+JOB_SPOOL_DIR_NAME = "job_spool"  # Large job inputs (imports) are kept here, not in the job document
+JOB_FILE_TTL_SECONDS = 24 * 3600  # Export results and leftover spool files are deleted after this
+JOB_FILE_PURGE_INTERVAL_SECONDS = 3600
+EXPORT_DIR_NAME = "exports"
+EXPORT_BATCH_SIZE = 10000  # Rows per record batch of columnar exports
+EXPORT_COMPRESSION = "zstd"  # Codec of Parquet and Arrow IPC exports
+EXPORT_CACHE_DIR_NAME = "export_cache"
+EXPORT_CACHE_MAX_BYTES = 512 * 1024 * 1024  # Cached export files of all users, least recently served evicted
+EXPORT_CACHE_GRACE_SECONDS = 300  # Files served this recently are never deleted, a download may still open them
+IMPORT_BATCH_SIZE = 500
+
+# Read coalescing: seconds a finished result is reused (0 = share in-flight only)
+READ_CACHE_TTL_SECONDS = 0.0
+
+# Database resilience
+DB_READ_TIMEOUT_MS = 2000  # Default deadline per read attempt
+DB_WRITE_TIMEOUT_MS = 5000  # Default deadline per write attempt
+DB_RETRY_ATTEMPTS = 3  # Total attempts for idempotent operations
+DB_RETRY_BASE_DELAY_SECONDS = 0.05
+DB_RETRY_MAX_DELAY_SECONDS = 1.0
+CIRCUIT_FAILURE_RATE = 0.5  # Failure ratio that opens the circuit
+CIRCUIT_MIN_CALLS = 20  # Outcomes needed before the failure rate is trusted
+CIRCUIT_WINDOW_SIZE = 50
+CIRCUIT_COOLDOWN_SECONDS = 10.0
+
+# Multi-tenancy
+TENANT_FIELD = "user_id"
+DEFAULT_USER_ID = "default"  # Owner of all data when authentication is off
+
+# Scheduled backups
+BACKUP_DIR_NAME = "backups"
+BACKUP_CHECK_INTERVAL_SECONDS = 300
+BACKUP_INCREMENTAL_INTERVAL_SECONDS = 3600
+BACKUP_FULL_INTERVALS = {"daily": 1, "weekly": 7, "monthly": 30}  # Days between full snapshots
+BACKUP_RETAIN_FULL = 3  # Full snapshots kept, with their incrementals
+BACKUP_LOCK_SECONDS = 600
+BACKUP_TOMBSTONE_TTL_SECONDS = 40 * 24 * 3600  # Longer than the longest full interval
+
+# Spending trend snapshots
+SNAPSHOT_CHECK_INTERVAL_SECONDS = 3600  # Missing daily snapshots are written on the next check
+MAX_TREND_POINTS = 400  # Upper bound for points of one trend series
+
+# Notification outbox
+DEFAULT_NOTIFICATION_DAYS = [1, 3, 7]  # Reminder offsets before a renewal
+NOTIFICATION_CHECK_INTERVAL_SECONDS = 300
+NOTIFICATION_BATCH_SIZE = 100  # Messages per sink request
+NOTIFICATION_LEASE_SECONDS = 120  # Claimed entries return to the queue after this
+NOTIFICATION_MAX_ATTEMPTS = 6
+NOTIFICATION_RETRY_BASE_SECONDS = 60
+NOTIFICATION_RETRY_MAX_SECONDS = 6 * 3600
+NOTIFICATION_WEBHOOK_TIMEOUT_SECONDS = 10.0
+
+# Idempotency keys
+IDEMPOTENCY_TTL_SECONDS = 24 * 3600  # Responses are replayed for this long
+IDEMPOTENCY_LOCK_SECONDS = 60  # A pending key older than this is taken over
+IDEMPOTENCY_WAIT_SECONDS = 10.0  # Concurrent duplicates wait this long for the first request
+IDEMPOTENCY_POLL_SECONDS = 0.05
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+# Rate limiting and admission control
+RATE_LIMITS = {  # Endpoint class -> (tokens per second, burst) per client
+    "default": (20.0, 100),
+    "heavy": (0.2, 5),
+}
+HEAVY_CONCURRENCY = 2  # Heavy operations running at once per process
+RATE_LIMIT_MAX_CLIENTS = 10000  # Buckets kept in memory, least recently used dropped
+RATE_LIMIT_BUCKET_TTL_SECONDS = 3600  # Shared buckets idle this long are removed
+
+# Synthetic data generation
+SEED_BATCH_SIZE = 10000  # Documents per insert_many
+SEED_PARALLEL_BATCHES = 4  # Batches in flight at once
+SEED_BATCH_TIMEOUT_MS = 60000  # Deadline per insert_many of a full batch
+SEED_MAX_DOCUMENTS = 1_000_000  # Per collection and request
+
+# Factory reset
+TRASH_PREFIX = "trash."  # Namespace of collections renamed away by a fast reset
+TRASH_PURGE_INTERVAL_SECONDS = 300
+
+# Data migrations
+MIGRATION_LOCK_SECONDS = 3600  # A migration claimed by a process that died is run again after this
+
+# Optimistic concurrency
+VERSION_CONFLICT_ATTEMPTS = 3  # Read-modify-write retries for updates without If-Match
+
+# Orphan cleanup
+ORPHAN_SWEEP_INTERVAL_SECONDS = 3600
+ORPHAN_SWEEP_BATCH_SIZE = 1000  # Settings documents examined per aggregation
+
+# Columnar analytics snapshots
+COLUMNAR_MAX_USERS = 1000  # Users with a snapshot in memory, least recently used dropped
+COLUMNAR_MAX_AGE_SECONDS = 60  # Snapshots are rebuilt after this to pick up writes of other processes
+
+# Response compression
+COMPRESSION_MIN_BYTES = 1024  # Smaller bodies are sent as they are
+COMPRESSION_THREAD_MIN_BYTES = 256 * 1024  # Larger bodies are compressed off the event loop
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4  # Fast enough for per-request compression, smaller than gzip
+
+# Logging
+LOG_QUEUE_SIZE = 10000  # Records waiting for the writer thread; more are dropped
+LOG_SAMPLE_BURST = 10  # Warnings and errors per message template and window
+LOG_SAMPLE_WINDOW_SECONDS = 60.0
+LOG_SAMPLE_MAX_KEYS = 1000  # Message templates tracked for sampling
+REQUEST_ID_HEADER = "X-Request-ID"
+REQUEST_ID_MAX_LENGTH = 128  # Longer client-supplied ids are replaced
+
+# Slow-query log
+SLOW_QUERY_THRESHOLD_MS = 100.0  # Operations at least this slow are recorded
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = 0.05  # Share of repeated slow shapes that get explained
+SLOW_QUERY_EXPLAIN_TIMEOUT_MS = 5000
+SLOW_QUERY_MAX_EXPLAINS = 2  # Explains running at once per process
+SLOW_QUERY_LOG_SIZE = 500  # Recent slow operations kept per process
+SLOW_QUERY_MAX_SHAPES = 200  # Query shapes with statistics, least recently seen dropped
+
+# Currencies
+DEFAULT_CURRENCY = "EUR"
+FX_RATES_FILE_NAME = "data/fx_rates.json"  # Relative to the backend directory
+FX_SCALE = 1_000_000  # Fixed-point 1.0 of conversion factors
+FX_RELOAD_CHECK_SECONDS = 60  # How often the rate file is checked for changes
+
+# Budgets
+DEFAULT_BUDGET_THRESHOLDS = [80, 100]  # Percent of the limit that raise an alert when crossed
+MAX_BUDGET_ALERTS = 200  # Alerts returned per request
@@ -0,0 +1,171 @@
+"""Exchange rates from a local file and integer-cent currency conversion."""
+
+import hashlib
+import json
+import logging
+import time
+from decimal import ROUND_HALF_UP, Decimal
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from .constants import DEFAULT_CURRENCY, FX_RELOAD_CHECK_SECONDS, FX_SCALE
+from .database import safe_find_one
+from .errors import ValidationError
+
+logger = logging.getLogger(__name__)
+
+
+def display_currency(settings: Optional[Dict[str, Any]]) -> str:
+    """Currency totals are shown in, from a settings document."""
+    return (settings or {}).get("currency") or DEFAULT_CURRENCY
+
+
+async def load_display_currency(db: AsyncIOMotorDatabase) -> str:
+    """Display currency of the current user."""
+    return display_currency(
+        await safe_find_one(db.settings, {"type": "app_settings"}, resource_name="Einstellungen")
+    )
+
+
+def item_currency(item: Dict[str, Any], display: str) -> str:
+    """
+    Currency of a subscription or expense.
+
+    Items stored before they had a currency are in the user's display
+    currency; totals, budgets and content hashes all follow this rule.
+    """
+    return item.get("currency") or display
+
+
+class FxTable:
+    """
+    One version of the exchange rate table.
+
+    Rates are units of a currency per unit of ``base``. Conversion factors
+    between two currencies are fixed-point integers (``FX_SCALE`` = 1.0),
+    so converting cents needs one multiplication and one integer division
+    and never touches floats.
+    """
+
+    def __init__(self, base: str, rates: Dict[str, Decimal], date: Optional[str], version: str):
+        self.base = base
+        self.rates = rates
+        self.date = date
+        self.version = version
+        self._factors: Dict[Tuple[str, str], int] = {}
+
+    def factor(self, source: str, target: str) -> int:
+        """
+        Fixed-point factor converting amounts in ``source`` to ``target``.
+
+        Raises:
+            ValidationError: If a currency is not in the table
+        """
+        key = (source, target)
+        factor = self._factors.get(key)
+        if factor is None:
+            for currency in key:
+                if currency not in self.rates:
+                    raise ValidationError(
+                        message=f"Kein Wechselkurs für {currency}",
+                        details={"currency": currency, "fx_version": self.version}
+                    )
+            exact = self.rates[target] / self.rates[source] * FX_SCALE
+            factor = self._factors[key] = int(exact.to_integral_value(ROUND_HALF_UP))
+        return factor
+
+    def convert(self, cents: int, source: str, target: str) -> int:
+        """Convert an amount in cents, rounding half up to whole cents."""
+        if source == target:
+            return cents
+        return (cents * self.factor(source, target) + FX_SCALE // 2) // FX_SCALE
+
+    def in_currency(
+        self,
+        items: Iterable[Dict[str, Any]],
+        target: str,
+        display: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Documents with ``amount_cents`` converted to ``target``.
+
+        Items without a currency are in ``display``, the user's display
+        currency (default: ``target``). Items already in ``target`` are
+        passed through, so single-currency data is neither copied nor
+        changed; converted items are copies.
+        """
+        result = []
+        for item in items:
+            source = item_currency(item, display or target)
+            if source == target:
+                result.append(item)
+            else:
+                result.append({
+                    **item,
+                    "amount_cents": self.convert(item["amount_cents"], source, target),
+                    "currency": target,
+                })
+        return result
+
+    def describe(self) -> Dict[str, Any]:
+        """Table as returned by the API."""
+        return {
+            "base": self.base,
+            "date": self.date,
+            "version": self.version,
+            "rates": {currency: str(rate) for currency, rate in sorted(self.rates.items())},
+        }
+
+
+def load_fx_table(path: Path) -> FxTable:
+    """
+    Read a rate table of the form ``{"base", "date", "rates": {code: rate}}``.
+
+    Rates may be strings to keep their exact decimal value.
+    """
+    raw = path.read_bytes()
+    data = json.loads(raw)
+    base = data["base"].upper()
+    rates = {code.upper(): Decimal(str(rate)) for code, rate in data["rates"].items()}
+    rates.setdefault(base, Decimal(1))
+    invalid = [code for code, rate in rates.items() if rate <= 0]
+    if invalid:
+        raise ValueError(f"Ungültige Wechselkurse für {', '.join(invalid)}")
+    version = f"{data.get('date', '')}:{hashlib.sha1(raw).hexdigest()[:8]}"
+    return FxTable(base, rates, data.get("date"), version)
+
+
+class FxRates:
+    """
+    The rate table of a file, cached in memory.
+
+    The file's modification time is checked at most every
+    ``check_interval`` seconds; a changed file is loaded as a new table
+    version. A file that fails to load keeps the previous version.
+    """
+
+    def __init__(self, path: Path, check_interval: float = FX_RELOAD_CHECK_SECONDS):
+        self.path = path
+        self.check_interval = check_interval
+        self._table: Optional[FxTable] = None
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+
+    def table(self) -> FxTable:
+        """Return the current table, reloading the file if it changed."""
+        now = time.monotonic()
+        if self._table is None or now - self._checked_at >= self.check_interval:
+            self._checked_at = now
+            try:
+                mtime = self.path.stat().st_mtime
+                if mtime != self._mtime:
+                    self._table = load_fx_table(self.path)
+                    self._mtime = mtime
+                    logger.info("Loaded exchange rates %s", self._table.version)
+            except (OSError, ValueError, KeyError) as e:
+                if self._table is None:
+                    raise
+                logger.error("Keeping exchange rates %s: %s", self._table.version, e)
+        return self._table
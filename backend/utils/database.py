@@ -1,18 +1,228 @@
-"""Database utilities and helpers for MongoDB operations."""
+"""
+Database utilities and helpers for MongoDB operations.
 
-from typing import Optional, Dict, Any, List
+Every wrapper restricts its filter to the current user and assigns new
+documents to them (see ``tenancy``), so handlers cannot accidentally read
+or modify another user's data.
+"""
+
+from typing import Optional, Dict, Any, List, Callable, Awaitable, AsyncIterator, Tuple, TypeVar
+from collections import deque
 from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import AutoReconnect, BulkWriteError, ConnectionFailure, DuplicateKeyError, ExecutionTimeout
 from datetime import datetime
-from .errors import DatabaseError, NotFoundError
+from .errors import ConflictError, DatabaseError, NotFoundError
+from .tenancy import scoped, stamp
+from .slow_queries import slow_query_log
+from .constants import (
+    DB_READ_TIMEOUT_MS,
+    DB_WRITE_TIMEOUT_MS,
+    DB_RETRY_ATTEMPTS,
+    DB_RETRY_BASE_DELAY_SECONDS,
+    DB_RETRY_MAX_DELAY_SECONDS,
+    CIRCUIT_FAILURE_RATE,
+    CIRCUIT_MIN_CALLS,
+    CIRCUIT_WINDOW_SIZE,
+    CIRCUIT_COOLDOWN_SECONDS
+)
+import asyncio
 import logging
+import random
+import time
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+# Errors worth retrying: the operation never reached a healthy primary.
+# Covers NotPrimaryError, NetworkTimeout and ServerSelectionTimeoutError.
+TRANSIENT_ERRORS = (AutoReconnect,)
+
+# Errors that indicate a slow or unreachable database and count against
+# the circuit breaker. Validation or duplicate key errors do not.
+FAILURE_ERRORS = (ConnectionFailure, ExecutionTimeout, asyncio.TimeoutError)
+
+
+class CircuitBreaker:
+    """
+    Fail fast while the database is unhealthy.
+
+    Outcomes of the most recent operations are kept in a rolling window.
+    Once the failure rate crosses the threshold the circuit opens and
+    every call fails immediately for the cooldown period. After that a
+    single probe call is let through: success closes the circuit, failure
+    opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_rate: float = CIRCUIT_FAILURE_RATE,
+        min_calls: int = CIRCUIT_MIN_CALLS,
+        window_size: int = CIRCUIT_WINDOW_SIZE,
+        cooldown_seconds: float = CIRCUIT_COOLDOWN_SECONDS,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.cooldown_seconds = cooldown_seconds
+        self._clock = clock
+        self._outcomes: deque = deque(maxlen=window_size)
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.state = self.CLOSED
+
+    def reset(self) -> None:
+        """Close the circuit and forget all recorded outcomes."""
+        self._outcomes.clear()
+        self._probe_in_flight = False
+        self.state = self.CLOSED
+
+    def before_call(self) -> None:
+        """
+        Check whether a call may proceed.
+
+        Raises:
+            DatabaseError: If the circuit is open
+        """
+        if self.state == self.CLOSED:
+            return
+        remaining = self._opened_at + self.cooldown_seconds - self._clock()
+        if self.state == self.OPEN and remaining <= 0:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return
+        raise DatabaseError(
+            message="Datenbank vorübergehend nicht erreichbar",
+            details={"circuit": self.state, "retry_after": max(1, round(remaining))}
+        )
+
+    def release_probe(self) -> None:
+        """Let another call probe after one ended without an outcome (e.g. cancelled)."""
+        self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        if self.state == self.HALF_OPEN:
+            self.reset()
+            return
+        self._outcomes.append(True)
+
+    def record_failure(self) -> None:
+        if self.state == self.HALF_OPEN:
+            self._open()
+            return
+        self._outcomes.append(False)
+        if len(self._outcomes) >= self.min_calls:
+            failures = self._outcomes.count(False)
+            if failures / len(self._outcomes) >= self.failure_rate:
+                self._open()
+
+    def _open(self) -> None:
+        logger.warning("Database circuit breaker opened")
+        self.state = self.OPEN
+        self._opened_at = self._clock()
+        self._probe_in_flight = False
+        self._outcomes.clear()
+
+
+# Shared by all wrappers so that one unhealthy database trips every caller
+database_breaker = CircuitBreaker()
+
+
+def _retry_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff for the given (1-based) attempt."""
+    ceiling = min(DB_RETRY_MAX_DELAY_SECONDS, DB_RETRY_BASE_DELAY_SECONDS * 2 ** (attempt - 1))
+    return random.uniform(0, ceiling)
+
+
+def _result_size(result: Any) -> Optional[int]:
+    """Documents returned or affected by an operation."""
+    if isinstance(result, list):
+        return len(result)
+    if result is None:
+        return 0
+    if isinstance(result, dict):
+        return 1
+    for attribute in ("deleted_count", "matched_count"):
+        if hasattr(result, attribute):
+            return getattr(result, attribute)
+    return None
+
+
+async def _execute(
+    call: Callable[[], Awaitable[T]],
+    timeout_ms: int,
+    idempotent: bool,
+    query: Optional[Dict[str, Any]] = None
+) -> T:
+    """
+    Run a database call with a deadline, retries and circuit breaking.
+
+    Args:
+        call: Factory producing a fresh awaitable for each attempt
+        timeout_ms: Deadline per attempt in milliseconds
+        idempotent: Whether the call may safely be repeated after a
+            transient error
+        query: Collection, operation, filter, sort and limit of the call,
+            reported to the slow-query log when an attempt is slow,
+            whether it succeeded, failed or timed out
+
+    Returns:
+        Result of the call
+
+    Raises:
+        DatabaseError: If the circuit is open
+        Exception: The error of the last attempt
+    """
+    attempts = DB_RETRY_ATTEMPTS if idempotent else 1
+    for attempt in range(1, attempts + 1):
+        database_breaker.before_call()
+        started = time.perf_counter()
+        result = None
+        outcome = "error"
+        try:
+            result = await asyncio.wait_for(call(), timeout_ms / 1000)
+            outcome = "ok"
+        except FAILURE_ERRORS as e:
+            if isinstance(e, (ExecutionTimeout, asyncio.TimeoutError)):
+                outcome = "timeout"
+            database_breaker.record_failure()
+            if attempt == attempts or not isinstance(e, TRANSIENT_ERRORS):
+                raise
+            logger.warning("Transient database error (attempt %d/%d): %s", attempt, attempts, e)
+        except Exception:
+            # The database answered; the error is about the request itself
+            database_breaker.record_success()
+            raise
+        except BaseException:
+            # Cancelled before the database answered: neither outcome, but a
+            # half-open probe must not stay claimed forever
+            outcome = "cancelled"
+            database_breaker.release_probe()
+            raise
+        else:
+            database_breaker.record_success()
+            return result
+        finally:
+            # Failed and timed-out attempts are often the slowest of all
+            if query is not None:
+                duration_ms = (time.perf_counter() - started) * 1000
+                returned = _result_size(result) if outcome == "ok" else None
+                slow_query_log.observe(duration_ms=duration_ms, returned=returned, outcome=outcome, **query)
+        await asyncio.sleep(_retry_delay(attempt))
+
 
 async def safe_find_one(
     collection: AsyncIOMotorCollection,
     filter_dict: Dict[str, Any],
-    resource_name: str = "Resource"
+    resource_name: str = "Resource",
+    timeout_ms: int = DB_READ_TIMEOUT_MS,
+    projection: Optional[Dict[str, Any]] = None
 ) -> Optional[Dict[str, Any]]:
     """
     Safely find one document in collection.
@@ -21,6 +231,8 @@ async def safe_find_one(
         collection: MongoDB collection
         filter_dict: Filter criteria
         resource_name: Name of resource for error messages
+        timeout_ms: Deadline for the query in milliseconds
+        projection: Fields to return (None for the whole document)
         
     Returns:
         Document if found, None otherwise
@@ -29,9 +241,17 @@ async def safe_find_one(
         DatabaseError: If database operation fails
     """
     try:
-        return await collection.find_one(filter_dict)
+        scoped_filter = scoped(filter_dict)
+        return await _execute(
+            lambda: collection.find_one(scoped_filter, projection, max_time_ms=timeout_ms),
+            timeout_ms,
+            idempotent=True,
+            query={"collection": collection, "operation": "find_one", "filter_dict": scoped_filter, "limit": 1}
+        )
+    except DatabaseError:
+        raise
     except Exception as e:
-        logger.error(f"Database error in find_one: {str(e)}")
+        logger.error("Database error in find_one: %s", e)
         raise DatabaseError(
             message=f"Fehler beim Abrufen von {resource_name}",
             details={"filter": str(filter_dict), "error": str(e)}
@@ -69,7 +289,8 @@ async def safe_find_one_or_404(
 async def safe_insert_one(
     collection: AsyncIOMotorCollection,
     document: Dict[str, Any],
-    resource_name: str = "Resource"
+    resource_name: str = "Resource",
+    timeout_ms: int = DB_WRITE_TIMEOUT_MS
 ) -> str:
     """
     Safely insert one document.
@@ -78,22 +299,37 @@ async def safe_insert_one(
         collection: MongoDB collection
         document: Document to insert
         resource_name: Name of resource for error messages
+        timeout_ms: Deadline for the write in milliseconds
         
     Returns:
         Inserted document ID as string
         
     Raises:
+        ConflictError: If the document violates a unique index
         DatabaseError: If database operation fails
     """
     try:
         # Add created_at timestamp if not present
         if "created_at" not in document:
             document["created_at"] = datetime.utcnow()
+        stamp(document)
             
-        result = await collection.insert_one(document)
+        # Not retried: a lost acknowledgement could otherwise insert twice
+        result = await _execute(
+            lambda: collection.insert_one(document),
+            timeout_ms,
+            idempotent=False
+        )
         return str(result.inserted_id)
+    except DatabaseError:
+        raise
+    except DuplicateKeyError as e:
+        raise ConflictError(
+            message=f"{resource_name} existiert bereits",
+            details={"key": e.details.get("keyValue") if e.details else None}
+        )
     except Exception as e:
-        logger.error(f"Database error in insert_one: {str(e)}")
+        logger.error("Database error in insert_one: %s", e)
         raise DatabaseError(
             message=f"Fehler beim Erstellen von {resource_name}",
             details={"error": str(e)}
@@ -105,7 +341,8 @@ async def safe_update_one(
     filter_dict: Dict[str, Any],
     update_data: Dict[str, Any],
     resource_name: str = "Resource",
-    resource_id: str = ""
+    resource_id: str = "",
+    timeout_ms: int = DB_WRITE_TIMEOUT_MS
 ) -> bool:
     """
     Safely update one document.
@@ -116,42 +353,135 @@ async def safe_update_one(
         update_data: Data to update
         resource_name: Name of resource for error messages
         resource_id: ID of resource for error details
+        timeout_ms: Deadline for the write in milliseconds
         
     Returns:
         True if updated successfully
         
     Raises:
         NotFoundError: If document not found
+        ConflictError: If the update violates a unique index
         DatabaseError: If database operation fails
     """
     try:
         # Add updated_at timestamp
         update_data["updated_at"] = datetime.utcnow()
         
-        result = await collection.update_one(
-            filter_dict,
-            {"$set": update_data}
+        # A plain $set can be repeated without changing the outcome
+        scoped_filter = scoped(filter_dict)
+        result = await _execute(
+            lambda: collection.update_one(scoped_filter, {"$set": update_data}),
+            timeout_ms,
+            idempotent=True,
+            query={"collection": collection, "operation": "update_one", "filter_dict": scoped_filter}
         )
         
         if result.matched_count == 0:
             raise NotFoundError(resource=resource_name, resource_id=resource_id)
             
         return True
-    except NotFoundError:
+    except (NotFoundError, DatabaseError):
         raise
+    except DuplicateKeyError as e:
+        raise ConflictError(
+            message=f"{resource_name} existiert bereits",
+            details={"key": e.details.get("keyValue") if e.details else None}
+        )
     except Exception as e:
-        logger.error(f"Database error in update_one: {str(e)}")
+        logger.error("Database error in update_one: %s", e)
         raise DatabaseError(
             message=f"Fehler beim Aktualisieren von {resource_name}",
             details={"error": str(e)}
         )
 
 
+async def safe_find_one_and_update(
+    collection: AsyncIOMotorCollection,
+    filter_dict: Dict[str, Any],
+    update_data: Dict[str, Any],
+    resource_name: str = "Resource",
+    resource_id: str = "",
+    expected_version: Optional[int] = None,
+    timeout_ms: int = DB_WRITE_TIMEOUT_MS,
+    return_before: bool = False
+) -> Dict[str, Any]:
+    """
+    Update one document and return it after the update in one round trip.
+    
+    Every update increments the document's ``version`` (documents without
+    one count as version 0). With ``expected_version`` the update only
+    applies if nobody changed the document since that version was read.
+    
+    Args:
+        collection: MongoDB collection
+        filter_dict: Filter criteria
+        update_data: Fields to set
+        resource_name: Name of resource for error messages
+        resource_id: ID of resource for error details
+        expected_version: Version the caller based its change on
+        timeout_ms: Deadline for the write in milliseconds
+        return_before: Return the document as it was before the update
+        
+    Returns:
+        Updated document (or the previous one with ``return_before``)
+        
+    Raises:
+        NotFoundError: If document not found
+        ConflictError: If the version does not match or the update
+            violates a unique index
+        DatabaseError: If database operation fails
+    """
+    query = dict(filter_dict)
+    if expected_version is not None:
+        # $in with None also matches documents that have no version yet
+        query["version"] = {"$in": [expected_version, None]} if expected_version == 0 else expected_version
+    try:
+        update_data["updated_at"] = datetime.utcnow()
+        
+        # Not retried: the version increment must happen exactly once
+        scoped_filter = scoped(query)
+        document = await _execute(
+            lambda: collection.find_one_and_update(
+                scoped_filter,
+                {"$set": update_data, "$inc": {"version": 1}},
+                return_document=ReturnDocument.BEFORE if return_before else ReturnDocument.AFTER
+            ),
+            timeout_ms,
+            idempotent=False,
+            query={"collection": collection, "operation": "find_one_and_update", "filter_dict": scoped_filter}
+        )
+    except DatabaseError:
+        raise
+    except DuplicateKeyError as e:
+        raise ConflictError(
+            message=f"{resource_name} existiert bereits",
+            details={"key": e.details.get("keyValue") if e.details else None}
+        )
+    except Exception as e:
+        logger.error("Database error in find_one_and_update: %s", e)
+        raise DatabaseError(
+            message=f"Fehler beim Aktualisieren von {resource_name}",
+            details={"error": str(e)}
+        )
+    
+    if document is not None:
+        return document
+    if expected_version is not None:
+        current = await safe_find_one(collection, filter_dict, resource_name=resource_name)
+        if current is not None:
+            raise ConflictError(
+                message=f"{resource_name} wurde zwischenzeitlich geändert",
+                details={"id": resource_id, "version": current.get("version", 0)}
+            )
+    raise NotFoundError(resource=resource_name, resource_id=resource_id)
+
+
 async def safe_delete_one(
     collection: AsyncIOMotorCollection,
     filter_dict: Dict[str, Any],
     resource_name: str = "Resource",
-    resource_id: str = ""
+    resource_id: str = "",
+    timeout_ms: int = DB_WRITE_TIMEOUT_MS
 ) -> bool:
     """
     Safely delete one document.
@@ -161,6 +491,7 @@ async def safe_delete_one(
         filter_dict: Filter criteria
         resource_name: Name of resource for error messages
         resource_id: ID of resource for error details
+        timeout_ms: Deadline for the write in milliseconds
         
     Returns:
         True if deleted successfully
@@ -170,29 +501,85 @@ async def safe_delete_one(
         DatabaseError: If database operation fails
     """
     try:
-        result = await collection.delete_one(filter_dict)
+        # Not retried: a repeated delete would report a false 404
+        scoped_filter = scoped(filter_dict)
+        result = await _execute(
+            lambda: collection.delete_one(scoped_filter),
+            timeout_ms,
+            idempotent=False,
+            query={"collection": collection, "operation": "delete_one", "filter_dict": scoped_filter}
+        )
         
         if result.deleted_count == 0:
             raise NotFoundError(resource=resource_name, resource_id=resource_id)
             
         return True
-    except NotFoundError:
+    except (NotFoundError, DatabaseError):
         raise
     except Exception as e:
-        logger.error(f"Database error in delete_one: {str(e)}")
+        logger.error("Database error in delete_one: %s", e)
         raise DatabaseError(
             message=f"Fehler beim Löschen von {resource_name}",
             details={"error": str(e)}
         )
 
 
+async def safe_find_one_and_delete(
+    collection: AsyncIOMotorCollection,
+    filter_dict: Dict[str, Any],
+    resource_name: str = "Resource",
+    resource_id: str = "",
+    timeout_ms: int = DB_WRITE_TIMEOUT_MS
+) -> Dict[str, Any]:
+    """
+    Delete one document and return it in one round trip.
+    
+    Args:
+        collection: MongoDB collection
+        filter_dict: Filter criteria
+        resource_name: Name of resource for error messages
+        resource_id: ID of resource for error details
+        timeout_ms: Deadline for the write in milliseconds
+        
+    Returns:
+        The deleted document
+        
+    Raises:
+        NotFoundError: If document not found
+        DatabaseError: If database operation fails
+    """
+    try:
+        # Not retried: a repeated delete would report a false 404
+        scoped_filter = scoped(filter_dict)
+        document = await _execute(
+            lambda: collection.find_one_and_delete(scoped_filter),
+            timeout_ms,
+            idempotent=False,
+            query={"collection": collection, "operation": "find_one_and_delete", "filter_dict": scoped_filter}
+        )
+    except DatabaseError:
+        raise
+    except Exception as e:
+        logger.error("Database error in find_one_and_delete: %s", e)
+        raise DatabaseError(
+            message=f"Fehler beim Löschen von {resource_name}",
+            details={"error": str(e)}
+        )
+    
+    if document is None:
+        raise NotFoundError(resource=resource_name, resource_id=resource_id)
+    return document
+
+
 async def safe_find(
     collection: AsyncIOMotorCollection,
     filter_dict: Optional[Dict[str, Any]] = None,
     sort_field: Optional[str] = None,
     sort_order: int = 1,
-    limit: int = 1000,
-    resource_name: str = "Resource"
+    limit: Optional[int] = 1000,
+    resource_name: str = "Resource",
+    timeout_ms: int = DB_READ_TIMEOUT_MS,
+    projection: Optional[Dict[str, Any]] = None
 ) -> List[Dict[str, Any]]:
     """
     Safely find multiple documents.
@@ -202,8 +589,10 @@ async def safe_find(
         filter_dict: Filter criteria (None for all documents)
         sort_field: Field to sort by
         sort_order: Sort order (1 for ascending, -1 for descending)
-        limit: Maximum number of documents to return
+        limit: Maximum number of documents to return (None for all)
         resource_name: Name of resource for error messages
+        timeout_ms: Deadline for the query in milliseconds
+        projection: Fields to return (None for whole documents)
         
     Returns:
         List of documents
@@ -211,17 +600,575 @@ async def safe_find(
     Raises:
         DatabaseError: If database operation fails
     """
-    try:
-        filter_dict = filter_dict or {}
-        query = collection.find(filter_dict)
+    filter_dict = scoped(filter_dict)
+    
+    def run_query():
+        query = collection.find(filter_dict, projection, max_time_ms=timeout_ms)
         
         if sort_field:
             query = query.sort(sort_field, sort_order)
+        if limit is not None:
+            query = query.limit(limit)
             
-        return await query.limit(limit).to_list(limit)
+        return query.to_list(limit)
+    
+    try:
+        return await _execute(
+            run_query,
+            timeout_ms,
+            idempotent=True,
+            query={
+                "collection": collection,
+                "operation": "find",
+                "filter_dict": filter_dict,
+                "sort": [(sort_field, sort_order)] if sort_field else None,
+                "limit": limit
+            }
+        )
+    except DatabaseError:
+        raise
+    except Exception as e:
+        logger.error("Database error in find: %s", e)
+        raise DatabaseError(
+            message=f"Fehler beim Abrufen von {resource_name}",
+            details={"error": str(e)}
+        )
+
+
+def safe_find_batches(
+    collection: AsyncIOMotorCollection,
+    filter_dict: Optional[Dict[str, Any]] = None,
+    projection: Optional[Dict[str, Any]] = None,
+    batch_size: int = 1000,
+    resource_name: str = "Resource",
+    timeout_ms: int = DB_READ_TIMEOUT_MS
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Stream matching documents in batches instead of loading them at once.
+    
+    The filter is scoped to the user bound when this is called, so the
+    iterator may be consumed later, e.g. by a streamed response. Every
+    batch is fetched with its own deadline, through the circuit breaker
+    and the slow-query log; a cursor cannot be resumed, so batches are
+    not retried.
+    
+    Args:
+        collection: MongoDB collection
+        filter_dict: Filter criteria (None for all documents)
+        projection: Fields to return (None for whole documents)
+        batch_size: Documents per batch
+        resource_name: Name of resource for error messages
+        timeout_ms: Deadline per batch in milliseconds
+        
+    Returns:
+        Async iterator of non-empty document lists
+        
+    Raises:
+        DatabaseError: If database operation fails (while iterating)
+    """
+    return _find_batches(collection, scoped(filter_dict), projection, batch_size, resource_name, timeout_ms)
+
+
+async def _find_batches(
+    collection: AsyncIOMotorCollection,
+    scoped_filter: Dict[str, Any],
+    projection: Optional[Dict[str, Any]],
+    batch_size: int,
+    resource_name: str,
+    timeout_ms: int
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    cursor = collection.find(scoped_filter, projection, batch_size=batch_size)
+    query = {"collection": collection, "operation": "find", "filter_dict": scoped_filter, "limit": batch_size}
+    try:
+        while True:
+            try:
+                batch = await _execute(lambda: cursor.to_list(batch_size), timeout_ms, idempotent=False, query=query)
+            except DatabaseError:
+                raise
+            except Exception as e:
+                logger.error("Database error in find: %s", e)
+                raise DatabaseError(
+                    message=f"Fehler beim Abrufen von {resource_name}",
+                    details={"error": str(e)}
+                )
+            if not batch:
+                return
+            yield batch
+    finally:
+        await cursor.close()
+
+
+async def safe_insert_many(
+    collection: AsyncIOMotorCollection,
+    documents: List[Dict[str, Any]],
+    resource_name: str = "Resource",
+    timeout_ms: int = DB_WRITE_TIMEOUT_MS,
+    skip_duplicates: bool = False
+) -> List[str]:
+    """
+    Safely insert a batch of documents.
+    
+    Args:
+        collection: MongoDB collection
+        documents: Documents to insert
+        resource_name: Name of resource for error messages
+        timeout_ms: Deadline for the write in milliseconds
+        skip_duplicates: Leave out documents violating a unique index
+            instead of failing
+        
+    Returns:
+        Inserted document IDs as strings
+        
+    Raises:
+        DatabaseError: If database operation fails
+    """
+    if not documents:
+        return []
+    try:
+        now = datetime.utcnow()
+        for document in documents:
+            document.setdefault("created_at", now)
+            stamp(document)
+        
+        result = await _execute(
+            lambda: collection.insert_many(documents, ordered=False),
+            timeout_ms,
+            idempotent=False
+        )
+        return [str(inserted_id) for inserted_id in result.inserted_ids]
+    except DatabaseError:
+        raise
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if not skip_duplicates or any(error.get("code") != 11000 for error in errors):
+            logger.error("Database error in insert_many: %s", e)
+            raise DatabaseError(
+                message=f"Fehler beim Erstellen von {resource_name}",
+                details={"error": str(e)}
+            )
+        # Unordered inserts carry on after a duplicate
+        failed = {error["index"] for error in errors}
+        return [str(doc["_id"]) for i, doc in enumerate(documents) if i not in failed]
+    except Exception as e:
+        logger.error("Database error in insert_many: %s", e)
+        raise DatabaseError(
+            message=f"Fehler beim Erstellen von {resource_name}",
+            details={"error": str(e)}
+        )
+
+
+async def safe_upsert_one(
+    collection: AsyncIOMotorCollection,
+    filter_dict: Dict[str, Any],
+    update_data: Dict[str, Any],
+    resource_name: str = "Resource",
+    timeout_ms: int = DB_WRITE_TIMEOUT_MS
+) -> None:
+    """
+    Safely update one document, creating it if it does not exist.
+    
+    Args:
+        collection: MongoDB collection
+        filter_dict: Filter criteria
+        update_data: Data to set
+        resource_name: Name of resource for error messages
+        timeout_ms: Deadline for the write in milliseconds
+        
+    Raises:
+        DatabaseError: If database operation fails
+    """
+    try:
+        scoped_filter = scoped(filter_dict)
+        await _execute(
+            lambda: collection.update_one(scoped_filter, {"$set": update_data}, upsert=True),
+            timeout_ms,
+            idempotent=True,
+            query={"collection": collection, "operation": "upsert_one", "filter_dict": scoped_filter}
+        )
+    except DatabaseError:
+        raise
+    except Exception as e:
+        logger.error("Database error in upsert_one: %s", e)
+        raise DatabaseError(
+            message=f"Fehler beim Speichern von {resource_name}",
+            details={"error": str(e)}
+        )
+
+
+async def safe_replace_one(
+    collection: AsyncIOMotorCollection,
+    filter_dict: Dict[str, Any],
+    document: Dict[str, Any],
+    resource_name: str = "Resource",
+    upsert: bool = False,
+    timeout_ms: int = DB_WRITE_TIMEOUT_MS
+) -> int:
+    """
+    Safely replace one document as a whole, e.g. when restoring a backup.
+    
+    Args:
+        collection: MongoDB collection
+        filter_dict: Filter criteria
+        document: New document (assigned to the current user)
+        resource_name: Name of resource for error messages
+        upsert: Insert the document if none matches
+        timeout_ms: Deadline for the write in milliseconds
+        
+    Returns:
+        Number of matched documents
+        
+    Raises:
+        DatabaseError: If database operation fails
+    """
+    try:
+        scoped_filter = scoped(filter_dict)
+        stamp(document)
+        result = await _execute(
+            lambda: collection.replace_one(scoped_filter, document, upsert=upsert),
+            timeout_ms,
+            idempotent=True,
+            query={"collection": collection, "operation": "replace_one", "filter_dict": scoped_filter}
+        )
+        return result.matched_count
+    except DatabaseError:
+        raise
     except Exception as e:
-        logger.error(f"Database error in find: {str(e)}")
+        logger.error("Database error in replace_one: %s", e)
+        raise DatabaseError(
+            message=f"Fehler beim Speichern von {resource_name}",
+            details={"error": str(e)}
+        )
+
+
+async def safe_bulk_update(
+    collection: AsyncIOMotorCollection,
+    updates: List[Tuple[Dict[str, Any], Dict[str, Any]]],
+    resource_name: str = "Resource",
+    skip_duplicates: bool = False,
+    timeout_ms: int = DB_WRITE_TIMEOUT_MS
+) -> List[int]:
+    """
+    Safely apply many single-document updates in one unordered round trip.
+    
+    Args:
+        collection: MongoDB collection
+        updates: (filter, update with operators) pairs
+        resource_name: Name of resource for error messages
+        skip_duplicates: Leave out updates violating a unique index
+            instead of failing
+        timeout_ms: Deadline for the write in milliseconds
+        
+    Returns:
+        Positions in ``updates`` that were left out as duplicates
+        
+    Raises:
+        DatabaseError: If database operation fails
+    """
+    if not updates:
+        return []
+    operations = [UpdateOne(scoped(filter_dict), update) for filter_dict, update in updates]
+    try:
+        await _execute(
+            lambda: collection.bulk_write(operations, ordered=False),
+            timeout_ms,
+            idempotent=True
+        )
+        return []
+    except DatabaseError:
+        raise
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if not skip_duplicates or any(error.get("code") != 11000 for error in errors):
+            logger.error("Database error in bulk_write: %s", e)
+            raise DatabaseError(
+                message=f"Fehler beim Aktualisieren von {resource_name}",
+                details={"error": str(e)}
+            )
+        return [error["index"] for error in errors]
+    except Exception as e:
+        logger.error("Database error in bulk_write: %s", e)
+        raise DatabaseError(
+            message=f"Fehler beim Aktualisieren von {resource_name}",
+            details={"error": str(e)}
+        )
+
+
+async def safe_delete_many(
+    collection: AsyncIOMotorCollection,
+    filter_dict: Optional[Dict[str, Any]] = None,
+    resource_name: str = "Resource",
+    timeout_ms: int = DB_WRITE_TIMEOUT_MS
+) -> int:
+    """
+    Safely delete all matching documents of the current user.
+    
+    Args:
+        collection: MongoDB collection
+        filter_dict: Filter criteria (None for all documents)
+        resource_name: Name of resource for error messages
+        timeout_ms: Deadline for the write in milliseconds
+        
+    Returns:
+        Number of deleted documents
+        
+    Raises:
+        DatabaseError: If database operation fails
+    """
+    try:
+        scoped_filter = scoped(filter_dict)
+        result = await _execute(
+            lambda: collection.delete_many(scoped_filter),
+            timeout_ms,
+            idempotent=True,
+            query={"collection": collection, "operation": "delete_many", "filter_dict": scoped_filter}
+        )
+        return result.deleted_count
+    except DatabaseError:
+        raise
+    except Exception as e:
+        logger.error("Database error in delete_many: %s", e)
+        raise DatabaseError(
+            message=f"Fehler beim Löschen von {resource_name}",
+            details={"error": str(e)}
+        )
+
+
+async def safe_modify(
+    collection: AsyncIOMotorCollection,
+    filter_dict: Dict[str, Any],
+    update: Dict[str, Any],
+    resource_name: str = "Resource",
+    many: bool = False,
+    upsert: bool = False,
+    idempotent: bool = False,
+    timeout_ms: int = DB_WRITE_TIMEOUT_MS
+) -> int:
+    """
+    Apply an update with arbitrary operators (``$inc``, ``$push``, ...).
+    
+    Unlike safe_update_one nothing is added to the update, and matching
+    no document is not an error.
+    
+    Args:
+        collection: MongoDB collection
+        filter_dict: Filter criteria
+        update: Update document with operators
+        resource_name: Name of resource for error messages
+        many: Update all matching documents instead of the first
+        upsert: Insert a document if none matches
+        idempotent: Whether repeating the update is harmless (e.g. a
+            plain ``$set``), so it may be retried
+        timeout_ms: Deadline for the write in milliseconds
+        
+    Returns:
+        Number of matched documents
+        
+    Raises:
+        DatabaseError: If database operation fails
+    """
+    operation = "update_many" if many else "update_one"
+    try:
+        scoped_filter = scoped(filter_dict)
+        method = collection.update_many if many else collection.update_one
+        result = await _execute(
+            lambda: method(scoped_filter, update, upsert=upsert),
+            timeout_ms,
+            idempotent=idempotent,
+            query={"collection": collection, "operation": operation, "filter_dict": scoped_filter}
+        )
+        return result.matched_count
+    except DatabaseError:
+        raise
+    except Exception as e:
+        logger.error("Database error in %s: %s", operation, e)
+        raise DatabaseError(
+            message=f"Fehler beim Aktualisieren von {resource_name}",
+            details={"error": str(e)}
+        )
+
+
+async def safe_find_one_and_modify(
+    collection: AsyncIOMotorCollection,
+    filter_dict: Dict[str, Any],
+    update: Dict[str, Any],
+    resource_name: str = "Resource",
+    projection: Optional[Dict[str, Any]] = None,
+    idempotent: bool = False,
+    upsert: bool = False,
+    timeout_ms: int = DB_WRITE_TIMEOUT_MS
+) -> Optional[Dict[str, Any]]:
+    """
+    Apply an update with arbitrary operators to one document and return it afterwards.
+    
+    Args:
+        collection: MongoDB collection
+        filter_dict: Filter criteria
+        update: Update document with operators
+        resource_name: Name of resource for error messages
+        projection: Fields to return (None for the whole document)
+        idempotent: Whether repeating the update is harmless, so it may be retried
+        upsert: Insert a document if none matches
+        timeout_ms: Deadline for the write in milliseconds
+        
+    Returns:
+        Updated document, or None if no document matched
+        
+    Raises:
+        ConflictError: If the upserted document violates a unique index
+        DatabaseError: If database operation fails
+    """
+    try:
+        scoped_filter = scoped(filter_dict)
+        return await _execute(
+            lambda: collection.find_one_and_update(
+                scoped_filter,
+                update,
+                projection=projection,
+                upsert=upsert,
+                return_document=ReturnDocument.AFTER
+            ),
+            timeout_ms,
+            idempotent=idempotent,
+            query={"collection": collection, "operation": "find_one_and_update", "filter_dict": scoped_filter}
+        )
+    except DatabaseError:
+        raise
+    except DuplicateKeyError as e:
+        raise ConflictError(
+            message=f"{resource_name} existiert bereits",
+            details={"key": e.details.get("keyValue") if e.details else None}
+        )
+    except Exception as e:
+        logger.error("Database error in find_one_and_update: %s", e)
+        raise DatabaseError(
+            message=f"Fehler beim Aktualisieren von {resource_name}",
+            details={"error": str(e)}
+        )
+
+
+async def safe_aggregate(
+    collection: AsyncIOMotorCollection,
+    pipeline: List[Dict[str, Any]],
+    resource_name: str = "Resource",
+    timeout_ms: int = DB_READ_TIMEOUT_MS
+) -> List[Dict[str, Any]]:
+    """
+    Safely run an aggregation over the current user's documents.
+    
+    The tenant filter is merged into a leading ``$match`` stage (or one
+    is added), so the pipeline never sees other users' documents; stages
+    like ``$lookup`` must restrict themselves.
+    
+    Args:
+        collection: MongoDB collection
+        pipeline: Aggregation pipeline
+        resource_name: Name of resource for error messages
+        timeout_ms: Deadline for the query in milliseconds
+        
+    Returns:
+        Result documents
+        
+    Raises:
+        DatabaseError: If database operation fails
+    """
+    if pipeline and "$match" in pipeline[0]:
+        scoped_filter = scoped(pipeline[0]["$match"])
+        pipeline = pipeline[1:]
+    else:
+        scoped_filter = scoped()
+    pipeline = [{"$match": scoped_filter}, *pipeline]
+    try:
+        return await _execute(
+            lambda: collection.aggregate(pipeline, maxTimeMS=timeout_ms).to_list(None),
+            timeout_ms,
+            idempotent=True,
+            query={"collection": collection, "operation": "aggregate", "filter_dict": scoped_filter}
+        )
+    except DatabaseError:
+        raise
+    except Exception as e:
+        logger.error("Database error in aggregate: %s", e)
+        raise DatabaseError(
+            message=f"Fehler beim Auswerten von {resource_name}",
+            details={"error": str(e)}
+        )
+
+
+async def safe_distinct(
+    collection: AsyncIOMotorCollection,
+    key: str,
+    filter_dict: Optional[Dict[str, Any]] = None,
+    resource_name: str = "Resource",
+    timeout_ms: int = DB_READ_TIMEOUT_MS
+) -> List[Any]:
+    """
+    Safely collect the distinct values of a field.
+    
+    Args:
+        collection: MongoDB collection
+        key: Field to collect
+        filter_dict: Filter criteria (None for all documents)
+        resource_name: Name of resource for error messages
+        timeout_ms: Deadline for the query in milliseconds
+        
+    Returns:
+        Distinct values
+        
+    Raises:
+        DatabaseError: If database operation fails
+    """
+    try:
+        scoped_filter = scoped(filter_dict)
+        return await _execute(
+            lambda: collection.distinct(key, scoped_filter),
+            timeout_ms,
+            idempotent=True,
+            query={"collection": collection, "operation": "distinct", "filter_dict": scoped_filter}
+        )
+    except DatabaseError:
+        raise
+    except Exception as e:
+        logger.error("Database error in distinct: %s", e)
         raise DatabaseError(
             message=f"Fehler beim Abrufen von {resource_name}",
             details={"error": str(e)}
         )
+
+
+async def safe_count(
+    collection: AsyncIOMotorCollection,
+    filter_dict: Optional[Dict[str, Any]] = None,
+    resource_name: str = "Resource",
+    timeout_ms: int = DB_READ_TIMEOUT_MS
+) -> int:
+    """
+    Safely count matching documents of the current user.
+    
+    Args:
+        collection: MongoDB collection
+        filter_dict: Filter criteria (None for all documents)
+        resource_name: Name of resource for error messages
+        timeout_ms: Deadline for the query in milliseconds
+        
+    Returns:
+        Number of matching documents
+        
+    Raises:
+        DatabaseError: If database operation fails
+    """
+    try:
+        scoped_filter = scoped(filter_dict)
+        return await _execute(
+            lambda: collection.count_documents(scoped_filter, maxTimeMS=timeout_ms),
+            timeout_ms,
+            idempotent=True,
+            query={"collection": collection, "operation": "count", "filter_dict": scoped_filter}
+        )
+    except DatabaseError:
+        raise
+    except Exception as e:
+        logger.error("Database error in count: %s", e)
+        raise DatabaseError(
+            message=f"Fehler beim Zählen von {resource_name}",
+            details={"error": str(e)}
+        )
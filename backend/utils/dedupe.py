@@ -0,0 +1,173 @@
+"""Content hashes for duplicate detection of subscriptions and expenses."""
+
+import hashlib
+import logging
+import re
+import unicodedata
+from typing import Any, Dict, List, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorDatabase
+
+from .constants import DEFAULT_CURRENCY, DEFAULT_USER_ID, TENANT_FIELD
+from .currency import item_currency, load_display_currency
+from .database import safe_aggregate, safe_bulk_update, safe_find, safe_find_batches
+from .tenancy import all_users, user_scope
+
+logger = logging.getLogger(__name__)
+
+# Fields that make two documents the same entry
+HASHED_FIELDS = ("name", "category", "amount_cents", "billing_cycle", "start_date", "currency")
+# Expenses have no start date
+EXPENSE_HASHED_FIELDS = tuple(field for field in HASHED_FIELDS if field != "start_date")
+DEDUPED_COLLECTIONS = ["subscriptions", "expenses"]
+
+_BACKFILL_BATCH_SIZE = 1000
+
+
+def normalize_text(value: Optional[str]) -> str:
+    """Case-, accent-form- and whitespace-insensitive form of a text field."""
+    if not value:
+        return ""
+    text = unicodedata.normalize("NFKC", value).casefold()
+    return re.sub(r"[\W_]+", " ", text).strip()
+
+
+def _plain(value: Any) -> str:
+    # Enum members (billing cycle) hash like their value
+    return str(getattr(value, "value", value) if value is not None else "")
+
+
+def content_hash(doc: Dict[str, Any], display_currency: str) -> str:
+    """Hash of the normalized HASHED_FIELDS of a document of a user with ``display_currency``."""
+    parts = [
+        normalize_text(doc.get("name")),
+        normalize_text(doc.get("category")),
+        _plain(doc.get("amount_cents")),
+        _plain(doc.get("billing_cycle")),
+        _plain(doc.get("start_date")),
+    ]
+    # Only foreign currencies are hashed, so hashes of entries stored
+    # before items had a currency stay valid
+    currency = item_currency(doc, display_currency)
+    if currency != DEFAULT_CURRENCY:
+        parts.append(currency)
+    return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def dedupe_fields(doc: Dict[str, Any], display_currency: str) -> Dict[str, str]:
+    """Stored dedupe fields: exact content hash and near-duplicate name key."""
+    return {"content_hash": content_hash(doc, display_currency), "name_key": normalize_text(doc.get("name"))}
+
+
+def split_duplicates(
+    documents: List[Dict[str, Any]],
+    existing_hashes: set
+) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Drop documents whose hash exists already or occurs earlier in the list.
+
+    Returns:
+        Documents to insert and number of skipped duplicates
+    """
+    seen = set(existing_hashes)
+    unique = []
+    for doc in documents:
+        if doc["content_hash"] in seen:
+            continue
+        seen.add(doc["content_hash"])
+        unique.append(doc)
+    return unique, len(documents) - len(unique)
+
+
+async def existing_hashes(collection: AsyncIOMotorCollection, hashes: List[str]) -> set:
+    """Hashes of the current user that are already stored (one index lookup per hash)."""
+    if not hashes:
+        return set()
+    docs = await safe_find(
+        collection,
+        {"content_hash": {"$in": hashes}},
+        limit=None,
+        resource_name="Einträge",
+        projection={"_id": 0, "content_hash": 1}
+    )
+    return {doc["content_hash"] for doc in docs}
+
+
+async def find_near_duplicates(db: AsyncIOMotorDatabase) -> List[Dict[str, Any]]:
+    """
+    Group the current user's entries that share a normalized name.
+
+    Grouping runs in the database over the (user, name_key) index, so the
+    cost is linear in the number of entries.
+
+    Returns:
+        One group per collection and name with its entries; ``exact`` is
+        True when all entries have identical content
+    """
+    groups = []
+    for name in DEDUPED_COLLECTIONS:
+        pipeline = [
+            {"$match": {"name_key": {"$exists": True}}},
+            {"$group": {
+                "_id": "$name_key",
+                "count": {"$sum": 1},
+                "hashes": {"$addToSet": "$content_hash"},
+                "entries": {"$push": {
+                    "id": {"$toString": "$_id"},
+                    "name": "$name",
+                    "category": "$category",
+                    "amount_cents": "$amount_cents",
+                    "billing_cycle": "$billing_cycle",
+                    "start_date": "$start_date"
+                }}
+            }},
+            {"$match": {"count": {"$gt": 1}}},
+            {"$sort": {"count": -1, "_id": 1}}
+        ]
+        for group in await safe_aggregate(db[name], pipeline, resource_name="Einträge"):
+            groups.append({
+                "collection": name,
+                "name_key": group["_id"],
+                "count": group["count"],
+                "exact": len(group["hashes"]) == 1,
+                "entries": group["entries"]
+            })
+    return groups
+
+
+async def backfill_dedupe_fields(db: AsyncIOMotorDatabase) -> None:
+    """Add dedupe fields to documents stored before duplicate detection (a one-off migration)."""
+    projection = {field: 1 for field in HASHED_FIELDS + (TENANT_FIELD,)}
+    # Owner -> display currency, which items without a currency are in
+    currencies: Dict[str, str] = {}
+    for name in DEDUPED_COLLECTIONS:
+        with all_users():
+            batches = safe_find_batches(
+                db[name],
+                {"name_key": {"$exists": False}},
+                projection=projection,
+                batch_size=_BACKFILL_BATCH_SIZE,
+                resource_name="Einträge"
+            )
+        async for batch in batches:
+            await _backfill_batch(db, db[name], batch, currencies)
+
+
+async def _backfill_batch(
+    db: AsyncIOMotorDatabase,
+    collection: AsyncIOMotorCollection,
+    docs: List[Dict[str, Any]],
+    currencies: Dict[str, str]
+) -> None:
+    by_owner: Dict[str, List[Dict[str, Any]]] = {}
+    for doc in docs:
+        by_owner.setdefault(doc.get(TENANT_FIELD, DEFAULT_USER_ID), []).append(doc)
+    for owner, owned in by_owner.items():
+        with user_scope(owner):
+            if owner not in currencies:
+                currencies[owner] = await load_display_currency(db)
+            await safe_bulk_update(
+                collection,
+                [({"_id": doc["_id"]}, {"$set": dedupe_fields(doc, currencies[owner])}) for doc in owned],
+                resource_name="Einträge"
+            )
@@ -16,12 +16,14 @@ class SubTrackException(Exception):
         message: str, 
         status_code: int = 500,
         error_code: str = "INTERNAL_ERROR",
-        details: Optional[Dict[str, Any]] = None
+        details: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None
     ):
         self.message = message
         self.status_code = status_code
         self.error_code = error_code
         self.details = details or {}
+        self.headers = headers
         super().__init__(self.message)
 
 
@@ -37,6 +39,31 @@ class ValidationError(SubTrackException):
         )
 
 
+class AuthenticationError(SubTrackException):
+    """Raised when a request cannot be attributed to a user."""
+    
+    def __init__(self, message: str, details: Optional[Dict[str, Any]] = None):
+        super().__init__(
+            message=message,
+            status_code=401,
+            error_code="UNAUTHORIZED",
+            details=details,
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+
+
+class PermissionDeniedError(SubTrackException):
+    """Raised when the authenticated user may not use an endpoint."""
+    
+    def __init__(self, message: str, details: Optional[Dict[str, Any]] = None):
+        super().__init__(
+            message=message,
+            status_code=403,
+            error_code="FORBIDDEN",
+            details=details
+        )
+
+
 class NotFoundError(SubTrackException):
     """Raised when a resource is not found."""
     
@@ -49,6 +76,24 @@ class NotFoundError(SubTrackException):
         )
 
 
+class ConflictError(SubTrackException):
+    """Raised when a request conflicts with the current state of a resource."""
+    
+    def __init__(
+        self,
+        message: str,
+        details: Optional[Dict[str, Any]] = None,
+        retry_after: Optional[int] = None
+    ):
+        super().__init__(
+            message=message,
+            status_code=409,
+            error_code="CONFLICT",
+            details=details,
+            headers={"Retry-After": str(retry_after)} if retry_after else None
+        )
+
+
 class DatabaseError(SubTrackException):
     """Raised when a database operation fails."""
     
@@ -61,14 +106,43 @@ class DatabaseError(SubTrackException):
         )
 
 
+class ServiceUnavailableError(SubTrackException):
+    """Raised when the server is temporarily unable to accept more work."""
+    
+    def __init__(self, message: str, retry_after: int = 1, details: Optional[Dict[str, Any]] = None):
+        super().__init__(
+            message=message,
+            status_code=503,
+            error_code="SERVICE_UNAVAILABLE",
+            details=details,
+            headers={"Retry-After": str(retry_after)}
+        )
+
+
+class RateLimitError(SubTrackException):
+    """Raised when a client sends more requests than its rate allows."""
+    
+    def __init__(self, message: str, retry_after: int = 1, details: Optional[Dict[str, Any]] = None):
+        super().__init__(
+            message=message,
+            status_code=429,
+            error_code="RATE_LIMITED",
+            details=details,
+            headers={"Retry-After": str(retry_after)}
+        )
+
+
 async def subtrack_exception_handler(request: Request, exc: SubTrackException) -> JSONResponse:
     """Handle SubTrack custom exceptions."""
     logger.error(
-        f"SubTrack error: {exc.error_code} - {exc.message}",
+        "SubTrack error: %s - %s",
+        exc.error_code,
+        exc.message,
         extra={
             "path": request.url.path,
             "method": request.method,
             "error_code": exc.error_code,
+            "status_code": exc.status_code,
             "details": exc.details
         }
     )
@@ -82,14 +156,17 @@ async def subtrack_exception_handler(request: Request, exc: SubTrackException) -
                 "message": exc.message,
                 "details": exc.details
             }
-        }
+        },
+        headers=exc.headers
     )
 
 
 async def http_exception_handler(request: Request, exc: HTTPException) -> JSONResponse:
     """Handle FastAPI HTTP exceptions."""
     logger.warning(
-        f"HTTP error: {exc.status_code} - {exc.detail}",
+        "HTTP error: %s - %s",
+        exc.status_code,
+        exc.detail,
         extra={
             "path": request.url.path,
             "method": request.method,
@@ -113,10 +190,12 @@ async def http_exception_handler(request: Request, exc: HTTPException) -> JSONRe
 async def general_exception_handler(request: Request, exc: Exception) -> JSONResponse:
     """Handle unexpected exceptions."""
     logger.exception(
-        f"Unexpected error: {str(exc)}",
+        "Unexpected error: %s",
+        exc,
         extra={
             "path": request.url.path,
-            "method": request.method
+            "method": request.method,
+            "status_code": 500
         }
     )
     
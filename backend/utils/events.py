@@ -0,0 +1,238 @@
+"""Live change events for connected clients, fed by MongoDB change streams."""
+
+import asyncio
+import json
+import logging
+from typing import Any, Dict, List, Optional, Set
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import OperationFailure, PyMongoError
+
+from .constants import (
+    EVENT_QUEUE_SIZE,
+    EVENT_WATCH_MAX_BACKOFF_SECONDS,
+    TENANT_FIELD,
+    WATCHED_COLLECTIONS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Server errors meaning a change stream cannot continue from its resume
+# token (ChangeStreamFatalError, ChangeStreamHistoryLost)
+_RESUME_FAILED_CODES = (280, 286)
+
+# Change stream operation types mapped to the compact client-facing names
+_OPERATIONS = {
+    "insert": "insert",
+    "replace": "update",
+    "update": "update",
+    "delete": "delete",
+}
+
+
+def to_change_event(change: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Reduce a raw change stream document to a compact change event.
+
+    Args:
+        change: Change document as delivered by MongoDB
+
+    Returns:
+        Event with collection, operation, id and changed fields, a
+        ``resync`` event for dropped or renamed collections, or None if the
+        change is not relevant for clients
+    """
+    if change.get("operationType") in ("drop", "rename"):
+        # Collection-level reset: clients have to refetch everything
+        return {"collection": change["ns"]["coll"], "op": "resync"}
+
+    op = _OPERATIONS.get(change.get("operationType"))
+    if op is None:
+        return None
+
+    fields: Dict[str, Any] = {}
+    if change["operationType"] in ("insert", "replace"):
+        fields = dict(change.get("fullDocument") or {})
+        fields.pop("_id", None)
+        fields.pop(TENANT_FIELD, None)
+    elif op == "update":
+        description = change.get("updateDescription") or {}
+        fields = dict(description.get("updatedFields") or {})
+        for removed in description.get("removedFields") or []:
+            fields[removed] = None
+
+    return {
+        "collection": change["ns"]["coll"],
+        "op": op,
+        "id": str(change["documentKey"]["_id"]),
+        "fields": fields,
+    }
+
+
+def event_owner(change: Dict[str, Any]) -> Optional[str]:
+    """
+    Return the user a change belongs to, if it can be determined.
+
+    Inserts, replaces and (with ``updateLookup``) updates carry the full
+    document. Deletes, and updates of documents deleted in the meantime,
+    only carry it as the pre-image, if pre-images are enabled.
+    """
+    document = change.get("fullDocument") or change.get("fullDocumentBeforeChange") or {}
+    return document.get(TENANT_FIELD)
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """
+    Serialize an event as a Server-Sent Events message.
+
+    Args:
+        event: Change event to serialize
+
+    Returns:
+        SSE frame terminated by a blank line
+    """
+    data = json.dumps(event, default=str, separators=(",", ":"))
+    return f"event: {event['op']}\ndata: {data}\n\n"
+
+
+class ChangeEventBroker:
+    """
+    Fan out change events from a single change stream to all connected clients.
+
+    One watcher task per process follows the watched collections and pushes
+    each event into a bounded queue per client. A client that falls behind
+    has its backlog replaced by a single ``resync`` event instead of
+    slowing down the watcher or growing memory without limit.
+
+    Clients only receive events for their own user. The owner of a delete
+    is taken from the document's pre-image (see enable_pre_images); events
+    whose owner is unknown are dropped, never broadcast. Only ``resync``
+    events, which carry no data, go to everyone.
+    """
+
+    def __init__(
+        self,
+        database: AsyncIOMotorDatabase,
+        collections: List[str] = WATCHED_COLLECTIONS,
+        queue_size: int = EVENT_QUEUE_SIZE
+    ):
+        self._db = database
+        self._collections = list(collections)
+        self._queue_size = queue_size
+        self._clients: Dict[str, Set[asyncio.Queue]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._pre_images = False
+
+    @property
+    def client_count(self) -> int:
+        return sum(len(queues) for queues in self._clients.values())
+
+    async def enable_pre_images(self) -> bool:
+        """
+        Have the watched collections record pre-images, so deletes have a known owner.
+
+        Needs MongoDB 6.0 or newer; without pre-images clients are not told
+        about deletes and refetch on their next resync.
+
+        Returns:
+            Whether pre-images are available for all watched collections
+        """
+        existing = set(await self._db.list_collection_names())
+        try:
+            for name in self._collections:
+                if name not in existing:
+                    await self._db.create_collection(name)
+                await self._db.command({"collMod": name, "changeStreamPreAndPostImages": {"enabled": True}})
+        except PyMongoError as e:
+            logger.warning("Change stream pre-images unavailable, delete events are not sent: %s", e)
+            return False
+        self._pre_images = True
+        return True
+
+    def subscribe(self, user_id: str) -> asyncio.Queue:
+        """Register a client of ``user_id`` and start the watcher if needed."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self._queue_size)
+        self._clients.setdefault(user_id, set()).add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._watch())
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        """Remove a client; the watcher stops once the last client has left."""
+        for user_id, queues in list(self._clients.items()):
+            queues.discard(queue)
+            if not queues:
+                del self._clients[user_id]
+        if not self._clients and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def publish(self, event: Dict[str, Any], user_id: Optional[str] = None) -> None:
+        """
+        Deliver an event without blocking.
+
+        Args:
+            event: Change event
+            user_id: Owner of the change; None delivers a ``resync`` event
+                to every client and drops any other event
+        """
+        if user_id is None:
+            if event.get("op") != "resync":
+                logger.debug("Dropping %s event without owner in %s", event.get("op"), event.get("collection"))
+                return
+            targets = [q for queues in self._clients.values() for q in queues]
+        else:
+            targets = list(self._clients.get(user_id, ()))
+        for queue in targets:
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Client is too slow: drop its backlog and ask it to refetch
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"op": "resync"})
+
+    async def close(self) -> None:
+        """Stop the watcher task."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._clients.clear()
+
+    async def _watch(self) -> None:
+        pipeline = [{"$match": {"ns.coll": {"$in": self._collections}}}]
+        options: Dict[str, Any] = {"full_document": "updateLookup"}
+        if self._pre_images:
+            options["full_document_before_change"] = "whenAvailable"
+        # Position after the last delivered change; a reopened stream
+        # continues there, so clients need no resync after a reconnect
+        resume_token = None
+        backoff = 1.0
+        while True:
+            try:
+                watch_options = dict(options, resume_after=resume_token) if resume_token else options
+                async with self._db.watch(pipeline, **watch_options) as stream:
+                    backoff = 1.0
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        event = to_change_event(change)
+                        if event is not None:
+                            self.publish(event, event_owner(change))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if isinstance(e, OperationFailure) and e.code in _RESUME_FAILED_CODES:
+                    # The position fell out of the oplog: start over from now
+                    resume_token = None
+                if resume_token is None:
+                    logger.warning("Change stream interrupted: %s", e)
+                    # Events may have been missed while disconnected
+                    self.publish({"op": "resync"})
+                else:
+                    logger.warning("Change stream interrupted, resuming after the last event: %s", e)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, EVENT_WATCH_MAX_BACKOFF_SECONDS)
@@ -0,0 +1,133 @@
+"""On-disk cache of export files, keyed by a per-user data version."""
+
+import asyncio
+import logging
+import os
+import re
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from .constants import EXPORT_CACHE_GRACE_SECONDS, EXPORT_CACHE_MAX_BYTES
+from .database import safe_find_one, safe_modify
+from .singleflight import SingleFlight
+from .tenancy import all_users, current_user_id
+
+logger = logging.getLogger(__name__)
+
+
+async def bump_data_version(db: AsyncIOMotorDatabase, user_id: Optional[str] = None) -> None:
+    """Mark a user's data (default: the current user's) as changed; called by every write path."""
+    key = user_id or current_user_id()
+    # Keyed by the user id itself; a repeated increment only costs one rebuild
+    with all_users():
+        await safe_modify(
+            db.data_versions,
+            {"_id": key},
+            {"$inc": {"version": 1}},
+            resource_name="Datenstand",
+            upsert=True,
+            idempotent=True
+        )
+
+
+async def data_version(db: AsyncIOMotorDatabase) -> int:
+    """Current data version of the current user (0 before the first write)."""
+    key = current_user_id()
+    with all_users():
+        doc = await safe_find_one(db.data_versions, {"_id": key}, resource_name="Datenstand")
+    return doc["version"] if doc else 0
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_bytes(data)
+    tmp_path.replace(path)
+
+
+class ExportCache:
+    """
+    Export artifacts on local disk, one file per user, artifact and data version.
+
+    Callers read the data version before the data, so a cached file never
+    reflects data older than its version. Files of superseded versions are
+    deleted when a newer version is stored; beyond ``max_bytes`` the least
+    recently served files go first (file mtime is touched on every hit).
+    A file served within ``grace_seconds`` is never deleted, since the
+    response that is about to send it may not have opened it yet.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        max_bytes: int = EXPORT_CACHE_MAX_BYTES,
+        grace_seconds: float = EXPORT_CACHE_GRACE_SECONDS
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.grace_seconds = grace_seconds
+        self._builds = SingleFlight()
+
+    def _user_dir(self, user_id: str) -> Path:
+        return self.directory / re.sub(r"[^A-Za-z0-9_.-]", "_", user_id)
+
+    async def get(
+        self,
+        user_id: str,
+        version: int,
+        artifact: str,
+        build: Callable[[], Awaitable[bytes]]
+    ) -> Path:
+        """
+        Path of the artifact for ``version``, building and storing it on a miss.
+
+        Args:
+            user_id: Owner of the data
+            version: Data version the artifact must reflect
+            artifact: File name of the artifact (e.g. ``export.json.gz``)
+            build: Coroutine function producing the file contents
+
+        Returns:
+            Path of the cached file
+        """
+        path = self._user_dir(user_id) / f"v{version}-{artifact}"
+        if path.exists():
+            os.utime(path)
+            return path
+        return await self._builds.do(path, lambda: self._store(path, artifact, build))
+
+    async def _store(self, path: Path, artifact: str, build: Callable[[], Awaitable[bytes]]) -> Path:
+        data = await build()
+        await asyncio.to_thread(_write_atomic, path, data)
+        await asyncio.to_thread(self._evict, path, artifact)
+        return path
+
+    def _evict(self, keep: Path, artifact: str) -> None:
+        files = []
+        for path in self.directory.glob("*/v*-*"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        cutoff = time.time() - self.grace_seconds
+        remaining = []
+        for mtime, size, path in sorted(files):
+            if path == keep or mtime >= cutoff:
+                continue
+            # Older versions of the same artifact can never be served again
+            if path.parent == keep.parent and path.name.endswith(f"-{artifact}"):
+                path.unlink(missing_ok=True)
+                total -= size
+            else:
+                remaining.append((size, path))
+        for size, path in remaining:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            logger.info("Evicted cached export %s", path)
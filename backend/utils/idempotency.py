@@ -0,0 +1,178 @@
+"""Replay of responses for retried requests carrying an Idempotency-Key."""
+
+import asyncio
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from .constants import (
+    IDEMPOTENCY_KEY_MAX_LENGTH,
+    IDEMPOTENCY_LOCK_SECONDS,
+    IDEMPOTENCY_POLL_SECONDS,
+    IDEMPOTENCY_TTL_SECONDS,
+    IDEMPOTENCY_WAIT_SECONDS,
+    TENANT_FIELD,
+)
+from .errors import ConflictError, ValidationError
+from .tenancy import current_user_id
+
+logger = logging.getLogger(__name__)
+
+REPLAY_HEADER = "Idempotent-Replayed"
+
+# Response headers stored with a result and sent again on replay
+REPLAYED_HEADERS = ("location", "content-location")
+
+
+def request_fingerprint(route: str, payload: Any) -> str:
+    """Hash identifying the request a key was first used with."""
+    body = json.dumps(jsonable_encoder(payload), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{route}\n{body}".encode("utf-8")).hexdigest()
+
+
+async def run_idempotent(
+    collection: AsyncIOMotorCollection,
+    key: Optional[str],
+    fingerprint: str,
+    func: Callable[[], Awaitable[Any]]
+) -> Any:
+    """
+    Run ``func`` once per idempotency key and replay its response afterwards.
+
+    The first request with a key claims it with a pending record; its
+    response (status code, body and the headers in REPLAYED_HEADERS) is
+    stored on success (the record expires through a TTL
+    index), and removed on failure so the client can retry. Requests with
+    the same key that arrive meanwhile wait for the first one to finish
+    and then receive the stored response.
+
+    Args:
+        collection: Collection holding the idempotency records
+        key: Value of the Idempotency-Key header (None runs ``func`` directly)
+        fingerprint: Hash of route and payload (see request_fingerprint)
+        func: Coroutine function performing the request
+
+    Returns:
+        The result of ``func`` or a response replaying it
+
+    Raises:
+        ValidationError: If the key is too long or was used for a different request
+        ConflictError: If the first request with the key is still running
+    """
+    if key is None:
+        return await func()
+    if not key or len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise ValidationError(
+            message="Ungültiger Idempotency-Key",
+            details={"max_length": IDEMPOTENCY_KEY_MAX_LENGTH}
+        )
+
+    record_id = f"{current_user_id()}:{key}"
+    deadline = asyncio.get_running_loop().time() + IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        record = await _claim(collection, record_id, fingerprint)
+        if record is None:
+            break
+        if record["fingerprint"] != fingerprint:
+            raise ValidationError(
+                message="Idempotency-Key wurde bereits für eine andere Anfrage verwendet",
+                details={"key": key}
+            )
+        if record.get("response") is not None:
+            return _replay(record["response"])
+        if asyncio.get_running_loop().time() >= deadline:
+            raise ConflictError(
+                message="Eine Anfrage mit diesem Idempotency-Key wird noch verarbeitet",
+                details={"key": key},
+                retry_after=1
+            )
+        await asyncio.sleep(IDEMPOTENCY_POLL_SECONDS)
+
+    try:
+        result = await func()
+    except BaseException:
+        await collection.delete_one({"_id": record_id, "response": None})
+        raise
+
+    try:
+        await collection.update_one(
+            {"_id": record_id},
+            {"$set": {"response": _snapshot(result), "completed_at": datetime.utcnow()}}
+        )
+    except Exception as e:
+        # The write succeeded; a retry will run it again instead of replaying
+        logger.error("Storing idempotent response for %s failed: %s", record_id, e)
+        await collection.delete_one({"_id": record_id})
+    return result
+
+
+def _snapshot(result: Any) -> Dict[str, Any]:
+    """Storable form of a result: what the client received, not the Python object."""
+    if not isinstance(result, Response):
+        # Plain return values are rendered by FastAPI as 200 JSON
+        return {"status_code": 200, "content": jsonable_encoder(result), "headers": {}}
+    snapshot = {
+        "status_code": result.status_code,
+        "headers": {name: result.headers[name] for name in REPLAYED_HEADERS if name in result.headers},
+    }
+    if isinstance(result, JSONResponse):
+        snapshot["content"] = json.loads(result.body)
+    else:
+        snapshot["body"] = result.body.decode("utf-8")
+        snapshot["media_type"] = result.media_type
+    return snapshot
+
+
+def _replay(snapshot: Dict[str, Any]) -> Response:
+    """Response equal to the stored one, marked as replayed."""
+    headers = {**snapshot["headers"], REPLAY_HEADER: "true"}
+    if "content" in snapshot:
+        return JSONResponse(content=snapshot["content"], status_code=snapshot["status_code"], headers=headers)
+    return Response(
+        content=snapshot["body"],
+        status_code=snapshot["status_code"],
+        media_type=snapshot["media_type"],
+        headers=headers
+    )
+
+
+async def _claim(collection: AsyncIOMotorCollection, record_id: str, fingerprint: str) -> Optional[dict]:
+    """
+    Claim the key for this request.
+
+    Returns:
+        None if the key is now owned by this request, otherwise the
+        existing record
+    """
+    now = datetime.utcnow()
+    claim = {
+        "fingerprint": fingerprint,
+        "response": None,
+        "locked_until": now + timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS),
+        "expires_at": now + timedelta(seconds=IDEMPOTENCY_TTL_SECONDS)
+    }
+    try:
+        await collection.insert_one({"_id": record_id, TENANT_FIELD: current_user_id(), **claim})
+        return None
+    except DuplicateKeyError:
+        pass
+
+    # Take over keys whose first request died without finishing
+    taken = await collection.find_one_and_update(
+        {"_id": record_id, "response": None, "fingerprint": fingerprint, "locked_until": {"$lt": now}},
+        {"$set": claim},
+        return_document=ReturnDocument.AFTER
+    )
+    if taken is not None:
+        return None
+    record = await collection.find_one({"_id": record_id})
+    # Deleted after a failure in the meantime: claim again
+    return record or {"fingerprint": fingerprint, "response": None}
@@ -0,0 +1,134 @@
+"""Index definitions shared by startup, migrations and maintenance."""
+
+import logging
+from typing import Any, Dict, List
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, IndexModel
+
+from .constants import BACKUP_TOMBSTONE_TTL_SECONDS, DEFAULT_USER_ID, TENANT_FIELD
+
+logger = logging.getLogger(__name__)
+
+# Options that make an existing index differ from its definition
+_COMPARED_OPTIONS = ("unique", "sparse", "partialFilterExpression", "expireAfterSeconds")
+
+# Collections holding per-user data. Every index on them leads with the
+# tenant field so per-user queries stay index-bounded, and
+# ``{user_id: 1, _id: 1}`` is a ready-made shard key.
+TENANT_COLLECTIONS = ["subscriptions", "expenses", "settings", "notification_settings"]
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "subscriptions": [
+        IndexModel([(TENANT_FIELD, ASCENDING), ("_id", ASCENDING)], name="tenant_id"),
+        IndexModel([(TENANT_FIELD, ASCENDING), ("name", ASCENDING)], name="tenant_name"),
+        # Incremental backups select documents changed since the last run
+        IndexModel([(TENANT_FIELD, ASCENDING), ("created_at", ASCENDING)], name="tenant_created"),
+        IndexModel([(TENANT_FIELD, ASCENDING), ("updated_at", ASCENDING)], name="tenant_updated"),
+        # Imports look up the hashes of a batch; identical entries created
+        # through the API are allowed, so the index is not unique
+        IndexModel([(TENANT_FIELD, ASCENDING), ("content_hash", ASCENDING)], name="tenant_content_hash"),
+        IndexModel([(TENANT_FIELD, ASCENDING), ("name_key", ASCENDING)], name="tenant_name_key"),
+    ],
+    "expenses": [
+        IndexModel([(TENANT_FIELD, ASCENDING), ("_id", ASCENDING)], name="tenant_id"),
+        IndexModel([(TENANT_FIELD, ASCENDING), ("name", ASCENDING)], name="tenant_name"),
+        # Incremental backups select documents changed since the last run
+        IndexModel([(TENANT_FIELD, ASCENDING), ("created_at", ASCENDING)], name="tenant_created"),
+        IndexModel([(TENANT_FIELD, ASCENDING), ("updated_at", ASCENDING)], name="tenant_updated"),
+        # Imports look up the hashes of a batch; identical entries created
+        # through the API are allowed, so the index is not unique
+        IndexModel([(TENANT_FIELD, ASCENDING), ("content_hash", ASCENDING)], name="tenant_content_hash"),
+        IndexModel([(TENANT_FIELD, ASCENDING), ("name_key", ASCENDING)], name="tenant_name_key"),
+    ],
+    "settings": [
+        IndexModel([(TENANT_FIELD, ASCENDING), ("type", ASCENDING)], name="tenant_type", unique=True),
+    ],
+    "notification_settings": [
+        IndexModel(
+            [(TENANT_FIELD, ASCENDING), ("subscription_id", ASCENDING)],
+            name="tenant_subscription",
+            unique=True
+        ),
+    ],
+    "backup_tombstones": [
+        IndexModel([(TENANT_FIELD, ASCENDING), ("deleted_at", ASCENDING)], name="tenant_deleted"),
+        IndexModel(
+            [("deleted_at", ASCENDING)],
+            name="deleted_ttl",
+            expireAfterSeconds=BACKUP_TOMBSTONE_TTL_SECONDS
+        ),
+    ],
+    "price_history": [
+        IndexModel(
+            [(TENANT_FIELD, ASCENDING), ("subscription_id", ASCENDING), ("bucket", ASCENDING)],
+            name="tenant_subscription_bucket",
+            unique=True
+        ),
+        # Price increase queries scan only recent buckets that recorded a rise
+        IndexModel(
+            [(TENANT_FIELD, ASCENDING), ("bucket", ASCENDING), ("rises", ASCENDING)],
+            name="tenant_bucket_rises"
+        ),
+    ],
+    "spending_snapshots": [
+        IndexModel([(TENANT_FIELD, ASCENDING), ("day", ASCENDING)], name="tenant_day", unique=True),
+    ],
+    "notification_outbox": [
+        IndexModel([(TENANT_FIELD, ASCENDING), ("created_at", ASCENDING)], name="tenant_created"),
+        # Delivery claims due entries oldest first
+        IndexModel([("status", ASCENDING), ("next_attempt_at", ASCENDING)], name="status_next_attempt"),
+        IndexModel([("lease", ASCENDING)], name="lease", sparse=True),
+    ],
+    "budgets": [
+        IndexModel([(TENANT_FIELD, ASCENDING), ("category", ASCENDING)], name="tenant_category", unique=True),
+    ],
+    "alerts": [
+        IndexModel(
+            [(TENANT_FIELD, ASCENDING), ("type", ASCENDING), ("created_at", ASCENDING)],
+            name="tenant_type_created"
+        ),
+    ],
+    "idempotency_keys": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_ttl", expireAfterSeconds=0),
+    ],
+    "rate_limits": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_ttl", expireAfterSeconds=0),
+    ],
+    "jobs": [
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING)], name="status_created"),
+    ],
+}
+
+
+async def assign_unowned_documents(db: AsyncIOMotorDatabase) -> None:
+    """Give documents created before multi-tenancy to the default user."""
+    for name in TENANT_COLLECTIONS:
+        await db[name].update_many(
+            {TENANT_FIELD: {"$exists": False}},
+            {"$set": {TENANT_FIELD: DEFAULT_USER_ID}}
+        )
+
+
+def _differs(existing: Dict[str, Any], model: IndexModel) -> bool:
+    spec = model.document
+    if list(existing["key"]) != list(spec["key"].items()):
+        return True
+    return any(existing.get(option) != spec.get(option) for option in _COMPARED_OPTIONS)
+
+
+async def ensure_indexes(db: AsyncIOMotorDatabase) -> None:
+    """
+    Create all defined indexes (no-op for indexes that already exist).
+
+    An index whose stored definition differs from ``INDEXES`` (e.g. one
+    that is no longer unique) is dropped and built again.
+    """
+    for name, models in INDEXES.items():
+        existing = await db[name].index_information()
+        for model in models:
+            index_name = model.document["name"]
+            if index_name in existing and _differs(existing[index_name], model):
+                logger.info("Rebuilding index %s.%s with a changed definition", name, index_name)
+                await db[name].drop_index(index_name)
+        await db[name].create_indexes(models)
@@ -0,0 +1,414 @@
+"""Background job queue for long-running operations."""
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+from .constants import (
+    DEFAULT_USER_ID,
+    JOB_FILE_TTL_SECONDS,
+    JOB_HEARTBEAT_SECONDS,
+    JOB_LEASE_SECONDS,
+    JOB_QUEUE_SIZE,
+    JOB_WORKERS,
+    TENANT_FIELD,
+)
+from .database import (
+    safe_delete_one,
+    safe_find,
+    safe_find_one,
+    safe_find_one_and_modify,
+    safe_insert_one,
+    safe_modify,
+)
+from .errors import DatabaseError, NotFoundError, ServiceUnavailableError, ValidationError
+from .tenancy import all_users, user_scope
+
+logger = logging.getLogger(__name__)
+
+
+class JobStatus:
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class JobCancelled(Exception):
+    """Raised inside a handler when cancellation was requested from elsewhere."""
+
+
+class JobContext:
+    """Handle passed to job handlers for progress reporting."""
+
+    def __init__(self, manager: "JobManager", job_id: str):
+        self.manager = manager
+        self.job_id = job_id
+
+    async def report_progress(self, done: int, total: int) -> None:
+        """
+        Persist progress and renew the job lease.
+
+        Raises:
+            JobCancelled: If cancellation was requested for this job
+        """
+        # Called from the handler, which runs as the job's owner
+        job = await safe_find_one_and_modify(
+            self.manager.collection,
+            {"_id": self.job_id},
+            {"$set": {
+                "progress": {"done": done, "total": total},
+                "lease_until": self.manager.lease_deadline(),
+                "updated_at": datetime.utcnow()
+            }},
+            resource_name="Auftrag",
+            projection={"cancel_requested": 1},
+            idempotent=True
+        )
+        if job and job.get("cancel_requested"):
+            raise JobCancelled()
+
+
+JobHandler = Callable[[Dict[str, Any], JobContext], Awaitable[Optional[Dict[str, Any]]]]
+
+
+def serialize_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a job document into its API representation."""
+    return {
+        "id": job["_id"],
+        "type": job["type"],
+        "status": job["status"],
+        "progress": job.get("progress"),
+        "result": job.get("result"),
+        "error": job.get("error"),
+        "created_at": job["created_at"].isoformat(),
+        "finished_at": job["finished_at"].isoformat() if job.get("finished_at") else None
+    }
+
+
+def _write_payload(path: Path, payload: Any) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_text(json.dumps(payload, default=str, ensure_ascii=False), encoding="utf-8")
+    tmp_path.replace(path)
+
+
+def _read_payload(path: Path) -> Any:
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def purge_job_files(directories: Iterable[Path], max_age_seconds: float = JOB_FILE_TTL_SECONDS) -> int:
+    """
+    Delete job files (export results, spooled inputs) older than ``max_age_seconds``.
+
+    Returns:
+        Number of deleted files
+    """
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+    for directory in directories:
+        if not directory.is_dir():
+            continue
+        for path in directory.iterdir():
+            try:
+                if path.is_file() and path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                continue
+    if removed:
+        logger.info("Deleted %d expired job files", removed)
+    return removed
+
+
+class JobManager:
+    """
+    Run registered job handlers on a bounded pool of asyncio workers.
+
+    Job state lives in a MongoDB collection so that status survives a
+    restart: queued jobs and running jobs whose lease has expired are
+    picked up again when the manager starts. The lease of a running job
+    is renewed by a heartbeat for as long as its handler runs, so a slow
+    job is never taken over while its process is alive. Jobs belong to
+    the user who submitted them and their handlers run scoped to that user.
+
+    Large inputs (an import of several megabytes) are spooled to a file
+    in ``spool_dir`` instead of the job document, which MongoDB limits
+    to 16 MB; the handler gets them back as ``params["payload"]``.
+    """
+
+    def __init__(
+        self,
+        collection: AsyncIOMotorCollection,
+        spool_dir: Path,
+        workers: int = JOB_WORKERS,
+        queue_size: int = JOB_QUEUE_SIZE
+    ):
+        self.collection = collection
+        self.spool_dir = spool_dir
+        self._worker_count = workers
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._handlers: Dict[str, JobHandler] = {}
+        self._workers: List[asyncio.Task] = []
+        self._running: Dict[str, asyncio.Task] = {}
+        self._cancelled: Set[str] = set()
+
+    def register(self, job_type: str, handler: JobHandler) -> None:
+        """Register the coroutine that executes jobs of ``job_type``."""
+        self._handlers[job_type] = handler
+
+    @staticmethod
+    def lease_deadline() -> datetime:
+        return datetime.utcnow() + timedelta(seconds=JOB_LEASE_SECONDS)
+
+    async def start(self) -> None:
+        """Start the workers and requeue jobs interrupted by a restart."""
+        self._workers = [
+            asyncio.create_task(self._worker()) for _ in range(self._worker_count)
+        ]
+        with all_users():
+            jobs = await safe_find(
+                self.collection,
+                {"$or": [
+                    {"status": JobStatus.QUEUED},
+                    {"status": JobStatus.RUNNING, "lease_until": {"$lt": datetime.utcnow()}}
+                ]},
+                sort_field="created_at",
+                limit=None,
+                resource_name="Aufträge",
+                projection={"_id": 1}
+            )
+            for job in jobs:
+                await safe_modify(
+                    self.collection,
+                    {"_id": job["_id"]},
+                    {"$set": {"status": JobStatus.QUEUED, "updated_at": datetime.utcnow()}},
+                    resource_name="Auftrag",
+                    idempotent=True
+                )
+                await self._queue.put(job["_id"])
+
+    async def close(self) -> None:
+        """Stop all workers; interrupted jobs are requeued on next start."""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def _spool_path(self, job_id: str) -> Path:
+        return self.spool_dir / f"{job_id}.json"
+
+    async def submit(
+        self,
+        job_type: str,
+        params: Optional[Dict[str, Any]] = None,
+        payload: Any = None
+    ) -> Dict[str, Any]:
+        """
+        Persist a new job and hand it to the worker pool.
+
+        Args:
+            job_type: Registered job type
+            params: Small handler parameters (stored with the job)
+            payload: Large handler input, spooled to a file until the job ends
+
+        Returns:
+            Serialized job
+
+        Raises:
+            ValidationError: If the job type is unknown
+            ServiceUnavailableError: If the queue is full
+        """
+        if job_type not in self._handlers:
+            raise ValidationError(
+                message="Unbekannter Auftragstyp",
+                details={"type": job_type, "valid_values": list(self._handlers)}
+            )
+        if self._queue.full():
+            raise ServiceUnavailableError(
+                message="Zu viele laufende Aufträge, bitte später erneut versuchen",
+                retry_after=JOB_LEASE_SECONDS
+            )
+
+        now = datetime.utcnow()
+        job_id = uuid.uuid4().hex
+        params = dict(params or {})
+        if payload is not None:
+            await asyncio.to_thread(_write_payload, self._spool_path(job_id), payload)
+            params["spooled"] = True
+        job = {
+            "_id": job_id,
+            "type": job_type,
+            "status": JobStatus.QUEUED,
+            "params": params,
+            "progress": None,
+            "result": None,
+            "error": None,
+            "cancel_requested": False,
+            "created_at": now,
+            "updated_at": now
+        }
+        try:
+            await safe_insert_one(self.collection, job, resource_name="Auftrag")
+        except BaseException:
+            self._discard_spool(job_id)
+            raise
+        try:
+            self._queue.put_nowait(job_id)
+        except asyncio.QueueFull:
+            # Filled up while the job was being stored
+            await safe_delete_one(self.collection, {"_id": job_id}, resource_name="Auftrag", resource_id=job_id)
+            self._discard_spool(job_id)
+            raise ServiceUnavailableError(
+                message="Zu viele laufende Aufträge, bitte später erneut versuchen",
+                retry_after=JOB_LEASE_SECONDS
+            )
+        return serialize_job(job)
+
+    def _discard_spool(self, job_id: str) -> None:
+        self._spool_path(job_id).unlink(missing_ok=True)
+
+    async def get(self, job_id: str) -> Dict[str, Any]:
+        """
+        Get a job by id.
+
+        Raises:
+            NotFoundError: If the job does not exist
+        """
+        job = await safe_find_one(self.collection, {"_id": job_id}, resource_name="Auftrag", projection={"params": 0})
+        if not job:
+            raise NotFoundError(resource="Auftrag", resource_id=job_id)
+        return job
+
+    async def cancel(self, job_id: str) -> Dict[str, Any]:
+        """
+        Cancel a queued or running job.
+
+        Queued jobs are cancelled immediately. Running jobs are interrupted
+        directly when they run in this process, otherwise at their next
+        progress report or lease renewal.
+        """
+        now = datetime.utcnow()
+        job = await safe_find_one_and_modify(
+            self.collection,
+            {"_id": job_id, "status": JobStatus.QUEUED},
+            {"$set": {"status": JobStatus.CANCELLED, "finished_at": now, "updated_at": now}},
+            resource_name="Auftrag",
+            projection={"params": 0}
+        )
+        if job:
+            self._discard_spool(job_id)
+            return job
+
+        matched = await safe_modify(
+            self.collection,
+            {"_id": job_id, "status": JobStatus.RUNNING},
+            {"$set": {"cancel_requested": True, "updated_at": now}},
+            resource_name="Auftrag",
+            idempotent=True
+        )
+        task = self._running.get(job_id)
+        if task is not None and matched:
+            self._cancelled.add(job_id)
+            task.cancel()
+        return await self.get(job_id)
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Job worker failed on %s: %s", job_id, e)
+            finally:
+                self._queue.task_done()
+
+    async def _heartbeat(self, job_id: str, task: asyncio.Task) -> None:
+        """Renew the lease of a running job and pick up cancellations from other processes."""
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+            try:
+                with all_users():
+                    job = await safe_find_one_and_modify(
+                        self.collection,
+                        {"_id": job_id, "status": JobStatus.RUNNING},
+                        {"$set": {"lease_until": self.lease_deadline()}},
+                        resource_name="Auftrag",
+                        projection={"cancel_requested": 1},
+                        idempotent=True
+                    )
+            except DatabaseError as e:
+                # The lease outlasts a few missed renewals
+                logger.warning("Lease renewal for job %s failed: %s", job_id, e)
+                continue
+            if job and job.get("cancel_requested"):
+                self._cancelled.add(job_id)
+                task.cancel()
+                return
+
+    async def _run(self, job_id: str) -> None:
+        # Claim the job; it may have been cancelled or claimed meanwhile.
+        # Workers serve all users; the handler below runs as the job's owner
+        with all_users():
+            job = await safe_find_one_and_modify(
+                self.collection,
+                {"_id": job_id, "status": JobStatus.QUEUED},
+                {"$set": {
+                    "status": JobStatus.RUNNING,
+                    "started_at": datetime.utcnow(),
+                    "lease_until": self.lease_deadline(),
+                    "updated_at": datetime.utcnow()
+                }},
+                resource_name="Auftrag"
+            )
+        if job is None:
+            return
+
+        handler = self._handlers.get(job["type"])
+        update: Dict[str, Any]
+        params = job["params"]
+        try:
+            if params.get("spooled"):
+                params = {**params, "payload": await asyncio.to_thread(_read_payload, self._spool_path(job_id))}
+            # The task copies the context, so the handler runs as the job's owner
+            with user_scope(job.get(TENANT_FIELD, DEFAULT_USER_ID)):
+                task = asyncio.create_task(handler(params, JobContext(self, job_id)))
+            self._running[job_id] = task
+            heartbeat = asyncio.create_task(self._heartbeat(job_id, task))
+            try:
+                result = await task
+            finally:
+                heartbeat.cancel()
+            update = {"status": JobStatus.SUCCEEDED, "result": result}
+        except JobCancelled:
+            update = {"status": JobStatus.CANCELLED}
+        except asyncio.CancelledError:
+            if job_id not in self._cancelled:
+                # Worker shutdown: leave the job running so its lease expires
+                # and it is requeued on the next start
+                raise
+            update = {"status": JobStatus.CANCELLED}
+        except Exception as e:
+            logger.error("Job %s (%s) failed: %s", job_id, job["type"], e)
+            update = {"status": JobStatus.FAILED, "error": str(e)}
+        finally:
+            self._running.pop(job_id, None)
+            self._cancelled.discard(job_id)
+
+        # Not reached on worker shutdown, so a requeued job still finds its input
+        self._discard_spool(job_id)
+
+        now = datetime.utcnow()
+        update.update({"finished_at": now, "updated_at": now, "params": None})
+        with all_users():
+            await safe_modify(self.collection, {"_id": job_id}, {"$set": update}, resource_name="Auftrag", idempotent=True)
@@ -0,0 +1,223 @@
+"""Queue-based structured logging with request ids and error sampling."""
+
+import atexit
+import copy
+import json
+import logging
+import queue
+import re
+import sys
+import time
+import uuid
+from collections import OrderedDict
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Optional, Tuple
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .constants import (
+    LOG_QUEUE_SIZE,
+    LOG_SAMPLE_BURST,
+    LOG_SAMPLE_MAX_KEYS,
+    LOG_SAMPLE_WINDOW_SECONDS,
+    REQUEST_ID_HEADER,
+    REQUEST_ID_MAX_LENGTH,
+)
+from .tenancy import current_user_id
+
+# Id of the request being handled, attached to every log record
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+_REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]+$")
+
+# Attributes every LogRecord has; anything else was passed through ``extra``
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+def current_request_id() -> Optional[str]:
+    """Return the id of the request bound to the current context."""
+    return _request_id.get()
+
+
+class ContextFilter(logging.Filter):
+    """Stamp records with the request id and user while still in the caller's context."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = _request_id.get()
+        record.user_id = current_user_id()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Let at most ``burst`` records per message template and window through.
+
+    Applies to warnings and above, keyed by logger, level, unformatted
+    message and the ``error_code``/``status_code`` extras (the exception
+    handlers log every error through one template), so an error storm
+    costs one dictionary lookup per dropped record. Errors answered with a
+    5xx status are never dropped. The first record of the next window
+    reports how many were suppressed.
+    """
+
+    def __init__(
+        self,
+        burst: int = LOG_SAMPLE_BURST,
+        window_seconds: float = LOG_SAMPLE_WINDOW_SECONDS,
+        max_keys: int = LOG_SAMPLE_MAX_KEYS
+    ):
+        super().__init__()
+        self.burst = burst
+        self.window_seconds = window_seconds
+        self.max_keys = max_keys
+        # key -> (window start, records in window, suppressed in window)
+        self._windows: "OrderedDict[Tuple[Any, ...], Tuple[float, int, int]]" = OrderedDict()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING:
+            return True
+        status_code = getattr(record, "status_code", None)
+        if record.levelno >= logging.ERROR and isinstance(status_code, int) and status_code >= 500:
+            return True
+        key = (record.name, record.levelno, str(record.msg), getattr(record, "error_code", None), status_code)
+        now = time.monotonic()
+        started, count, suppressed = self._windows.pop(key, (now, 0, 0))
+        if now - started >= self.window_seconds:
+            if suppressed:
+                record.suppressed = suppressed
+            started, count, suppressed = now, 0, 0
+        allowed = count < self.burst
+        if allowed:
+            count += 1
+        else:
+            suppressed += 1
+        self._windows[key] = (started, count, suppressed)
+        if len(self._windows) > self.max_keys:
+            self._windows.popitem(last=False)
+        return allowed
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including ``extra`` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """Queue handler that never blocks the caller and leaves formatting to the listener."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge the arguments now (they may change later), but keep the
+        # traceback so it is rendered on the listener thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener: Optional[QueueListener] = None
+
+
+def configure_logging(level: str = "INFO", json_format: bool = True) -> None:
+    """
+    Route all logging through a queue drained by a background thread.
+
+    Log calls on the event loop only filter, copy and enqueue the record;
+    formatting and writing to stderr happen on the listener thread. When
+    the queue is full, records are dropped instead of waiting.
+
+    Args:
+        level: Root log level
+        json_format: Write JSON lines instead of plain text
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stderr)
+    if json_format:
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter(
+            "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"
+        ))
+
+    log_queue: queue.Queue = queue.Queue(LOG_QUEUE_SIZE)
+    handler = _NonBlockingQueueHandler(log_queue)
+    handler.addFilter(ContextFilter())
+    handler.addFilter(SamplingFilter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    # Flush what is still queued when the process exits
+    atexit.register(_listener.stop)
+
+
+class RequestIdMiddleware:
+    """
+    Bind a request id to each request and echo it in the response.
+
+    A well-formed ``X-Request-ID`` sent by the client or a proxy is kept,
+    so logs can be correlated across services; otherwise one is generated.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == REQUEST_ID_HEADER.lower().encode("latin-1"):
+                request_id = value.decode("latin-1")
+                break
+        if (
+            not request_id
+            or len(request_id) > REQUEST_ID_MAX_LENGTH
+            or not _REQUEST_ID_PATTERN.match(request_id)
+        ):
+            request_id = uuid.uuid4().hex
+        token = _request_id.set(request_id)
+
+        async def send_with_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)[REQUEST_ID_HEADER] = request_id
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _request_id.reset(token)
@@ -0,0 +1,66 @@
+"""Data migrations that run once per database instead of on every start."""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from .constants import MIGRATION_LOCK_SECONDS
+from .database import safe_find_one_and_modify, safe_modify
+from .dedupe import backfill_dedupe_fields
+from .errors import ConflictError
+from .tenancy import all_users
+
+logger = logging.getLogger(__name__)
+
+Migration = Callable[[AsyncIOMotorDatabase], Awaitable[None]]
+
+# Applied in this order; names must never change once released
+MIGRATIONS: List[Tuple[str, Migration]] = [
+    ("dedupe_fields", backfill_dedupe_fields),
+]
+
+
+async def run_migrations(db: AsyncIOMotorDatabase) -> List[str]:
+    """
+    Apply every migration not yet recorded in the ``migrations`` collection.
+
+    A process claims a migration with a lock, so concurrently starting
+    processes do not run it twice; a lock left behind by a crashed
+    process expires after MIGRATION_LOCK_SECONDS and the migration is
+    run again, so migrations must be safe to repeat.
+
+    Returns:
+        Names of the migrations applied by this call
+    """
+    applied = []
+    # Migration state belongs to no user
+    with all_users():
+        for name, migrate in MIGRATIONS:
+            now = datetime.utcnow()
+            try:
+                await safe_find_one_and_modify(
+                    db.migrations,
+                    {"_id": name, "done_at": {"$exists": False}, "$or": [
+                        {"lock_until": {"$exists": False}},
+                        {"lock_until": {"$lt": now}}
+                    ]},
+                    {"$set": {"lock_until": now + timedelta(seconds=MIGRATION_LOCK_SECONDS)}},
+                    resource_name="Migration",
+                    upsert=True
+                )
+            except ConflictError:
+                # Done already or running in another process
+                continue
+            logger.info("Running migration %s", name)
+            await migrate(db)
+            await safe_modify(
+                db.migrations,
+                {"_id": name},
+                {"$set": {"done_at": datetime.utcnow()}, "$unset": {"lock_until": ""}},
+                resource_name="Migration",
+                idempotent=True
+            )
+            applied.append(name)
+    return applied
@@ -0,0 +1,165 @@
+"""Content negotiation: MessagePack bodies and compressed responses."""
+
+import asyncio
+import gzip
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+import brotli
+import msgpack
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .constants import (
+    BROTLI_QUALITY,
+    COMPRESSION_MIN_BYTES,
+    COMPRESSION_THREAD_MIN_BYTES,
+    GZIP_LEVEL,
+)
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+# Whether the client of the current request asked for MessagePack
+_wants_msgpack: ContextVar[bool] = ContextVar("wants_msgpack", default=False)
+
+# Media types whose bodies are compressed already
+_INCOMPRESSIBLE_TYPES = (
+    "image/",
+    "audio/",
+    "video/",
+    "application/gzip",
+    "application/zip",
+    "application/vnd.apache.parquet",
+    "application/vnd.apache.arrow",
+)
+
+
+def _accepted(header: str) -> Dict[str, float]:
+    """Parse an Accept or Accept-Encoding header into {value: quality}."""
+    accepted = {}
+    for part in header.split(","):
+        value, _, params = part.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, number = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(number)
+                except ValueError:
+                    quality = 0.0
+        if value:
+            accepted[value.strip().lower()] = quality
+    return accepted
+
+
+async def negotiate_format(request: Request) -> None:
+    """Remember whether the client prefers MessagePack over JSON (router dependency)."""
+    accepted = _accepted(request.headers.get("accept", ""))
+    msgpack_quality = max(accepted.get(MSGPACK_MEDIA_TYPE, 0.0), accepted.get("application/x-msgpack", 0.0))
+    _wants_msgpack.set(msgpack_quality > 0 and msgpack_quality >= accepted.get("application/json", 0.0))
+
+
+class NegotiatedResponse(JSONResponse):
+    """
+    JSON response that is encoded as MessagePack when the client asked for it.
+
+    The content arrives already converted by ``jsonable_encoder``, so both
+    encodings carry the same values; MessagePack just drops the text
+    syntax and quoting.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if _wants_msgpack.get():
+            self.media_type = MSGPACK_MEDIA_TYPE
+            return msgpack.packb(content, use_bin_type=True)
+        return super().render(content)
+
+    def init_headers(self, headers: Optional[Dict[str, str]] = None) -> None:
+        super().init_headers(headers)
+        MutableHeaders(raw=self.raw_headers).add_vary_header("Accept")
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Preferred supported content coding of a client (brotli over gzip on ties)."""
+    accepted = _accepted(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for encoding in ("br", "gzip"):
+        quality = accepted.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def accepts_encoding(accept_encoding: str, encoding: str) -> bool:
+    """Whether a client accepts a content coding (``q=0`` refuses it)."""
+    accepted = _accepted(accept_encoding)
+    return accepted.get(encoding, accepted.get("*", 0.0)) > 0
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Encode a body with ``br`` or ``gzip``."""
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    """
+    Compress complete response bodies with brotli or gzip.
+
+    Only single-message bodies of at least ``minimum_size`` bytes are
+    compressed; streamed responses (events, columnar exports) and bodies
+    that already have a content coding pass through untouched. Large
+    bodies are compressed in a worker thread.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        body_seen = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, body_seen
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or body_seen:
+                await send(message)
+                return
+            body_seen = True
+            headers = MutableHeaders(raw=start["headers"])
+            body = message.get("body", b"")
+            if (
+                message.get("more_body", False)
+                or len(body) < self.minimum_size
+                or "content-encoding" in headers
+                or headers.get("content-type", "").startswith(_INCOMPRESSIBLE_TYPES)
+            ):
+                await send(start)
+                await send(message)
+                return
+            if len(body) >= COMPRESSION_THREAD_MIN_BYTES:
+                body = await asyncio.to_thread(compress, body, encoding)
+            else:
+                body = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
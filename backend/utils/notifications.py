@@ -0,0 +1,362 @@
+"""Renewal reminders: due-date computation, outbox and batched delivery."""
+
+import asyncio
+import calendar
+import logging
+import uuid
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Protocol
+
+import requests
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from .constants import (
+    DEFAULT_NOTIFICATION_DAYS,
+    NOTIFICATION_BATCH_SIZE,
+    NOTIFICATION_LEASE_SECONDS,
+    NOTIFICATION_MAX_ATTEMPTS,
+    NOTIFICATION_RETRY_BASE_SECONDS,
+    NOTIFICATION_RETRY_MAX_SECONDS,
+    NOTIFICATION_WEBHOOK_TIMEOUT_SECONDS,
+    TENANT_FIELD,
+)
+from .database import safe_distinct, safe_find, safe_find_one, safe_insert_many, safe_modify, safe_upsert_one
+from .tenancy import all_users, user_scope
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxStatus:
+    PENDING = "pending"
+    SENDING = "sending"
+    SENT = "sent"
+    FAILED = "failed"
+
+
+def _clamped(year: int, month: int, day: int) -> date:
+    """Build a date, moving days past the end of the month to its last day."""
+    return date(year, month, min(day, calendar.monthrange(year, month)[1]))
+
+
+def next_renewal(start_date: date, billing_cycle: str, today: date) -> date:
+    """
+    Return the first renewal after ``today``.
+
+    Renewals on the 29th to 31st fall on the last day of shorter months
+    (and 29 February on 28 February in common years).
+    """
+    if billing_cycle == "MONTHLY":
+        renewal = _clamped(today.year, today.month, start_date.day)
+        if renewal <= today:
+            year, month = (today.year + 1, 1) if today.month == 12 else (today.year, today.month + 1)
+            renewal = _clamped(year, month, start_date.day)
+    else:  # YEARLY
+        renewal = _clamped(today.year, start_date.month, start_date.day)
+        if renewal <= today:
+            renewal = _clamped(today.year + 1, start_date.month, start_date.day)
+    return renewal
+
+
+def due_notifications(
+    subscriptions: Iterable[Dict[str, Any]],
+    days_before: List[int],
+    overrides: Dict[str, Dict[str, Any]],
+    today: date
+) -> List[Dict[str, Any]]:
+    """
+    Compute the renewal reminders due today.
+
+    Args:
+        subscriptions: Subscription documents
+        days_before: Reminder offsets from the app settings
+        overrides: Per-subscription notification settings by subscription id;
+            ``enabled``, ``days_before`` and ``custom_message`` take precedence
+        today: Reference day
+
+    Returns:
+        Notifications in the format of /api/notifications/scheduled
+    """
+    notifications = []
+    for sub in subscriptions:
+        sub_id = str(sub["_id"])
+        override = overrides.get(sub_id) or {}
+        if not override.get("enabled", True):
+            continue
+        try:
+            start_date = datetime.strptime(sub["start_date"], "%Y-%m-%d").date()
+        except (KeyError, TypeError, ValueError):
+            continue
+
+        renewal = next_renewal(start_date, sub["billing_cycle"], today)
+        days_until = (renewal - today).days
+        if days_until not in override.get("days_before", days_before):
+            continue
+        notifications.append({
+            "id": f"{sub_id}_{days_until}",
+            "subscription_id": sub_id,
+            "subscription_name": sub["name"],
+            "scheduled_date": renewal.isoformat(),
+            "days_until": days_until,
+            "message": override.get("custom_message") or f"{sub['name']} wird in {days_until} Tag(en) verlängert",
+            "type": "renewal",
+            "amount_cents": sub["amount_cents"]
+        })
+    return notifications
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff in seconds after ``attempts`` failed deliveries."""
+    return min(NOTIFICATION_RETRY_MAX_SECONDS, NOTIFICATION_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+
+
+class NotificationSink(Protocol):
+    """Delivery target for batches of notifications."""
+
+    async def send(self, messages: List[Dict[str, Any]]) -> List[Optional[str]]:
+        """
+        Deliver a batch.
+
+        Returns:
+            One entry per message: None if delivered, otherwise the error
+
+        Raises:
+            Exception: If the whole batch failed and should be retried
+        """
+        ...
+
+
+class WebhookSink:
+    """
+    POST batches as JSON to a URL, Expo push API style.
+
+    The body is a list of messages. A response of the form
+    ``{"data": [{"status": "ok" | "error", "message": ...}, ...]}`` reports
+    per-message results; any other 2xx response counts as delivered.
+    """
+
+    def __init__(self, url: str, timeout: float = NOTIFICATION_WEBHOOK_TIMEOUT_SECONDS):
+        self.url = url
+        self.timeout = timeout
+        self._session = requests.Session()
+
+    async def send(self, messages: List[Dict[str, Any]]) -> List[Optional[str]]:
+        response = await asyncio.to_thread(
+            self._session.post, self.url, json=messages, timeout=self.timeout
+        )
+        if response.status_code >= 400:
+            raise RuntimeError(f"HTTP {response.status_code}")
+
+        try:
+            tickets = response.json().get("data")
+        except (ValueError, AttributeError):
+            tickets = None
+        if not isinstance(tickets, list) or len(tickets) != len(messages):
+            return [None] * len(messages)
+        return [
+            None if ticket.get("status") == "ok" else ticket.get("message") or "Zustellung abgelehnt"
+            for ticket in tickets
+        ]
+
+
+def _message(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Payload sent to the sink for an outbox entry."""
+    notification = entry["notification"]
+    return {
+        "id": entry["_id"],
+        TENANT_FIELD: entry[TENANT_FIELD],
+        "title": notification["subscription_name"],
+        "body": notification["message"],
+        "data": {
+            "subscription_id": notification["subscription_id"],
+            "scheduled_date": notification["scheduled_date"],
+            "days_until": notification["days_until"],
+            "amount_cents": notification["amount_cents"]
+        }
+    }
+
+
+class NotificationDispatcher:
+    """
+    Materialize due reminders into an outbox and deliver them in batches.
+
+    Each reminder is stored once under a dedupe key (user, subscription,
+    renewal date, offset), so repeated runs and several processes never
+    produce duplicates. Delivery claims batches with a lease, and failed
+    entries are retried with exponential backoff until
+    NOTIFICATION_MAX_ATTEMPTS. Every attempt is appended to the entry's
+    history.
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase, sink: NotificationSink):
+        self.db = db
+        self.sink = sink
+
+    async def run(self) -> None:
+        """Materialize today's reminders (once per day) and deliver due ones."""
+        await self.materialize()
+        while await self.deliver_batch():
+            pass
+
+    async def materialize(self, today: Optional[date] = None) -> int:
+        """
+        Write today's reminders of all users into the outbox.
+
+        Returns:
+            Number of new outbox entries
+        """
+        today = today or datetime.utcnow().date()
+        day = datetime.combine(today, time())
+        with all_users():
+            state = await safe_find_one(self.db.notification_state, {"_id": "materialize"}) or {}
+            if state.get("day") == day:
+                return 0
+            users = await safe_distinct(self.db.subscriptions, TENANT_FIELD, resource_name="Abonnements")
+
+        created = 0
+        for user_id in sorted(users):
+            with user_scope(user_id):
+                created += await self._materialize_user(user_id, today)
+        with all_users():
+            await safe_upsert_one(self.db.notification_state, {"_id": "materialize"}, {"day": day})
+        return created
+
+    async def _materialize_user(self, user_id: str, today: date) -> int:
+        settings = await safe_find_one(
+            self.db.settings, {"type": "app_settings"}, resource_name="Einstellungen"
+        ) or {}
+        if not settings.get("notification_enabled", True):
+            return 0
+
+        subscriptions = await safe_find(
+            self.db.subscriptions,
+            limit=None,
+            resource_name="Abonnements",
+            projection={"name": 1, "start_date": 1, "billing_cycle": 1, "amount_cents": 1}
+        )
+        overrides = {
+            doc["subscription_id"]: doc
+            for doc in await safe_find(self.db.notification_settings, limit=None, resource_name="Erinnerungen")
+        }
+        notifications = due_notifications(
+            subscriptions,
+            settings.get("notification_days_before", DEFAULT_NOTIFICATION_DAYS),
+            overrides,
+            today
+        )
+        if not notifications:
+            return 0
+
+        try:
+            hour, minute = (int(part) for part in settings.get("notification_time", "09:00").split(":"))
+            send_at = datetime.combine(today, time(hour, minute))
+        except ValueError:
+            send_at = datetime.combine(today, time())
+        now = datetime.utcnow()
+        entries = [
+            {
+                "_id": f"{user_id}:{n['subscription_id']}:{n['scheduled_date']}:{n['days_until']}",
+                "notification": n,
+                "status": OutboxStatus.PENDING,
+                "attempts": 0,
+                "next_attempt_at": send_at,
+                "history": [],
+                "created_at": now
+            }
+            for n in notifications
+        ]
+        # Entries already in the outbox are expected on reruns
+        inserted = await safe_insert_many(
+            self.db.notification_outbox, entries, resource_name="Erinnerungen", skip_duplicates=True
+        )
+        return len(inserted)
+
+    async def deliver_batch(self, now: Optional[datetime] = None) -> int:
+        """
+        Claim and deliver one batch of due entries.
+
+        Returns:
+            Number of entries attempted (0 when nothing is due)
+        """
+        now = now or datetime.utcnow()
+        due = {"$or": [
+            {"status": OutboxStatus.PENDING, "next_attempt_at": {"$lte": now}},
+            {"status": OutboxStatus.SENDING, "lease_until": {"$lt": now}}
+        ]}
+        # The outbox is delivered for all users at once
+        with all_users():
+            candidates = await safe_find(
+                self.db.notification_outbox,
+                due,
+                sort_field="next_attempt_at",
+                limit=NOTIFICATION_BATCH_SIZE,
+                resource_name="Erinnerungen",
+                projection={"_id": 1}
+            )
+            if not candidates:
+                return 0
+
+            lease = uuid.uuid4().hex
+            await safe_modify(
+                self.db.notification_outbox,
+                {"$and": [{"_id": {"$in": [doc["_id"] for doc in candidates]}}, due]},
+                {"$set": {
+                    "status": OutboxStatus.SENDING,
+                    "lease": lease,
+                    "lease_until": now + timedelta(seconds=NOTIFICATION_LEASE_SECONDS)
+                }},
+                resource_name="Erinnerungen",
+                many=True,
+                idempotent=True
+            )
+            batch = await safe_find(self.db.notification_outbox, {"lease": lease}, limit=None, resource_name="Erinnerungen")
+        if not batch:
+            return len(candidates)
+
+        try:
+            errors = await self.sink.send([_message(entry) for entry in batch])
+        except Exception as e:
+            logger.warning("Notification batch of %d failed: %s", len(batch), e)
+            errors = [str(e) or type(e).__name__] * len(batch)
+
+        for entry, error in zip(batch, errors):
+            await self._record_attempt(entry, error, now)
+        return len(batch)
+
+    async def _record_attempt(self, entry: Dict[str, Any], error: Optional[str], now: datetime) -> None:
+        attempts = entry["attempts"] + 1
+        update: Dict[str, Any] = {"attempts": attempts}
+        if error is None:
+            update.update({"status": OutboxStatus.SENT, "sent_at": now})
+        elif attempts >= NOTIFICATION_MAX_ATTEMPTS:
+            update["status"] = OutboxStatus.FAILED
+        else:
+            update.update({
+                "status": OutboxStatus.PENDING,
+                "next_attempt_at": now + timedelta(seconds=retry_delay(attempts))
+            })
+        with all_users():
+            await safe_modify(
+                self.db.notification_outbox,
+                {"_id": entry["_id"], "lease": entry["lease"]},
+                {
+                    "$set": update,
+                    "$unset": {"lease": "", "lease_until": ""},
+                    "$push": {"history": {"at": now, "ok": error is None, "error": error}}
+                },
+                resource_name="Erinnerungen"
+            )
+
+
+def serialize_outbox_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert an outbox entry into its API representation."""
+    return {
+        **entry["notification"],
+        "id": entry["_id"],
+        "status": entry["status"],
+        "attempts": entry["attempts"],
+        "sent_at": entry["sent_at"].isoformat() if entry.get("sent_at") else None,
+        "history": [
+            {"at": attempt["at"].isoformat(), "ok": attempt["ok"], "error": attempt["error"]}
+            for attempt in entry.get("history", [])
+        ]
+    }
@@ -0,0 +1,83 @@
+"""Removal of per-subscription documents whose subscription is gone."""
+
+import logging
+from typing import Any, Dict, List
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from .constants import ORPHAN_SWEEP_BATCH_SIZE, TENANT_FIELD
+from .database import safe_aggregate, safe_delete_many
+from .tenancy import all_users
+
+logger = logging.getLogger(__name__)
+
+
+def _orphan_pipeline(after: Any, batch_size: int) -> List[Dict[str, Any]]:
+    """
+    Anti-join of one window of notification_settings against subscriptions.
+
+    The window is taken in _id order so every run examines a bounded
+    number of documents, and each lookup is a point query on the
+    (user_id, _id) index of subscriptions.
+    """
+    window: Dict[str, Any] = {"_id": {"$gt": after}} if after is not None else {}
+    return [
+        {"$match": window},
+        {"$sort": {"_id": 1}},
+        {"$limit": batch_size},
+        {"$lookup": {
+            "from": "subscriptions",
+            "let": {
+                "subscription_id": {"$convert": {
+                    "input": "$subscription_id", "to": "objectId", "onError": None, "onNull": None
+                }},
+                "user_id": f"${TENANT_FIELD}"
+            },
+            "pipeline": [
+                {"$match": {"$expr": {"$and": [
+                    {"$eq": [f"${TENANT_FIELD}", "$$user_id"]},
+                    {"$eq": ["$_id", "$$subscription_id"]}
+                ]}}},
+                {"$limit": 1},
+                {"$project": {"_id": 1}}
+            ],
+            "as": "subscription"
+        }},
+        {"$project": {"orphan": {"$eq": [{"$size": "$subscription"}, 0]}}}
+    ]
+
+
+async def sweep_orphaned_notification_settings(
+    db: AsyncIOMotorDatabase,
+    batch_size: int = ORPHAN_SWEEP_BATCH_SIZE
+) -> int:
+    """
+    Delete notification settings of subscriptions that no longer exist.
+
+    Deletes cascade already; this catches documents left behind by
+    failed cascades, older versions and direct database edits.
+
+    Returns:
+        Number of deleted documents
+    """
+    removed = 0
+    after = None
+    # The sweep covers every user; the lookup matches owners itself
+    with all_users():
+        while True:
+            window = await safe_aggregate(
+                db.notification_settings, _orphan_pipeline(after, batch_size), resource_name="Erinnerungen"
+            )
+            if not window:
+                break
+            orphans = [doc["_id"] for doc in window if doc["orphan"]]
+            if orphans:
+                removed += await safe_delete_many(
+                    db.notification_settings, {"_id": {"$in": orphans}}, resource_name="Erinnerungen"
+                )
+            if len(window) < batch_size:
+                break
+            after = window[-1]["_id"]
+    if removed:
+        logger.info("Removed %d orphaned notification settings", removed)
+    return removed
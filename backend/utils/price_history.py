@@ -0,0 +1,119 @@
+"""Price history of subscriptions stored as monthly buckets."""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from .database import safe_aggregate, safe_find, safe_modify
+
+
+def month_start(moment: datetime) -> datetime:
+    """Return the first instant of the month containing ``moment``."""
+    return datetime(moment.year, moment.month, 1)
+
+
+def months_back(moment: datetime, months: int) -> datetime:
+    """Return the start of the month ``months`` months before ``moment``."""
+    index = moment.year * 12 + (moment.month - 1) - months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def change_percent(old_cents: Optional[int], new_cents: int) -> Optional[float]:
+    """Relative change in percent, or None without a previous price."""
+    if not old_cents:
+        return None
+    return round((new_cents - old_cents) * 100 / old_cents, 2)
+
+
+async def record_price_change(
+    db: AsyncIOMotorDatabase,
+    subscription_id: str,
+    old_cents: Optional[int],
+    new_cents: int,
+    at: Optional[datetime] = None
+) -> None:
+    """
+    Append a price point to the subscription's bucket for the month.
+
+    One document holds all changes of a subscription within a month, so
+    history reads touch a handful of documents and the per-bucket
+    ``rises`` counter lets increase queries skip buckets without one.
+
+    Args:
+        db: Database
+        subscription_id: Subscription whose price changed
+        old_cents: Previous amount (None for the initial price)
+        new_cents: New amount
+        at: Time of the change (defaults to now)
+    """
+    at = at or datetime.utcnow()
+    rose = old_cents is not None and new_cents > old_cents
+    await safe_modify(
+        db.price_history,
+        {"subscription_id": subscription_id, "bucket": month_start(at)},
+        {
+            "$push": {"points": {"at": at, "old_cents": old_cents, "new_cents": new_cents}},
+            "$inc": {"count": 1, "rises": 1 if rose else 0},
+            "$min": {"first_at": at},
+            "$max": {"last_at": at}
+        },
+        resource_name="Preisverlauf",
+        upsert=True
+    )
+
+
+async def get_price_history(db: AsyncIOMotorDatabase, subscription_id: str) -> List[Dict[str, Any]]:
+    """Return all price points of a subscription, oldest first."""
+    buckets = await safe_find(
+        db.price_history,
+        {"subscription_id": subscription_id},
+        sort_field="bucket",
+        limit=None,
+        resource_name="Preisverlauf",
+        projection={"_id": 0, "points": 1}
+    )
+    points = [point for bucket in buckets for point in bucket["points"]]
+    points.sort(key=lambda point: point["at"])
+    return points
+
+
+async def find_price_increases(db: AsyncIOMotorDatabase, months: int) -> List[Dict[str, Any]]:
+    """
+    Find subscriptions whose price rose within the last ``months`` months.
+
+    Only buckets inside the window that recorded a rise are read (index on
+    user, bucket), so the cost depends on recent changes, not on the
+    length of the history.
+
+    Returns:
+        One entry per subscription with the price before the first rise
+        in the window, the latest price and the overall change
+    """
+    cutoff = months_back(datetime.utcnow(), months)
+    pipeline = [
+        {"$match": {"bucket": {"$gte": cutoff}, "rises": {"$gt": 0}}},
+        {"$unwind": "$points"},
+        {"$match": {"points.at": {"$gte": cutoff}}},
+        {"$sort": {"points.at": 1}},
+        {"$group": {
+            "_id": "$subscription_id",
+            "points": {"$push": "$points"}
+        }}
+    ]
+    increases = []
+    for group in await safe_aggregate(db.price_history, pipeline, resource_name="Preisverlauf"):
+        rises = [p for p in group["points"] if p["old_cents"] is not None and p["new_cents"] > p["old_cents"]]
+        if not rises:
+            continue
+        old_cents = rises[0]["old_cents"]
+        new_cents = group["points"][-1]["new_cents"]
+        increases.append({
+            "subscription_id": group["_id"],
+            "old_cents": old_cents,
+            "new_cents": new_cents,
+            "change_percent": change_percent(old_cents, new_cents),
+            "changed_at": rises[-1]["at"].isoformat()
+        })
+    increases.sort(key=lambda entry: entry["change_percent"] or 0, reverse=True)
+    return increases
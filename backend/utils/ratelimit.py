@@ -0,0 +1,207 @@
+"""Per-client token bucket rate limiting and admission control."""
+
+import ipaddress
+import math
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Callable, Dict, List, Optional, Protocol, Tuple, Union
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ReturnDocument
+
+from .constants import RATE_LIMIT_BUCKET_TTL_SECONDS, RATE_LIMIT_MAX_CLIENTS
+from .errors import RateLimitError, ServiceUnavailableError
+
+Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+def parse_networks(value: str) -> List[Network]:
+    """Parse a comma-separated list of addresses and CIDR ranges (e.g. ``10.0.0.0/8,::1``)."""
+    return [ipaddress.ip_network(part.strip(), strict=False) for part in value.split(",") if part.strip()]
+
+
+def _trusted(address: str, proxies: List[Network]) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in proxies)
+
+
+def client_address(peer: Optional[str], forwarded_for: Optional[str], trusted_proxies: List[Network]) -> str:
+    """
+    Address of the client a request came from.
+
+    ``X-Forwarded-For`` is only believed when the connection comes from a
+    trusted proxy, and then only up to the first hop that is not one of
+    them: anything further left may have been sent by the client itself.
+
+    Args:
+        peer: Address of the direct connection (None if unknown)
+        forwarded_for: Raw ``X-Forwarded-For`` header value
+        trusted_proxies: Networks of the reverse proxies in front of the API
+
+    Returns:
+        Client address, or "unknown"
+    """
+    address = peer or "unknown"
+    if not forwarded_for or not _trusted(address, trusted_proxies):
+        return address
+    for hop in reversed([hop.strip() for hop in forwarded_for.split(",") if hop.strip()]):
+        address = hop
+        if not _trusted(hop, trusted_proxies):
+            break
+    return address
+
+
+class RateLimitStore(Protocol):
+    """Storage of token buckets, in process or shared between processes."""
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        """
+        Take one token from the bucket ``key``.
+
+        Returns:
+            0 if a token was taken, otherwise seconds until one is available
+        """
+        ...
+
+
+class MemoryRateLimitStore:
+    """Token buckets in a bounded in-process LRU map."""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_CLIENTS, clock: Callable[[], float] = time.monotonic):
+        self.max_keys = max_keys
+        self._clock = clock
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        now = self._clock()
+        tokens, updated = self._buckets.pop(key, (float(burst), now))
+        tokens = min(float(burst), tokens + (now - updated) * rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+class MongoRateLimitStore:
+    """
+    Token buckets shared by all API processes through a collection.
+
+    Refill and take happen in a single pipeline update, so concurrent
+    requests from several processes cannot overdraw a bucket. Idle buckets
+    expire through a TTL index on ``expires_at``.
+    """
+
+    def __init__(self, collection: AsyncIOMotorCollection):
+        self.collection = collection
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        now = datetime.utcnow()
+        elapsed = {"$divide": [{"$subtract": [now, {"$ifNull": ["$updated_at", now]}]}, 1000]}
+        refilled = {"$min": [burst, {"$add": [{"$ifNull": ["$tokens", burst]}, {"$multiply": [elapsed, rate]}]}]}
+        bucket = await self.collection.find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {"tokens": refilled}},
+                {"$set": {
+                    "allowed": {"$gte": ["$tokens", 1]},
+                    "tokens": {"$cond": [{"$gte": ["$tokens", 1]}, {"$subtract": ["$tokens", 1]}, "$tokens"]},
+                    "updated_at": now,
+                    "expires_at": now + timedelta(seconds=RATE_LIMIT_BUCKET_TTL_SECONDS)
+                }}
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        if bucket["allowed"]:
+            return 0.0
+        return (1 - bucket["tokens"]) / rate
+
+
+class RateLimiter:
+    """Apply per-class token bucket limits to client keys."""
+
+    def __init__(self, store: RateLimitStore, limits: Dict[str, Tuple[float, int]]):
+        self.store = store
+        self.limits = limits
+
+    async def check(self, client: str, endpoint_class: str) -> None:
+        """
+        Count a request of ``client`` against the limit of ``endpoint_class``.
+
+        Raises:
+            RateLimitError: If the client's bucket for the class is empty
+        """
+        rate, burst = self.limits[endpoint_class]
+        wait = await self.store.take(f"{endpoint_class}:{client}", rate, burst)
+        if wait > 0:
+            raise RateLimitError(
+                message="Zu viele Anfragen, bitte später erneut versuchen",
+                retry_after=max(1, math.ceil(wait)),
+                details={"class": endpoint_class}
+            )
+
+
+class ConcurrencyLimiter:
+    """
+    Cap the number of operations running at once.
+
+    Requests beyond the cap are rejected right away instead of queueing,
+    so a burst of heavy work cannot pile up behind the workers and slow
+    down cheap requests.
+    """
+
+    def __init__(self, limit: int, retry_after: int = 1):
+        self.limit = limit
+        self.retry_after = retry_after
+        self.active = 0
+
+    def acquire(self) -> Callable[[], None]:
+        """
+        Take one slot until the returned function is called.
+
+        For work that outlives the block it starts in, such as a streamed
+        response body; calling the release function again has no effect.
+
+        Raises:
+            ServiceUnavailableError: If all slots are taken
+        """
+        if self.active >= self.limit:
+            raise ServiceUnavailableError(
+                message="Server ausgelastet, bitte später erneut versuchen",
+                retry_after=self.retry_after,
+                details={"limit": self.limit}
+            )
+        self.active += 1
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                self.active -= 1
+
+        return release
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """
+        Hold one slot for the duration of the block.
+
+        Raises:
+            ServiceUnavailableError: If all slots are taken
+        """
+        release = self.acquire()
+        try:
+            yield
+        finally:
+            release()
@@ -0,0 +1,67 @@
+"""Constant-time factory reset by renaming collections out of the way."""
+
+import logging
+from datetime import datetime
+from typing import List
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from .constants import TENANT_FIELD, TRASH_PREFIX
+from .database import safe_find_one
+from .indexes import INDEXES
+from .tenancy import all_users
+
+logger = logging.getLogger(__name__)
+
+
+async def _only_owner(db: AsyncIOMotorDatabase, names: List[str], user_id: str) -> bool:
+    """Whether ``user_id`` owns every document in the collections."""
+    # Looks at other users' documents on purpose
+    with all_users():
+        for name in names:
+            other = await safe_find_one(db[name], {TENANT_FIELD: {"$ne": user_id}}, projection={"_id": 1})
+            if other is not None:
+                return False
+    return True
+
+
+async def fast_reset(db: AsyncIOMotorDatabase, names: List[str], user_id: str) -> bool:
+    """
+    Empty collections by renaming them into the trash namespace.
+
+    A rename is a metadata operation, so the reset takes the same time for
+    ten documents or ten million and writes no per-document oplog entries.
+    The empty collections get their indexes from ``INDEXES`` right away;
+    the renamed ones are dropped later by ``purge_trash``.
+
+    Only possible while the collections hold nothing but ``user_id``'s
+    data; callers must fall back to a scoped delete otherwise.
+
+    Returns:
+        True if the collections were reset
+    """
+    existing = set(await db.list_collection_names())
+    names = [name for name in names if name in existing]
+    if not await _only_owner(db, names, user_id):
+        return False
+
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+    for name in names:
+        await db[name].rename(f"{TRASH_PREFIX}{name}.{stamp}")
+        if INDEXES.get(name):
+            await db[name].create_indexes(INDEXES[name])
+    return True
+
+
+async def purge_trash(db: AsyncIOMotorDatabase) -> int:
+    """
+    Drop collections moved to the trash namespace by ``fast_reset``.
+
+    Returns:
+        Number of dropped collections
+    """
+    names = [name for name in await db.list_collection_names() if name.startswith(TRASH_PREFIX)]
+    for name in names:
+        await db.drop_collection(name)
+        logger.info("Dropped %s", name)
+    return len(names)
@@ -0,0 +1,59 @@
+"""Periodic background tasks running inside the API process."""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    """
+    Run a coroutine function at a fixed interval until stopped.
+
+    Errors are logged and do not stop the loop, so a transient database
+    problem only costs one run.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        interval_seconds: float,
+        func: Callable[[], Awaitable[None]],
+        initial_delay: float = 0.0
+    ):
+        self.name = name
+        self.interval_seconds = interval_seconds
+        self._func = func
+        self._initial_delay = initial_delay
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start the loop if it is not running yet."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        """Cancel the loop and wait for it to finish."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run_once(self) -> None:
+        """Run the task immediately, logging instead of raising errors."""
+        try:
+            await self._func()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Periodic task %s failed: %s", self.name, e)
+
+    async def _loop(self) -> None:
+        await asyncio.sleep(self._initial_delay)
+        while True:
+            await self.run_once()
+            await asyncio.sleep(self.interval_seconds)
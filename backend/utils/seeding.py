@@ -0,0 +1,190 @@
+"""Synthetic subscriptions and expenses for load and capacity tests."""
+
+import asyncio
+import calendar
+import random
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from .constants import SEED_BATCH_SIZE, SEED_BATCH_TIMEOUT_MS, SEED_PARALLEL_BATCHES
+from .currency import load_display_currency
+from .database import safe_delete_many, safe_insert_many
+from .dedupe import dedupe_fields, existing_hashes, split_duplicates
+from .tenancy import user_scope
+
+# (name, category, typical monthly price in cents, share of yearly billing, weight)
+SUBSCRIPTION_CATALOG = [
+    ("Netflix", "Streaming", 1299, 0.0, 10),
+    ("Disney+", "Streaming", 899, 0.2, 6),
+    ("Amazon Prime", "Shopping", 899, 0.8, 8),
+    ("Spotify", "Musik", 999, 0.05, 10),
+    ("Apple Music", "Musik", 1099, 0.1, 4),
+    ("YouTube Premium", "Streaming", 1299, 0.05, 4),
+    ("Microsoft 365", "Software", 699, 0.9, 5),
+    ("Adobe Creative Cloud", "Software", 6545, 0.0, 2),
+    ("iCloud+", "Cloud", 299, 0.0, 6),
+    ("Google One", "Cloud", 199, 0.3, 4),
+    ("Fitnessstudio", "Sport", 2990, 0.1, 5),
+    ("Zeitungsabo", "Nachrichten", 1499, 0.3, 3),
+    ("Xbox Game Pass", "Gaming", 1299, 0.1, 3),
+    ("PlayStation Plus", "Gaming", 899, 0.9, 3),
+    ("ChatGPT Plus", "Software", 2300, 0.0, 2),
+]
+
+EXPENSE_CATALOG = [
+    ("Miete", "Wohnen", 85000, 0.0, 10),
+    ("Strom", "Wohnen", 7500, 0.05, 9),
+    ("Gas", "Wohnen", 9000, 0.05, 5),
+    ("Internet", "Kommunikation", 3999, 0.0, 9),
+    ("Handyvertrag", "Kommunikation", 2999, 0.0, 8),
+    ("KFZ-Versicherung", "Versicherung", 4000, 0.9, 6),
+    ("Haftpflichtversicherung", "Versicherung", 550, 0.95, 6),
+    ("Rundfunkbeitrag", "Gebühren", 1836, 0.0, 7),
+    ("Kita", "Familie", 25000, 0.0, 2),
+    ("ÖPNV-Ticket", "Mobilität", 4900, 0.1, 5),
+]
+
+# Yearly plans cost about ten monthly payments
+YEARLY_FACTOR = 10
+# Share of start dates placed on the 29th to 31st
+MONTH_END_SHARE = 0.1
+START_DATE_YEARS = 6
+
+
+def _start_date(rng: random.Random, today: date, recent_days: List[str]) -> str:
+    """Pick a start date within the last START_DATE_YEARS years."""
+    if rng.random() >= MONTH_END_SHARE:
+        return rng.choice(recent_days)
+    day = rng.choice((29, 30, 31))
+    year = today.year - rng.randrange(START_DATE_YEARS)
+    while True:
+        # Months of that year that have the day (February only in leap years for the 29th)
+        months = [m for m in range(1, 13) if calendar.monthrange(year, m)[1] >= day]
+        start = date(year, rng.choice(months), day)
+        if start <= today:
+            return start.isoformat()
+        year -= 1
+
+
+def _amount(rng: random.Random, typical_cents: int) -> int:
+    """Price around the typical amount, ending in ,99 or ,49 like real tariffs."""
+    euros = max(1, round(typical_cents * rng.lognormvariate(0, 0.3) / 100))
+    return euros * 100 - rng.choice((1, 1, 1, 51))
+
+
+def _generate(
+    rng: random.Random,
+    catalog: List[tuple],
+    count: int,
+    with_start_date: bool,
+    display_currency: str
+) -> Iterator[Dict[str, Any]]:
+    now = datetime.utcnow()
+    today = now.date()
+    # Formatting dates is the slowest part of generation, so do it once
+    recent_days = [(today - timedelta(days=i)).isoformat() for i in range(365 * START_DATE_YEARS)]
+    weights = [entry[-1] for entry in catalog]
+    # Occurrences per content hash; repeats get a numbered name to stay unique
+    seen: Dict[str, int] = {}
+    while count > 0:
+        templates = rng.choices(catalog, weights, k=min(count, SEED_BATCH_SIZE))
+        count -= len(templates)
+        for name, category, monthly_cents, yearly_share, _ in templates:
+            yearly = rng.random() < yearly_share
+            doc = {
+                "name": name,
+                "category": category,
+                "amount_cents": _amount(rng, monthly_cents * YEARLY_FACTOR if yearly else monthly_cents),
+                "billing_cycle": "YEARLY" if yearly else "MONTHLY",
+                "notes": None,
+                "created_at": now
+            }
+            if with_start_date:
+                doc["start_date"] = _start_date(rng, today, recent_days)
+                doc["cancel_url"] = None
+            doc.update(dedupe_fields(doc, display_currency))
+            occurrences = seen.get(doc["content_hash"], 0) + 1
+            seen[doc["content_hash"]] = occurrences
+            if occurrences > 1:
+                doc["name"] = f"{name} {occurrences}"
+                doc.update(dedupe_fields(doc, display_currency))
+            yield doc
+
+
+def generate_subscriptions(count: int, rng: random.Random, display_currency: str) -> Iterator[Dict[str, Any]]:
+    """Yield ``count`` subscription documents drawn from SUBSCRIPTION_CATALOG."""
+    return _generate(rng, SUBSCRIPTION_CATALOG, count, with_start_date=True, display_currency=display_currency)
+
+
+def generate_expenses(count: int, rng: random.Random, display_currency: str) -> Iterator[Dict[str, Any]]:
+    """Yield ``count`` expense documents drawn from EXPENSE_CATALOG."""
+    return _generate(rng, EXPENSE_CATALOG, count, with_start_date=False, display_currency=display_currency)
+
+
+async def _insert_batch(collection, batch: List[Dict[str, Any]]) -> int:
+    # Entries identical to existing data are skipped, like on import
+    known = await existing_hashes(collection, [doc["content_hash"] for doc in batch])
+    unique, _ = split_duplicates(batch, known)
+    inserted = await safe_insert_many(collection, unique, resource_name="Testdaten", timeout_ms=SEED_BATCH_TIMEOUT_MS)
+    return len(inserted)
+
+
+async def _insert_batches(collection, documents: Iterator[Dict[str, Any]]) -> int:
+    """Insert documents of the current user in unordered batches, keeping several in flight."""
+    pending: List[asyncio.Task] = []
+    batch: List[Dict[str, Any]] = []
+    inserted = 0
+    for doc in documents:
+        batch.append(doc)
+        if len(batch) == SEED_BATCH_SIZE:
+            pending.append(asyncio.create_task(_insert_batch(collection, batch)))
+            batch = []
+            if len(pending) >= SEED_PARALLEL_BATCHES:
+                inserted += await pending.pop(0)
+            else:
+                # Let the driver send the batch while the next one is built
+                await asyncio.sleep(0)
+    if batch:
+        pending.append(asyncio.create_task(_insert_batch(collection, batch)))
+    return inserted + sum(await asyncio.gather(*pending))
+
+
+async def seed_data(
+    db: AsyncIOMotorDatabase,
+    user_id: str,
+    subscriptions: int,
+    expenses: int,
+    seed: Optional[int] = None,
+    clear: bool = True
+) -> Dict[str, int]:
+    """
+    Generate synthetic data for one user.
+
+    The same seed always produces the same documents (apart from
+    ``created_at``), so benchmark runs are reproducible.
+
+    Args:
+        db: Database
+        user_id: Owner of the generated documents
+        subscriptions: Number of subscriptions to generate
+        expenses: Number of expenses to generate
+        seed: Seed for the random number generator
+        clear: Delete the user's subscriptions and expenses first
+
+    Returns:
+        Number of inserted subscriptions and expenses
+    """
+    rng = random.Random(seed)
+    # Batch tasks inherit the scope from the context they are created in
+    with user_scope(user_id):
+        # Generated items have no currency, i.e. are in the user's display currency
+        currency = await load_display_currency(db)
+        if clear:
+            await safe_delete_many(db.subscriptions, resource_name="Abonnements")
+            await safe_delete_many(db.expenses, resource_name="Fixkosten")
+        return {
+            "subscriptions": await _insert_batches(db.subscriptions, generate_subscriptions(subscriptions, rng, currency)),
+            "expenses": await _insert_batches(db.expenses, generate_expenses(expenses, rng, currency))
+        }
@@ -0,0 +1,67 @@
+"""Request coalescing for expensive read operations."""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class SingleFlight:
+    """
+    Share one in-flight computation between concurrent identical calls.
+
+    All callers that ask for the same key while a computation is running
+    await that computation instead of starting their own. With a positive
+    ``cache_ttl`` the result is additionally reused for that many seconds
+    after it completed (micro-cache), trading a short staleness window for
+    fewer database round trips under bursts.
+
+    Results are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, cache_ttl: float = 0.0):
+        self.cache_ttl = cache_ttl
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._cache: Dict[Hashable, Tuple[float, Any]] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return the result of ``fn`` for ``key``, coalescing concurrent calls.
+
+        Args:
+            key: Identity of the computation
+            fn: Coroutine function producing the result
+
+        Returns:
+            Result of the (possibly shared) computation
+
+        Raises:
+            Exception: Whatever ``fn`` raised, delivered to every waiter
+        """
+        cached = self._cache.get(key)
+        if cached is not None:
+            if cached[0] > time.monotonic():
+                return cached[1]
+            del self._cache[key]
+
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._run(key, fn))
+            self._inflight[key] = future
+        # Shield so a cancelled caller does not cancel the shared computation
+        return await asyncio.shield(future)
+
+    def forget(self, key: Optional[Hashable] = None) -> None:
+        """Drop the cached result for ``key``, or all cached results."""
+        if key is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(key, None)
+
+    async def _run(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            result = await fn()
+            if self.cache_ttl > 0:
+                self._cache[key] = (time.monotonic() + self.cache_ttl, result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
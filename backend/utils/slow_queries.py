@@ -0,0 +1,203 @@
+"""Slow-query log with sampled explain plans."""
+
+import asyncio
+import json
+import logging
+import random
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+from .constants import (
+    SLOW_QUERY_EXPLAIN_SAMPLE_RATE,
+    SLOW_QUERY_EXPLAIN_TIMEOUT_MS,
+    SLOW_QUERY_LOG_SIZE,
+    SLOW_QUERY_MAX_EXPLAINS,
+    SLOW_QUERY_MAX_SHAPES,
+    SLOW_QUERY_THRESHOLD_MS,
+)
+from .logs import current_request_id
+from .tenancy import current_user_id
+
+logger = logging.getLogger(__name__)
+
+
+def query_shape(value: Any) -> Any:
+    """Filter with every literal replaced by 1, so queries differing only in values match."""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)) and any(isinstance(item, dict) for item in value):
+        # $and / $or clauses keep their structure
+        return [query_shape(item) for item in value]
+    return 1
+
+
+def _plain(value: Any) -> Any:
+    """JSON-compatible copy of a filter (ObjectIds and dates as strings)."""
+    return json.loads(json.dumps(value, default=str))
+
+
+def summarize_explain(explain: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduce ``explain("executionStats")`` output to the plan and its costs."""
+    plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+    # Slot-based execution engine nests the classic plan
+    node: Optional[Dict[str, Any]] = plan.get("queryPlan", plan)
+    stages: List[str] = []
+    index = None
+    while node:
+        stages.append(node.get("stage", "?"))
+        index = index or node.get("indexName")
+        node = node.get("inputStage") or next(iter(node.get("inputStages") or []), None)
+    stats = explain.get("executionStats", {})
+    return {
+        "plan": " <- ".join(stages),
+        "index": index,
+        "collection_scan": "COLLSCAN" in stages,
+        "in_memory_sort": "SORT" in stages,
+        "docs_examined": stats.get("totalDocsExamined"),
+        "keys_examined": stats.get("totalKeysExamined"),
+        "returned": stats.get("nReturned"),
+        "execution_ms": stats.get("executionTimeMillis"),
+    }
+
+
+class SlowQueryLog:
+    """
+    Recent slow database operations and per-shape statistics of this process.
+
+    Operations at or above ``threshold_ms`` are kept in a bounded list
+    and aggregated by collection, operation, filter shape and sort. The
+    first occurrence of a shape and a ``explain_sample_rate`` share of the
+    rest get an ``executionStats`` explain in a background task, so a
+    collection scan or in-memory sort shows up without manual profiling.
+    """
+
+    def __init__(
+        self,
+        threshold_ms: Optional[float] = SLOW_QUERY_THRESHOLD_MS,
+        explain_sample_rate: float = SLOW_QUERY_EXPLAIN_SAMPLE_RATE,
+        capacity: int = SLOW_QUERY_LOG_SIZE,
+        max_shapes: int = SLOW_QUERY_MAX_SHAPES
+    ):
+        self.threshold_ms = threshold_ms
+        self.explain_sample_rate = explain_sample_rate
+        self.max_shapes = max_shapes
+        self.entries: deque = deque(maxlen=capacity)
+        self.shapes: "OrderedDict[Tuple[str, ...], Dict[str, Any]]" = OrderedDict()
+        self._explains: Set[asyncio.Task] = set()
+
+    def observe(
+        self,
+        collection: AsyncIOMotorCollection,
+        operation: str,
+        filter_dict: Optional[Dict[str, Any]],
+        duration_ms: float,
+        returned: Optional[int] = None,
+        sort: Optional[List[Tuple[str, int]]] = None,
+        limit: Optional[int] = None,
+        outcome: str = "ok"
+    ) -> None:
+        """Record an operation if it took at least ``threshold_ms``, however it ended."""
+        if self.threshold_ms is None or duration_ms < self.threshold_ms:
+            return
+        shape = query_shape(filter_dict or {})
+        key = (collection.name, operation, json.dumps(shape, sort_keys=True), json.dumps(sort))
+        entry = {
+            "at": datetime.utcnow().isoformat(),
+            "collection": collection.name,
+            "operation": operation,
+            "filter": _plain(filter_dict or {}),
+            "sort": sort,
+            "limit": limit,
+            "returned": returned,
+            "duration_ms": round(duration_ms, 1),
+            "outcome": outcome,
+            "request_id": current_request_id(),
+            "user_id": current_user_id(),
+        }
+        self.entries.append(entry)
+
+        stats = self.shapes.pop(key, None)
+        first = stats is None
+        if first:
+            stats = {
+                "collection": collection.name,
+                "operation": operation,
+                "shape": shape,
+                "sort": sort,
+                "count": 0,
+                "failed": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "explain": None,
+            }
+        stats["count"] += 1
+        if outcome != "ok":
+            stats["failed"] += 1
+        stats["total_ms"] = round(stats["total_ms"] + duration_ms, 1)
+        stats["max_ms"] = max(stats["max_ms"], entry["duration_ms"])
+        stats["last_seen"] = entry["at"]
+        self.shapes[key] = stats
+        if len(self.shapes) > self.max_shapes:
+            self.shapes.popitem(last=False)
+        logger.warning(
+            "Slow %s on %s: %.1f ms (%s)",
+            operation,
+            collection.name,
+            duration_ms,
+            outcome,
+            extra={"shape": shape, "returned": returned}
+        )
+
+        if (first or random.random() < self.explain_sample_rate) and len(self._explains) < SLOW_QUERY_MAX_EXPLAINS:
+            task = asyncio.get_running_loop().create_task(
+                self._explain(collection, filter_dict or {}, sort, limit, entry, stats)
+            )
+            self._explains.add(task)
+            task.add_done_callback(self._explains.discard)
+
+    async def _explain(
+        self,
+        collection: AsyncIOMotorCollection,
+        filter_dict: Dict[str, Any],
+        sort: Optional[List[Tuple[str, int]]],
+        limit: Optional[int],
+        entry: Dict[str, Any],
+        stats: Dict[str, Any]
+    ) -> None:
+        # Writes are explained as a find with their filter: the plan that
+        # locates the documents is the same and nothing gets modified
+        find: Dict[str, Any] = {
+            "find": collection.name,
+            "filter": filter_dict,
+            "maxTimeMS": SLOW_QUERY_EXPLAIN_TIMEOUT_MS
+        }
+        if sort:
+            find["sort"] = dict(sort)
+        if limit:
+            find["limit"] = limit
+        try:
+            explain = await collection.database.command({"explain": find, "verbosity": "executionStats"})
+        except Exception as e:
+            logger.info("Explain failed for %s: %s", collection.name, e)
+            return
+        entry["explain"] = stats["explain"] = summarize_explain(explain)
+
+    def report(self) -> Dict[str, Any]:
+        """Shapes by total time spent, then recent entries, newest first."""
+        return {
+            "threshold_ms": self.threshold_ms,
+            "shapes": sorted(self.shapes.values(), key=lambda s: s["total_ms"], reverse=True),
+            "recent": list(reversed(self.entries)),
+        }
+
+    def clear(self) -> None:
+        """Forget all recorded operations."""
+        self.entries.clear()
+        self.shapes.clear()
+
+
+# Shared by all database wrappers of the process
+slow_query_log = SlowQueryLog()
@@ -0,0 +1,115 @@
+"""Per-user data scoping for a multi-tenant deployment."""
+
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Any, Dict, Iterator, Optional
+
+import jwt
+
+from .constants import DEFAULT_USER_ID, TENANT_FIELD
+from .errors import AuthenticationError
+
+# User whose data the current request or background task operates on
+_current_user_id: ContextVar[str] = ContextVar("current_user_id", default=DEFAULT_USER_ID)
+# Set while system work (job queue, outbox, sweeps) spans all users
+_all_users: ContextVar[bool] = ContextVar("all_users", default=False)
+
+
+def current_user_id() -> str:
+    """Return the user id bound to the current context."""
+    return _current_user_id.get()
+
+
+def set_current_user(user_id: str) -> Token:
+    """Bind ``user_id`` to the current context and return a reset token."""
+    return _current_user_id.set(user_id)
+
+
+@contextmanager
+def user_scope(user_id: str) -> Iterator[None]:
+    """Temporarily operate on the data of ``user_id`` (for background work)."""
+    token = _current_user_id.set(user_id)
+    # Per-user work started from a system task is scoped again
+    all_users_token = _all_users.set(False)
+    try:
+        yield
+    finally:
+        _all_users.reset(all_users_token)
+        _current_user_id.reset(token)
+
+
+@contextmanager
+def all_users() -> Iterator[None]:
+    """
+    Temporarily operate on the data of every user.
+
+    Only for system work such as the job queue, the notification outbox
+    and maintenance sweeps; filters are left unscoped and new documents
+    must name their owner themselves.
+    """
+    token = _all_users.set(True)
+    try:
+        yield
+    finally:
+        _all_users.reset(token)
+
+
+def scoped(filter_dict: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Restrict a filter to the documents of the current user.
+
+    Args:
+        filter_dict: Filter criteria (None for all documents of the user)
+
+    Returns:
+        New filter that always leads with the tenant field (unchanged
+        inside ``all_users``); a tenant condition in ``filter_dict`` is
+        replaced, never merged
+    """
+    if _all_users.get():
+        return dict(filter_dict or {})
+    scoped_filter = {TENANT_FIELD: current_user_id()}
+    scoped_filter.update((key, value) for key, value in (filter_dict or {}).items() if key != TENANT_FIELD)
+    return scoped_filter
+
+
+def stamp(document: Dict[str, Any]) -> Dict[str, Any]:
+    """Assign a document to the current user (in place; kept as is inside ``all_users``)."""
+    if not _all_users.get():
+        document[TENANT_FIELD] = current_user_id()
+    return document
+
+
+def resolve_user_id(authorization: Optional[str], secret: Optional[str]) -> str:
+    """
+    Determine the user from an ``Authorization: Bearer <jwt>`` header.
+
+    Without a configured secret the deployment is single-user and every
+    request belongs to the default user.
+
+    Args:
+        authorization: Raw Authorization header value
+        secret: HS256 signing secret, or None when authentication is off
+
+    Returns:
+        User id taken from the token's ``sub`` claim
+
+    Raises:
+        AuthenticationError: If the token is missing or invalid
+    """
+    if not secret:
+        return DEFAULT_USER_ID
+
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise AuthenticationError("Anmeldung erforderlich")
+
+    try:
+        payload = jwt.decode(token, secret, algorithms=["HS256"])
+    except jwt.PyJWTError as e:
+        raise AuthenticationError("Ungültiges Token", details={"error": str(e)})
+
+    user_id = payload.get("sub")
+    if not user_id:
+        raise AuthenticationError("Token enthält keinen Benutzer")
+    return str(user_id)
@@ -0,0 +1,153 @@
+"""Daily spending snapshots and downsampled trend series."""
+
+import logging
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from .analytics import category_totals
+from .constants import MAX_TREND_POINTS, TENANT_FIELD
+from .currency import FxTable, load_display_currency
+from .database import safe_aggregate, safe_distinct, safe_find, safe_insert_one
+from .errors import ConflictError, ValidationError
+from .tenancy import all_users, user_scope
+
+logger = logging.getLogger(__name__)
+
+# Period keys per granularity, finest first
+GRANULARITY_FORMATS = {
+    "day": "%Y-%m-%d",
+    "week": "%G-W%V",
+    "month": "%Y-%m",
+}
+_PERIOD_DAYS = {"day": 1, "week": 7, "month": 30}
+
+
+async def take_daily_snapshots(
+    db: AsyncIOMotorDatabase,
+    fx: FxTable,
+    today: Optional[date] = None
+) -> int:
+    """
+    Store today's per-category monthly totals for every user without one.
+
+    The numbers are the same as those of the category breakdown endpoint,
+    converted to the user's display currency with today's rates.
+    A unique index on (user, day) makes concurrent runs harmless.
+
+    Returns:
+        Number of snapshots written
+    """
+    day = datetime.combine(today or datetime.utcnow().date(), datetime.min.time())
+    with all_users():
+        done = set(await safe_distinct(db.spending_snapshots, TENANT_FIELD, {"day": day}, resource_name="Verlauf"))
+        users = set(await safe_distinct(db.subscriptions, TENANT_FIELD, resource_name="Abonnements"))
+        users.update(await safe_distinct(db.expenses, TENANT_FIELD, resource_name="Fixkosten"))
+
+    written = 0
+    projection = {"category": 1, "amount_cents": 1, "billing_cycle": 1, "currency": 1}
+    for user_id in sorted(users - done):
+        with user_scope(user_id):
+            currency = await load_display_currency(db)
+            subscriptions = await safe_find(
+                db.subscriptions, limit=None, resource_name="Abonnements", projection=projection
+            )
+            expenses = await safe_find(db.expenses, limit=None, resource_name="Fixkosten", projection=projection)
+            try:
+                categories = category_totals(fx.in_currency(subscriptions, currency), fx.in_currency(expenses, currency))
+            except ValidationError as e:
+                # A currency missing from the rate file must not stop other users' snapshots
+                logger.error("Skipping spending snapshot of %s: %s", user_id, e.message)
+                continue
+            try:
+                await safe_insert_one(db.spending_snapshots, {
+                    "day": day,
+                    "currency": currency,
+                    "total_cents": sum(entry["monthly_cents"] for entry in categories),
+                    "categories": [
+                        {"category": entry["category"], "monthly_cents": entry["monthly_cents"]}
+                        for entry in categories
+                    ]
+                }, resource_name="Tagesstand")
+                written += 1
+            except ConflictError:
+                continue
+    return written
+
+
+def choose_granularity(start: date, end: date, granularity: Optional[str]) -> str:
+    """
+    Validate the requested granularity or pick the finest one that fits.
+
+    Raises:
+        ValidationError: If the granularity is unknown or would produce
+            more than MAX_TREND_POINTS points
+    """
+    span_days = (end - start).days + 1
+    if granularity is None:
+        for candidate in GRANULARITY_FORMATS:
+            if span_days / _PERIOD_DAYS[candidate] <= MAX_TREND_POINTS:
+                return candidate
+        return "month"
+    if granularity not in GRANULARITY_FORMATS:
+        raise ValidationError(
+            message="Ungültige Granularität",
+            details={"granularity": granularity, "valid_values": list(GRANULARITY_FORMATS)}
+        )
+    if span_days / _PERIOD_DAYS[granularity] > MAX_TREND_POINTS:
+        raise ValidationError(
+            message="Zeitraum zu lang für diese Granularität",
+            details={"granularity": granularity, "max_points": MAX_TREND_POINTS}
+        )
+    return granularity
+
+
+async def spending_trend(
+    db: AsyncIOMotorDatabase,
+    start: date,
+    end: date,
+    granularity: str
+) -> List[Dict[str, Any]]:
+    """
+    Average daily snapshots of the current user into periods.
+
+    Args:
+        db: Database
+        start: First day (inclusive)
+        end: Last day (inclusive)
+        granularity: "day", "week" or "month"
+
+    Returns:
+        One point per period with data: period key, number of days, and
+        average monthly totals overall and per category
+    """
+    pipeline = [
+        {"$match": {"day": {
+            "$gte": datetime.combine(start, datetime.min.time()),
+            "$lt": datetime.combine(end + timedelta(days=1), datetime.min.time())
+        }}},
+        {"$group": {
+            "_id": {"$dateToString": {"format": GRANULARITY_FORMATS[granularity], "date": "$day"}},
+            "days": {"$sum": 1},
+            "total_cents": {"$sum": "$total_cents"},
+            "categories": {"$push": "$categories"}
+        }},
+        {"$sort": {"_id": 1}}
+    ]
+
+    points = []
+    for period in await safe_aggregate(db.spending_snapshots, pipeline, resource_name="Verlauf"):
+        days = period["days"]
+        # Days without a category count as zero for it
+        per_category: Dict[str, int] = {}
+        for snapshot_categories in period["categories"]:
+            for entry in snapshot_categories:
+                per_category[entry["category"]] = per_category.get(entry["category"], 0) + entry["monthly_cents"]
+        points.append({
+            "period": period["_id"],
+            "days": days,
+            "total_cents": period["total_cents"] // days,
+            "categories": {cat: cents // days for cat, cents in per_category.items()}
+        })
+    return points
@@ -0,0 +1,28 @@
+"""Shared pytest configuration for the backend test suite."""
+
+import importlib
+import os
+import sys
+from pathlib import Path
+
+import mongomock_motor
+import pytest
+
+# The backend is run from its own directory and imports ``utils`` top-level
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+
+@pytest.fixture
+def server():
+    """The API module; it connects lazily, so importing needs no running database."""
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ.setdefault("DB_NAME", "subtrack_test")
+    return importlib.import_module("server")
+
+
+@pytest.fixture
+def api_db(monkeypatch, server):
+    """Fresh in-memory database behind the API."""
+    db = mongomock_motor.AsyncMongoMockClient()["test"]
+    monkeypatch.setattr(server, "db", db)
+    return db
@@ -0,0 +1,68 @@
+"""Tests for the columnar export against the JSON export of the same data."""
+
+import asyncio
+import io
+from datetime import datetime
+
+import httpx
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+from utils.arrow_export import LINE_ITEM_SCHEMA
+from utils.constants import DEFAULT_USER_ID, TENANT_FIELD
+
+SUBSCRIPTIONS = [
+    {
+        "name": "Netflix", "category": "Streaming", "amount_cents": 1299, "billing_cycle": "MONTHLY",
+        "start_date": "2024-01-31", "currency": "EUR", "notes": "Familie", "cancel_url": "https://netflix.com",
+        "created_at": datetime(2024, 2, 1, 8, 30, 15, 123000),
+    },
+    # Older documents lack optional fields
+    {"name": "Zeitung", "category": "Nachrichten", "amount_cents": 14990, "billing_cycle": "YEARLY",
+     "start_date": "2020-02-29", "created_at": datetime(2020, 2, 29)},
+]
+EXPENSES = [
+    {"name": "Miete", "category": "Wohnen", "amount_cents": 85000, "billing_cycle": "MONTHLY",
+     "currency": "CHF", "notes": None, "created_at": datetime(2023, 12, 31, 23, 59, 59, 999000)},
+]
+
+
+def _get(server, *urls):
+    async def run():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return [await client.get(url) for url in urls]
+
+    return asyncio.run(run())
+
+
+def test_parquet_and_arrow_round_trip_to_the_json_export(monkeypatch, server, api_db, tmp_path):
+    monkeypatch.setattr(server.export_cache, "directory", tmp_path)
+
+    async def populate():
+        await api_db.subscriptions.insert_many([{TENANT_FIELD: DEFAULT_USER_ID, **doc} for doc in SUBSCRIPTIONS])
+        await api_db.expenses.insert_many([{TENANT_FIELD: DEFAULT_USER_ID, **doc} for doc in EXPENSES])
+
+    asyncio.run(populate())
+    exported, parquet, arrow = _get(server, "/api/export/json", "/api/export/parquet", "/api/export/arrow")
+    assert exported.status_code == parquet.status_code == arrow.status_code == 200
+
+    data = exported.json()
+    expected = {
+        doc["id"]: {"kind": kind, **doc}
+        for kind, docs in (("subscription", data["subscriptions"]), ("expense", data["expenses"]))
+        for doc in docs
+    }
+    parquet_rows = pq.read_table(io.BytesIO(parquet.content)).to_pylist()
+    arrow_rows = ipc.open_stream(io.BytesIO(arrow.content)).read_all().to_pylist()
+    assert parquet_rows == arrow_rows
+    assert [row["kind"] for row in parquet_rows] == ["subscription"] * 2 + ["expense"]
+
+    for row in parquet_rows:
+        doc = expected.pop(row["id"])
+        for column in LINE_ITEM_SCHEMA.names:
+            value = row[column]
+            if column == "created_at":
+                value = value.isoformat()
+            assert value == doc.get(column), column
+    assert expected == {}
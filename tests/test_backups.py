@@ -0,0 +1,75 @@
+"""Tests for scheduled full and incremental backups."""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import mongomock_motor
+
+from utils.backups import BackupManager, record_deletion, restore_backup
+from utils.constants import BACKUP_INCREMENTAL_INTERVAL_SECONDS, TENANT_FIELD
+from utils.export_cache import data_version
+from utils.tenancy import user_scope
+
+
+def test_unchanged_data_writes_no_incremental_and_keeps_the_export_version(tmp_path):
+    async def scenario():
+        db = mongomock_motor.AsyncMongoMockClient()["test"]
+        start = datetime(2024, 3, 1, 12)
+        step = timedelta(seconds=BACKUP_INCREMENTAL_INTERVAL_SECONDS)
+        await db.settings.insert_one({TENANT_FIELD: "u1", "type": "app_settings", "backup_interval": "weekly"})
+        await db.subscriptions.insert_one({TENANT_FIELD: "u1", "name": "Netflix", "created_at": start})
+        manager = BackupManager(db, tmp_path)
+
+        full = await manager.backup_user("u1", now=start)
+        with user_scope("u1"):
+            version = await data_version(db)
+        unchanged = await manager.backup_user("u1", now=start + step)
+        await db.subscriptions.insert_one({TENANT_FIELD: "u1", "name": "Spotify", "created_at": start + step * 1.5})
+        changed = await manager.backup_user("u1", now=start + step * 2)
+        with user_scope("u1"):
+            version_after = await data_version(db)
+        settings = await db.settings.find_one({TENANT_FIELD: "u1"})
+        return full, unchanged, changed, version, version_after, settings["last_backup"], start + step * 2
+
+    full, unchanged, changed, version, version_after, last_backup, changed_at = asyncio.run(scenario())
+    assert full.name.startswith("full-")
+    assert unchanged is None
+    assert changed.name.startswith("incr-")
+    assert sorted(path.name for path in full.parent.iterdir()) == sorted([full.name, changed.name])
+    assert version == version_after == 0
+    assert last_backup == changed_at.isoformat()
+
+
+def test_restore_replays_incrementals_and_leaves_other_users_alone(tmp_path):
+    async def scenario():
+        db = mongomock_motor.AsyncMongoMockClient()["test"]
+        start = datetime(2024, 3, 1, 12)
+        step = timedelta(seconds=BACKUP_INCREMENTAL_INTERVAL_SECONDS)
+        manager = BackupManager(db, tmp_path)
+        kept = await db.subscriptions.insert_one({TENANT_FIELD: "u1", "name": "Netflix", "created_at": start})
+        gone = await db.subscriptions.insert_one({TENANT_FIELD: "u1", "name": "Sky", "created_at": start})
+        await db.subscriptions.insert_one({TENANT_FIELD: "u2", "name": "Spotify", "created_at": start})
+        await manager.backup_user("u1", now=start)
+
+        changed_at = start + step * 0.5
+        await db.subscriptions.update_one(
+            {"_id": kept.inserted_id}, {"$set": {"name": "Netflix Premium", "updated_at": changed_at}}
+        )
+        await db.subscriptions.delete_one({"_id": gone.inserted_id})
+        with user_scope("u1"):
+            await record_deletion(db, "subscriptions", str(gone.inserted_id))
+        await manager.backup_user("u1", now=start + step)
+
+        # Lost data of u1 comes back, u2 is untouched
+        await db.subscriptions.delete_many({TENANT_FIELD: "u1"})
+        await db.subscriptions.insert_one({TENANT_FIELD: "u1", "name": "Nach der Sicherung", "created_at": start})
+        counts = await restore_backup(db, tmp_path, "u1")
+        names = {
+            doc["name"]: doc[TENANT_FIELD]
+            for doc in await db.subscriptions.find({}).to_list(None)
+        }
+        return counts, names
+
+    counts, names = asyncio.run(scenario())
+    assert counts == {"subscriptions": 1, "expenses": 0, "snapshots": 2}
+    assert names == {"Netflix Premium": "u1", "Spotify": "u2"}
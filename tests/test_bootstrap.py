@@ -0,0 +1,42 @@
+"""Tests for the combined startup data endpoint."""
+
+import asyncio
+from datetime import datetime
+
+import httpx
+
+from utils.constants import DEFAULT_USER_ID, TENANT_FIELD
+
+CREATED = datetime(2024, 1, 15, 9, 30)
+
+
+def test_bootstrap_matches_the_individual_endpoints(server, api_db):
+    async def scenario():
+        await api_db.settings.insert_one({TENANT_FIELD: DEFAULT_USER_ID, "type": "app_settings", "currency": "EUR"})
+        await api_db.subscriptions.insert_many([
+            {TENANT_FIELD: DEFAULT_USER_ID, "name": name, "category": "Streaming", "amount_cents": cents,
+             "billing_cycle": cycle, "start_date": "2024-01-15", "created_at": CREATED}
+            for name, cents, cycle in (("Spotify", 999, "MONTHLY"), ("Netflix", 1299, "MONTHLY"), ("Prime", 8990, "YEARLY"))
+        ])
+        await api_db.expenses.insert_one({
+            TENANT_FIELD: DEFAULT_USER_ID, "name": "Miete", "category": "Wohnen",
+            "amount_cents": 85000, "billing_cycle": "MONTHLY", "created_at": CREATED
+        })
+        # Another user's data stays out
+        await api_db.subscriptions.insert_one({
+            TENANT_FIELD: "bob", "name": "Fremd", "category": "Streaming", "amount_cents": 1,
+            "billing_cycle": "MONTHLY", "start_date": "2024-01-15"
+        })
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            urls = ["/api/bootstrap", "/api/subscriptions", "/api/expenses", "/api/dashboard", "/api/settings"]
+            return [await client.get(url) for url in urls]
+
+    bootstrap, subscriptions, expenses, dashboard, settings = asyncio.run(scenario())
+    assert all(response.status_code == 200 for response in (bootstrap, subscriptions, expenses, dashboard, settings))
+    data = bootstrap.json()
+    assert [sub["name"] for sub in data["subscriptions"]] == ["Netflix", "Prime", "Spotify"]
+    assert data["subscriptions"] == subscriptions.json()
+    assert data["expenses"] == expenses.json()
+    assert data["dashboard"] == dashboard.json()
+    assert data["settings"] == settings.json()
@@ -0,0 +1,69 @@
+"""Tests for budgets kept up to date by single writes and bulk changes."""
+
+import asyncio
+from decimal import Decimal
+
+import mongomock_motor
+
+from utils.budgets import apply_item_change, invalidate_budgets
+from utils.constants import DEFAULT_USER_ID, TENANT_FIELD
+from utils.currency import FxTable
+
+FX = FxTable("EUR", {"EUR": Decimal("1")}, "2024-12-31", "test")
+
+
+def _item(name: str, amount_cents: int, category: str = "Streaming") -> dict:
+    return {
+        TENANT_FIELD: DEFAULT_USER_ID, "name": name, "category": category,
+        "amount_cents": amount_cents, "billing_cycle": "MONTHLY", "currency": "EUR"
+    }
+
+
+async def _database(spent_cents: int = 0, stale: bool = False):
+    db = mongomock_motor.AsyncMongoMockClient()["test"]
+    await db.budgets.insert_one({
+        TENANT_FIELD: DEFAULT_USER_ID, "category": "Streaming", "limit_cents": 10000,
+        "thresholds": [50, 80, 100], "currency": "EUR", "spent_cents": spent_cents, "stale": stale
+    })
+    return db
+
+
+def test_write_increments_budget_and_alerts_once_per_crossed_threshold():
+    async def scenario():
+        db = await _database()
+        first = _item("Netflix", 4000)
+        raised = [await apply_item_change(db, FX, None, first)]
+        # From 40% to 85%: passes 50% and 80% in one write
+        raised.append(await apply_item_change(db, FX, None, _item("Sky", 4500)))
+        # A price cut moves back below 80%; raising it again alerts again
+        cheaper = {**first, "amount_cents": 3000}
+        raised.append(await apply_item_change(db, FX, first, cheaper))
+        raised.append(await apply_item_change(db, FX, cheaper, first))
+        # Other categories do not count
+        raised.append(await apply_item_change(db, FX, None, _item("Miete", 90000, "Wohnen")))
+        budget = await db.budgets.find_one({})
+        alerts = await db.alerts.find({}, {"threshold": 1}).to_list(None)
+        return raised, budget["spent_cents"], [alert["threshold"] for alert in alerts]
+
+    raised, spent, thresholds = asyncio.run(scenario())
+    assert raised == [0, 2, 0, 1, 0]
+    assert spent == 8500
+    assert thresholds == [50, 80, 80]
+
+
+def test_write_after_bulk_change_recomputes_stale_budget_and_alerts():
+    async def scenario():
+        db = await _database(spent_cents=1000)
+        # A bulk import added items without touching the budget
+        await db.subscriptions.insert_many([_item(f"Import {i}", 1500) for i in range(6)])
+        await invalidate_budgets(db, DEFAULT_USER_ID)
+        added = _item("Netflix", 1000)
+        await db.subscriptions.insert_one(added)
+        raised = await apply_item_change(db, FX, None, added)
+        budget = await db.budgets.find_one({})
+        return raised, budget
+
+    raised, budget = asyncio.run(scenario())
+    assert budget["spent_cents"] == 6 * 1500 + 1000
+    assert budget["stale"] is False
+    assert raised == 3
@@ -0,0 +1,81 @@
+"""Tests for the columnar snapshot against the document-based calculations."""
+
+import asyncio
+import random
+
+import mongomock_motor
+from bson import ObjectId
+
+from utils.analytics import category_totals, monthly_cents
+from utils.columnar import KINDS, ColumnarStore, LineItemColumns
+from utils.constants import DEFAULT_USER_ID, TENANT_FIELD
+
+
+def _doc(rng: random.Random, doc_id: ObjectId = None) -> dict:
+    return {
+        "_id": doc_id or ObjectId(),
+        "name": "Eintrag",
+        "category": rng.choice(["Streaming", "Wohnen", "Software", "Versicherung"]),
+        "amount_cents": rng.randrange(1, 100000),
+        "billing_cycle": rng.choice(["MONTHLY", "YEARLY"]),
+        "currency": "EUR",
+    }
+
+
+def test_random_writes_match_the_documents(server):
+    rng = random.Random(7)
+    fx = server.fx_rates.table()
+    columns = LineItemColumns(capacity=4)
+    docs = {"subscriptions": {}, "expenses": {}}
+    # Ids ending in NUL bytes, which the S12 column stores shortened
+    ids = [ObjectId(bytes([i]) * 10 + b"\0\0") for i in range(1, 20)] + [ObjectId() for _ in range(200)]
+    for _ in range(1000):
+        name = rng.choice(list(KINDS))
+        doc_id = rng.choice(ids)
+        other = "expenses" if name == "subscriptions" else "subscriptions"
+        if rng.random() < 0.3:
+            docs[name].pop(doc_id, None)
+            docs[other].pop(doc_id, None)
+            columns.remove(doc_id)
+        elif doc_id not in docs[other]:
+            docs[name][doc_id] = _doc(rng, doc_id)
+            columns.upsert(KINDS[name], docs[name][doc_id])
+
+    subscriptions = list(docs["subscriptions"].values())
+    expenses = list(docs["expenses"].values())
+    assert columns.size == len(subscriptions) + len(expenses)
+    assert columns.dashboard(fx, "EUR") == server._summarize_dashboard(subscriptions, expenses, "EUR").model_dump(
+        exclude={"currency"}
+    )
+    assert sorted(columns.category_totals(fx, "EUR"), key=lambda e: e["category"]) == sorted(
+        category_totals(subscriptions, expenses), key=lambda e: e["category"]
+    )
+    top = columns.top(KINDS["subscriptions"], 5, fx, "EUR")
+    expected = sorted(subscriptions, key=lambda d: -monthly_cents(d))[:5]
+    assert [monthly_cents(docs["subscriptions"][doc_id]) for doc_id in top] == [
+        monthly_cents(doc) for doc in expected
+    ]
+
+
+def test_writes_during_a_build_are_kept():
+    rng = random.Random(3)
+
+    async def scenario():
+        db = mongomock_motor.AsyncMongoMockClient()["test"]
+        stored = [{TENANT_FIELD: DEFAULT_USER_ID, **_doc(rng)} for _ in range(20)]
+        await db.subscriptions.insert_many(stored)
+        store = ColumnarStore(db)
+        added = {TENANT_FIELD: DEFAULT_USER_ID, **_doc(rng)}
+
+        async def write_while_building():
+            await asyncio.sleep(0)
+            assert DEFAULT_USER_ID in store._pending
+            store.remove(DEFAULT_USER_ID, stored[0]["_id"])
+            store.apply(DEFAULT_USER_ID, "expenses", added)
+
+        columns, _ = await asyncio.gather(store.get(DEFAULT_USER_ID), write_while_building())
+        return columns
+
+    columns = asyncio.run(scenario())
+    assert columns.size == 20
+    assert int((columns.kind[:columns.size] == KINDS["expenses"]).sum()) == 1
@@ -0,0 +1,52 @@
+"""Tests for the currency of items stored without one."""
+
+import asyncio
+from decimal import Decimal
+
+import mongomock_motor
+
+from utils.budgets import apply_item_change, recompute_budgets
+from utils.constants import DEFAULT_USER_ID, TENANT_FIELD
+from utils.currency import FxTable
+from utils.dedupe import content_hash
+
+FX = FxTable("EUR", {"EUR": Decimal("1"), "USD": Decimal("1.25")}, "2024-12-31", "test")
+
+# Stored before items had a currency: in the display currency (USD below)
+LEGACY_ITEM = {"name": "Netflix", "category": "Streaming", "amount_cents": 1000, "billing_cycle": "MONTHLY"}
+
+
+def test_items_without_currency_hash_like_the_display_currency():
+    assert content_hash(LEGACY_ITEM, "USD") == content_hash({**LEGACY_ITEM, "currency": "USD"}, "USD")
+    assert content_hash(LEGACY_ITEM, "USD") != content_hash({**LEGACY_ITEM, "currency": "EUR"}, "USD")
+    assert content_hash(LEGACY_ITEM, "EUR") == content_hash({**LEGACY_ITEM, "currency": "EUR"}, "EUR")
+
+
+def test_totals_convert_items_without_currency_from_the_display_currency():
+    assert FX.in_currency([LEGACY_ITEM], "EUR", "USD")[0]["amount_cents"] == 800
+    assert FX.in_currency([LEGACY_ITEM], "USD")[0] is LEGACY_ITEM
+
+
+def test_budget_in_other_currency_counts_items_in_the_display_currency():
+    async def scenario():
+        db = mongomock_motor.AsyncMongoMockClient()["test"]
+        await db.settings.insert_one({TENANT_FIELD: DEFAULT_USER_ID, "type": "app_settings", "currency": "USD"})
+        await db.budgets.insert_one({
+            TENANT_FIELD: DEFAULT_USER_ID, "category": None, "limit_cents": 10000, "thresholds": [80],
+            "currency": "EUR", "spent_cents": 0, "stale": False
+        })
+        await db.subscriptions.insert_one({TENANT_FIELD: DEFAULT_USER_ID, **LEGACY_ITEM})
+        await db.expenses.insert_one({
+            TENANT_FIELD: DEFAULT_USER_ID, "name": "Miete", "category": "Wohnen",
+            "amount_cents": 50000, "billing_cycle": "MONTHLY", "currency": "EUR"
+        })
+
+        # Incremental update on write and full recomputation agree
+        await apply_item_change(db, FX, None, LEGACY_ITEM)
+        incremental = (await db.budgets.find_one({}))["spent_cents"]
+        recomputed = await recompute_budgets(db, FX, await db.budgets.find({}).to_list(None))
+        return incremental, recomputed[0]["spent_cents"]
+
+    incremental, recomputed = asyncio.run(scenario())
+    assert incremental == 800
+    assert recomputed == 800 + 50000
@@ -0,0 +1,241 @@
+"""Resilience tests for the database wrappers against a fault-injecting fake."""
+
+import asyncio
+import time
+
+import pytest
+from pymongo.errors import AutoReconnect, NotPrimaryError, OperationFailure
+
+from utils import database
+from utils.database import (
+    CircuitBreaker,
+    database_breaker,
+    safe_find,
+    safe_find_one,
+    safe_insert_one,
+    safe_update_one,
+)
+from utils.errors import DatabaseError
+from utils.slow_queries import SlowQueryLog
+
+
+class _Result:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+class _Cursor:
+    def __init__(self, owner, docs):
+        self._owner = owner
+        self._docs = docs
+
+    def sort(self, *args):
+        return self
+
+    def limit(self, limit):
+        return self
+
+    async def to_list(self, length):
+        await self._owner._maybe_fail("find")
+        return list(self._docs)
+
+
+class FaultyCollection:
+    """Fake collection that fails or stalls according to a script."""
+
+    name = "subscriptions"
+
+    def __init__(self, failures=None, delay=0.0):
+        # Exceptions raised by the next calls, in order
+        self.failures = list(failures or [])
+        self.delay = delay
+        self.calls = {}
+        self.max_time_ms = None
+
+    async def _maybe_fail(self, op):
+        self.calls[op] = self.calls.get(op, 0) + 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.failures:
+            raise self.failures.pop(0)
+
+    async def find_one(self, filter_dict, projection=None, max_time_ms=None):
+        self.max_time_ms = max_time_ms
+        await self._maybe_fail("find_one")
+        return {"_id": 1, "name": "Netflix"}
+
+    def find(self, filter_dict, projection=None, max_time_ms=None):
+        self.max_time_ms = max_time_ms
+        return _Cursor(self, [{"_id": 1}, {"_id": 2}])
+
+    async def insert_one(self, document):
+        await self._maybe_fail("insert_one")
+        return _Result(inserted_id="abc")
+
+    async def update_one(self, filter_dict, update):
+        await self._maybe_fail("update_one")
+        return _Result(matched_count=1)
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(database, "DB_RETRY_BASE_DELAY_SECONDS", 0.001)
+    monkeypatch.setattr(database, "DB_RETRY_MAX_DELAY_SECONDS", 0.002)
+    database_breaker.reset()
+    yield
+    database_breaker.reset()
+
+
+def test_read_retries_transient_errors():
+    collection = FaultyCollection(failures=[AutoReconnect("reset"), NotPrimaryError("stepdown")])
+
+    doc = asyncio.run(safe_find_one(collection, {"_id": 1}))
+
+    assert doc["name"] == "Netflix"
+    assert collection.calls["find_one"] == 3
+
+
+def test_find_passes_deadline_to_server():
+    collection = FaultyCollection()
+
+    docs = asyncio.run(safe_find(collection, timeout_ms=750))
+
+    assert len(docs) == 2
+    assert collection.max_time_ms == 750
+
+
+def test_read_gives_up_after_bounded_attempts():
+    collection = FaultyCollection(failures=[AutoReconnect("down")] * 10)
+
+    with pytest.raises(DatabaseError):
+        asyncio.run(safe_find_one(collection, {"_id": 1}))
+
+    assert collection.calls["find_one"] == database.DB_RETRY_ATTEMPTS
+
+
+def test_insert_is_not_retried():
+    collection = FaultyCollection(failures=[AutoReconnect("reset")])
+
+    with pytest.raises(DatabaseError):
+        asyncio.run(safe_insert_one(collection, {"name": "Netflix"}))
+
+    assert collection.calls["insert_one"] == 1
+
+
+def test_set_update_is_retried():
+    collection = FaultyCollection(failures=[AutoReconnect("reset")])
+
+    assert asyncio.run(safe_update_one(collection, {"_id": 1}, {"name": "Spotify"}))
+    assert collection.calls["update_one"] == 2
+
+
+def test_non_transient_error_is_not_retried():
+    collection = FaultyCollection(failures=[OperationFailure("bad query")])
+
+    with pytest.raises(DatabaseError):
+        asyncio.run(safe_find_one(collection, {"_id": 1}))
+
+    assert collection.calls["find_one"] == 1
+    assert database_breaker.state == CircuitBreaker.CLOSED
+
+
+def test_slow_query_is_bounded_by_deadline():
+    collection = FaultyCollection(delay=5.0)
+
+    started = time.monotonic()
+    with pytest.raises(DatabaseError):
+        asyncio.run(safe_find_one(collection, {"_id": 1}, timeout_ms=50))
+
+    # Timeouts are not retried, so latency stays close to one deadline
+    assert time.monotonic() - started < 1.0
+    assert collection.calls["find_one"] == 1
+
+
+def test_slow_query_log_records_timed_out_and_failed_attempts(monkeypatch):
+    log = SlowQueryLog(threshold_ms=10, explain_sample_rate=0)
+    monkeypatch.setattr(database, "slow_query_log", log)
+
+    with pytest.raises(DatabaseError):
+        asyncio.run(safe_find_one(FaultyCollection(delay=5.0), {"_id": 1}, timeout_ms=50))
+    with pytest.raises(DatabaseError):
+        asyncio.run(safe_find_one(FaultyCollection(failures=[OperationFailure("bad query")], delay=0.02), {"_id": 1}))
+
+    assert [entry["outcome"] for entry in log.entries] == ["timeout", "error"]
+    assert log.entries[0]["duration_ms"] >= 50
+    assert log.report()["shapes"][0]["failed"] == 2
+
+
+def test_circuit_opens_and_fails_fast():
+    collection = FaultyCollection(failures=[AutoReconnect("down")] * 1000)
+
+    async def hammer():
+        for _ in range(database.CIRCUIT_MIN_CALLS):
+            with pytest.raises(DatabaseError):
+                await safe_find_one(collection, {"_id": 1})
+
+    asyncio.run(hammer())
+    assert database_breaker.state == CircuitBreaker.OPEN
+
+    calls_before = collection.calls["find_one"]
+    with pytest.raises(DatabaseError) as exc_info:
+        asyncio.run(safe_find_one(collection, {"_id": 1}))
+
+    assert collection.calls["find_one"] == calls_before
+    assert exc_info.value.details["circuit"] == CircuitBreaker.OPEN
+
+
+def test_circuit_half_open_probe_closes_on_success():
+    now = [0.0]
+    breaker = CircuitBreaker(min_calls=2, window_size=4, cooldown_seconds=10, clock=lambda: now[0])
+
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(DatabaseError):
+        breaker.before_call()
+
+    now[0] = 11.0
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Only one probe at a time
+    with pytest.raises(DatabaseError):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before_call()
+
+
+def test_circuit_half_open_probe_failure_reopens():
+    now = [0.0]
+    breaker = CircuitBreaker(min_calls=1, window_size=2, cooldown_seconds=5, clock=lambda: now[0])
+
+    breaker.record_failure()
+    now[0] = 6.0
+    breaker.before_call()
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(DatabaseError):
+        breaker.before_call()
+
+
+def test_cancelled_probe_releases_half_open_circuit():
+    collection = FaultyCollection(delay=5.0)
+    database_breaker._open()
+    database_breaker._opened_at -= database_breaker.cooldown_seconds + 1
+
+    async def cancel_probe():
+        probe = asyncio.create_task(safe_find_one(collection, {"_id": 1}))
+        await asyncio.sleep(0.01)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+    asyncio.run(cancel_probe())
+    assert database_breaker.state == CircuitBreaker.HALF_OPEN
+
+    # The next call probes instead of being rejected as "circuit open"
+    collection.delay = 0.0
+    assert asyncio.run(safe_find_one(collection, {"_id": 1}))["name"] == "Netflix"
+    assert database_breaker.state == CircuitBreaker.CLOSED
@@ -0,0 +1,62 @@
+"""Tests for duplicate detection on import and the one-off dedupe migration."""
+
+import asyncio
+
+import httpx
+import mongomock_motor
+from pymongo import ASCENDING, IndexModel
+
+from utils.constants import DEFAULT_USER_ID, TENANT_FIELD
+from utils.dedupe import content_hash
+from utils.indexes import ensure_indexes
+from utils.migrations import run_migrations
+
+NETFLIX = {
+    "name": "Netflix", "category": "Streaming", "amount_cents": 1299, "billing_cycle": "MONTHLY",
+    "start_date": "2024-01-15"
+}
+
+
+def test_identical_entries_can_be_created_but_are_skipped_on_import(server, api_db):
+    async def scenario():
+        await ensure_indexes(api_db)
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            created = [(await client.post("/api/subscriptions", json=NETFLIX)).status_code for _ in range(2)]
+        # Case and spacing do not make an entry different
+        renamed = {**NETFLIX, "name": " NETFLIX "}
+        imported = await server._import_data(server.ImportData(subscriptions=[dict(NETFLIX), renamed], merge=True))
+        return created, imported, await api_db.subscriptions.count_documents({})
+
+    created, imported, stored = asyncio.run(scenario())
+    assert created == [200, 200]
+    assert imported["subscriptions_imported"] == 0
+    assert imported["duplicates_skipped"] == 2
+    assert stored == 2
+
+
+def test_dedupe_backfill_runs_once_and_unique_hash_index_is_replaced():
+    async def scenario():
+        db = mongomock_motor.AsyncMongoMockClient()["test"]
+        # Left behind by an earlier version that rejected identical entries
+        await db.subscriptions.create_indexes([IndexModel(
+            [(TENANT_FIELD, ASCENDING), ("content_hash", ASCENDING)], name="tenant_content_hash", unique=True
+        )])
+        await ensure_indexes(db)
+        await db.subscriptions.insert_many([{TENANT_FIELD: DEFAULT_USER_ID, **NETFLIX} for _ in range(2)])
+        first = await run_migrations(db)
+        stored = await db.subscriptions.find({}).to_list(None)
+        await db.subscriptions.insert_one({TENANT_FIELD: DEFAULT_USER_ID, **NETFLIX, "name": "Später"})
+        second = await run_migrations(db)
+        later = await db.subscriptions.find_one({"name": "Später"})
+        index = (await db.subscriptions.index_information())["tenant_content_hash"]
+        return first, second, stored, later, index
+
+    first, second, stored, later, index = asyncio.run(scenario())
+    assert first == ["dedupe_fields"]
+    assert second == []
+    assert [doc["content_hash"] for doc in stored] == [content_hash(NETFLIX, "EUR")] * 2
+    assert all(doc["name_key"] == "netflix" for doc in stored)
+    # Not scanned again on the next start
+    assert "name_key" not in later
+    assert not index.get("unique")
@@ -0,0 +1,121 @@
+"""Tests for live change events and resuming the change stream."""
+
+import asyncio
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import AutoReconnect, OperationFailure
+
+from utils import events
+from utils.constants import TENANT_FIELD
+from utils.events import ChangeEventBroker, to_change_event
+
+
+def _insert(user_id: str, token: int) -> dict:
+    return {
+        "_id": {"_data": str(token)},
+        "operationType": "insert",
+        "ns": {"coll": "subscriptions"},
+        "documentKey": {"_id": ObjectId()},
+        "fullDocument": {TENANT_FIELD: user_id, "name": f"Eintrag {token}"},
+    }
+
+
+class FakeStream:
+    def __init__(self, changes, error):
+        self._changes = list(changes)
+        self._error = error
+        self.resume_token = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._changes:
+            change = self._changes.pop(0)
+            self.resume_token = change["_id"]
+            return change
+        if self._error is not None:
+            raise self._error
+        await asyncio.Event().wait()
+
+
+class FakeDatabase:
+    """Serves one scripted stream per watch() call and records the options."""
+
+    def __init__(self, scripts):
+        self._scripts = list(scripts)
+        self.calls = []
+        self.done = asyncio.Event()
+
+    def watch(self, pipeline, **options):
+        self.calls.append(options)
+        changes, error = self._scripts.pop(0)
+        if not self._scripts:
+            self.done.set()
+        return FakeStream(changes, error)
+
+
+def _drain(queue) -> list:
+    items = []
+    while not queue.empty():
+        items.append(queue.get_nowait())
+    return items
+
+
+def _run(monkeypatch, scripts):
+    sleep = asyncio.sleep
+    monkeypatch.setattr(events.asyncio, "sleep", lambda delay: sleep(0))
+
+    async def scenario():
+        db = FakeDatabase(scripts)
+        broker = ChangeEventBroker(db)
+        alice, bob = broker.subscribe("alice"), broker.subscribe("bob")
+        await db.done.wait()
+        for _ in range(5):
+            await sleep(0)
+        await broker.close()
+        return db.calls, _drain(alice), _drain(bob)
+
+    return asyncio.run(scenario())
+
+
+def test_reconnect_resumes_after_the_last_event_without_resync(monkeypatch):
+    calls, alice, bob = _run(monkeypatch, [
+        ([_insert("alice", 1), _insert("bob", 2)], AutoReconnect("primary stepped down")),
+        ([_insert("alice", 3)], None),
+    ])
+    assert "resume_after" not in calls[0]
+    assert calls[1]["resume_after"] == {"_data": "2"}
+    assert [event["fields"]["name"] for event in alice] == ["Eintrag 1", "Eintrag 3"]
+    assert [event["op"] for event in bob] == ["insert"]
+
+
+def test_lost_position_starts_over_and_asks_clients_to_resync(monkeypatch):
+    calls, alice, _ = _run(monkeypatch, [
+        ([_insert("alice", 1)], AutoReconnect("network")),
+        ([], OperationFailure("resume point no longer in the oplog", code=286)),
+        ([_insert("alice", 2)], None),
+    ])
+    assert calls[1]["resume_after"] == {"_data": "1"}
+    assert "resume_after" not in calls[2]
+    assert [event["op"] for event in alice] == ["insert", "resync", "insert"]
+
+
+@pytest.mark.parametrize("change, expected", [
+    (
+        {"operationType": "update", "ns": {"coll": "expenses"}, "documentKey": {"_id": "x"},
+         "updateDescription": {"updatedFields": {"amount_cents": 500}, "removedFields": ["notes"]}},
+        {"collection": "expenses", "op": "update", "id": "x", "fields": {"amount_cents": 500, "notes": None}},
+    ),
+    ({"operationType": "drop", "ns": {"coll": "subscriptions"}}, {"collection": "subscriptions", "op": "resync"}),
+    ({"operationType": "invalidate", "ns": {"coll": "subscriptions"}}, None),
+])
+def test_changes_are_reduced_to_compact_events(change, expected):
+    assert to_change_event(change) == expected
@@ -0,0 +1,49 @@
+"""Tests for eviction of cached export files."""
+
+import asyncio
+import os
+import time
+
+from utils.export_cache import ExportCache
+
+
+def _build(data: bytes):
+    async def build():
+        return data
+    return build
+
+
+def test_superseded_versions_are_deleted_only_after_the_grace_period(tmp_path):
+    cache = ExportCache(tmp_path, grace_seconds=60)
+
+    async def scenario():
+        first = await cache.get("alice", 1, "export.json", _build(b"v1"))
+        # A response for version 1 may not have opened the file yet
+        second = await cache.get("alice", 2, "export.json", _build(b"v2"))
+        kept = first.exists()
+        past = time.time() - 120
+        os.utime(first, (past, past))
+        os.utime(second, (past, past))
+        third = await cache.get("alice", 3, "export.json", _build(b"v3"))
+        return kept, first.exists(), second.exists(), third.read_bytes()
+
+    kept, first_left, second_left, latest = asyncio.run(scenario())
+    assert kept
+    assert not first_left and not second_left
+    assert latest == b"v3"
+
+
+def test_size_limit_spares_recently_served_files(tmp_path):
+    cache = ExportCache(tmp_path, max_bytes=4, grace_seconds=60)
+
+    async def scenario():
+        old = await cache.get("alice", 1, "export.json", _build(b"aaaa"))
+        past = time.time() - 120
+        os.utime(old, (past, past))
+        served = await cache.get("bob", 1, "export.json", _build(b"bbbb"))
+        await cache.get("carol", 1, "export.json", _build(b"cccc"))
+        return old.exists(), served.exists()
+
+    old_left, served_left = asyncio.run(scenario())
+    assert not old_left
+    assert served_left
@@ -0,0 +1,43 @@
+"""Tests for replaying responses of requests retried with an Idempotency-Key."""
+
+import asyncio
+
+import httpx
+import mongomock_motor
+
+from utils.idempotency import REPLAY_HEADER
+
+
+def test_background_import_replays_status_body_and_location(monkeypatch, server):
+    class QueueingJobs:
+        def __init__(self):
+            self.submitted = 0
+
+        async def submit(self, job_type, params=None, payload=None):
+            self.submitted += 1
+            return {"id": f"job-{self.submitted}", "type": job_type, "status": "queued"}
+
+    jobs = QueueingJobs()
+    monkeypatch.setattr(server, "db", mongomock_motor.AsyncMongoMockClient()["test"])
+    monkeypatch.setattr(server, "job_manager", jobs)
+
+    async def run():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return [
+                await client.post(
+                    "/api/import/json",
+                    params={"background": "true"},
+                    json={"subscriptions": [], "expenses": []},
+                    headers={"Idempotency-Key": "import-1"}
+                )
+                for _ in range(2)
+            ]
+
+    first, replay = asyncio.run(run())
+    assert jobs.submitted == 1
+    assert first.status_code == replay.status_code == 202
+    assert replay.headers["location"] == first.headers["location"] == "/api/jobs/job-1"
+    assert replay.json() == first.json()
+    assert replay.headers[REPLAY_HEADER] == "true"
+    assert REPLAY_HEADER not in first.headers
@@ -0,0 +1,45 @@
+"""Tests for background jobs that run longer than their lease."""
+
+import asyncio
+from datetime import datetime
+
+import mongomock_motor
+
+from utils import jobs
+from utils.jobs import JobManager, JobStatus
+
+
+def test_heartbeat_keeps_lease_of_long_job_and_picks_up_cancellation(monkeypatch, tmp_path):
+    monkeypatch.setattr(jobs, "JOB_HEARTBEAT_SECONDS", 0.02)
+
+    async def scenario():
+        collection = mongomock_motor.AsyncMongoMockClient()["test"]["jobs"]
+        manager = JobManager(collection, tmp_path)
+        started = asyncio.Event()
+
+        async def slow_handler(params, ctx):
+            # Never reports progress, like the export, reset and seed handlers
+            started.set()
+            await asyncio.sleep(10)
+
+        manager.register("slow", slow_handler)
+        await manager.start()
+        job = await manager.submit("slow")
+        await started.wait()
+        leased = (await collection.find_one({"_id": job["id"]}))["lease_until"]
+        await asyncio.sleep(0.1)
+        renewed = (await collection.find_one({"_id": job["id"]}))["lease_until"]
+
+        # Cancellation requested by another process
+        await collection.update_one({"_id": job["id"]}, {"$set": {"cancel_requested": True}})
+        for _ in range(50):
+            stored = await collection.find_one({"_id": job["id"]})
+            if stored["status"] != JobStatus.RUNNING:
+                break
+            await asyncio.sleep(0.02)
+        await manager.close()
+        return leased, renewed, stored
+
+    leased, renewed, stored = asyncio.run(scenario())
+    assert renewed > leased > datetime.utcnow()
+    assert stored["status"] == JobStatus.CANCELLED
@@ -0,0 +1,149 @@
+"""Tests for renewal reminders and their delivery through the outbox."""
+
+import asyncio
+import json
+import threading
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import mongomock_motor
+import pytest
+
+from utils.constants import NOTIFICATION_MAX_ATTEMPTS
+from utils.notifications import (
+    NotificationDispatcher,
+    OutboxStatus,
+    WebhookSink,
+    due_notifications,
+    next_renewal,
+    retry_delay,
+)
+
+
+class PushStandIn:
+    """Local HTTP server answering like a push API, one scripted status per request."""
+
+    def __init__(self, statuses=None, reject=()):
+        self.statuses = list(statuses or [])
+        self.reject = set(reject)
+        self.batches = []
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                stand_in.batches.append(body)
+                status = stand_in.statuses.pop(0) if stand_in.statuses else 200
+                tickets = [
+                    {"status": "error", "message": "DeviceNotRegistered"}
+                    if message["data"]["subscription_id"] in stand_in.reject else {"status": "ok"}
+                    for message in body
+                ]
+                payload = json.dumps({"data": tickets}).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = HTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/push"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _subscription(sub_id, start_date, cycle="MONTHLY"):
+    return {"_id": sub_id, "name": f"Abo {sub_id}", "start_date": start_date,
+            "billing_cycle": cycle, "amount_cents": 999}
+
+
+def test_renewal_on_31st_is_clamped_to_month_end():
+    assert next_renewal(date(2024, 1, 31), "MONTHLY", date(2025, 2, 20)) == date(2025, 2, 28)
+    assert next_renewal(date(2024, 1, 31), "MONTHLY", date(2025, 4, 29)) == date(2025, 4, 30)
+    assert next_renewal(date(2024, 1, 31), "MONTHLY", date(2025, 4, 30)) == date(2025, 5, 31)
+    assert next_renewal(date(2024, 2, 29), "YEARLY", date(2025, 1, 1)) == date(2025, 2, 28)
+
+
+def test_due_notifications_respect_overrides():
+    today = date(2025, 2, 25)
+    subscriptions = [
+        _subscription("a", "2024-01-31"),  # renews 28 Feb, 3 days ahead
+        _subscription("b", "2024-01-31"),
+        _subscription("c", "2024-01-31"),
+    ]
+    overrides = {
+        "b": {"enabled": False},
+        "c": {"days_before": [1], "custom_message": "Kündigen?"},
+    }
+
+    assert [n["subscription_id"] for n in due_notifications(subscriptions, [3], overrides, today)] == ["a"]
+
+    tomorrow = due_notifications(subscriptions, [3], overrides, today + timedelta(days=2))
+    assert [(n["subscription_id"], n["message"]) for n in tomorrow] == [("c", "Kündigen?")]
+
+
+def test_webhook_sink_reports_per_message_results():
+    with PushStandIn(reject={"b"}) as stand_in:
+        sink = WebhookSink(stand_in.url)
+        messages = [{"id": i, "data": {"subscription_id": i}} for i in ("a", "b")]
+
+        errors = asyncio.run(sink.send(messages))
+
+    assert errors == [None, "DeviceNotRegistered"]
+    assert len(stand_in.batches) == 1
+
+
+def test_webhook_sink_raises_on_server_error():
+    with PushStandIn(statuses=[503]) as stand_in:
+        with pytest.raises(RuntimeError):
+            asyncio.run(WebhookSink(stand_in.url).send([{"id": "a", "data": {"subscription_id": "a"}}]))
+
+
+def test_retry_delay_grows_exponentially_and_is_capped():
+    assert retry_delay(2) == 2 * retry_delay(1)
+    assert retry_delay(50) == retry_delay(60)
+
+
+def test_dispatcher_dedupes_batches_and_retries():
+    async def scenario(stand_in):
+        db = mongomock_motor.AsyncMongoMockClient()["test"]
+        await db.subscriptions.insert_many([
+            {**_subscription(f"s{i}", "2024-01-31"), "user_id": "u1"} for i in range(3)
+        ])
+        await db.settings.insert_one({"user_id": "u1", "type": "app_settings",
+                                      "notification_days_before": [3], "notification_time": "00:00"})
+        dispatcher = NotificationDispatcher(db, WebhookSink(stand_in.url))
+        today = date(2025, 2, 25)
+
+        assert await dispatcher.materialize(today) == 3
+        # A second process materializing the same day adds nothing
+        await db.notification_state.delete_many({})
+        assert await dispatcher.materialize(today) == 0
+
+        now = datetime(2025, 2, 25, 12)
+        assert await dispatcher.deliver_batch(now) == 3  # HTTP 500: whole batch fails
+        assert await dispatcher.deliver_batch(now) == 0  # backing off
+        later = now + timedelta(seconds=retry_delay(1))
+        assert await dispatcher.deliver_batch(later) == 3
+
+        entries = {e["notification"]["subscription_id"]: e for e in await db.notification_outbox.find().to_list(None)}
+        return entries
+
+    with PushStandIn(statuses=[500], reject={"s2"}) as stand_in:
+        entries = asyncio.run(scenario(stand_in))
+
+    assert len(stand_in.batches) == 2
+    assert entries["s0"]["status"] == OutboxStatus.SENT
+    assert [attempt["ok"] for attempt in entries["s0"]["history"]] == [False, True]
+    assert entries["s2"]["status"] == OutboxStatus.PENDING
+    assert entries["s2"]["attempts"] == 2 < NOTIFICATION_MAX_ATTEMPTS
@@ -0,0 +1,84 @@
+"""Tests for the removal of notification settings whose subscription is gone."""
+
+import asyncio
+
+import httpx
+import mongomock_motor
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from utils import orphans
+from utils.constants import DEFAULT_USER_ID, TENANT_FIELD
+from utils.database import safe_delete_many
+
+
+def _evaluate(db):
+    """
+    Stand-in for safe_aggregate running ``_orphan_pipeline``.
+
+    mongomock cannot run ``$lookup`` with ``let``, so the window stages
+    are read from the pipeline and the lookup is done here the same way.
+    """
+    async def aggregate(collection, pipeline, resource_name="Resource", timeout_ms=None):
+        match, sort, limit, lookup = pipeline[0]["$match"], pipeline[1]["$sort"], pipeline[2]["$limit"], pipeline[3]
+        assert sort == {"_id": 1} and "$lookup" in lookup
+        window = await collection.find(match).sort("_id", 1).limit(limit).to_list(None)
+        results = []
+        for doc in window:
+            try:
+                subscription_id = ObjectId(doc["subscription_id"])
+            except (InvalidId, TypeError):
+                subscription_id = None
+            owner_match = await db.subscriptions.find_one({"_id": subscription_id, TENANT_FIELD: doc[TENANT_FIELD]})
+            results.append({"_id": doc["_id"], "orphan": owner_match is None})
+        return results
+
+    return aggregate
+
+
+def test_sweep_removes_settings_without_a_subscription_of_the_same_owner(monkeypatch):
+    async def scenario():
+        db = mongomock_motor.AsyncMongoMockClient()["test"]
+        monkeypatch.setattr(orphans, "safe_aggregate", _evaluate(db))
+        alive = str((await db.subscriptions.insert_one({TENANT_FIELD: "alice", "name": "Netflix"})).inserted_id)
+        await db.notification_settings.insert_many([
+            {TENANT_FIELD: "alice", "subscription_id": alive, "label": "kept"},
+            # Same id, other owner: not the subscription it refers to
+            {TENANT_FIELD: "bob", "subscription_id": alive, "label": "other owner"},
+            {TENANT_FIELD: "alice", "subscription_id": str(ObjectId()), "label": "deleted"},
+            {TENANT_FIELD: "alice", "subscription_id": "kaputt", "label": "malformed"},
+            {TENANT_FIELD: "alice", "subscription_id": alive, "label": "kept too"},
+        ])
+        # Windows of two documents: the sweep has to page through all of them
+        removed = await orphans.sweep_orphaned_notification_settings(db, batch_size=2)
+        left = await db.notification_settings.find({}).to_list(None)
+        return removed, sorted(doc["label"] for doc in left)
+
+    removed, left = asyncio.run(scenario())
+    assert removed == 3
+    assert left == ["kept", "kept too"]
+
+
+def test_failed_cascade_does_not_fail_the_delete(monkeypatch, server, api_db):
+    async def failing(*args, **kwargs):
+        if args and args[0].name == "notification_settings":
+            raise server.DatabaseError("Fehler beim Löschen von Benachrichtigungseinstellungen")
+        return await safe_delete_many(*args, **kwargs)
+
+    async def scenario():
+        doc_id = (await api_db.subscriptions.insert_one({
+            TENANT_FIELD: DEFAULT_USER_ID, "name": "Netflix", "category": "Streaming",
+            "amount_cents": 1299, "billing_cycle": "MONTHLY", "start_date": "2024-01-15"
+        })).inserted_id
+        await api_db.notification_settings.insert_one({TENANT_FIELD: DEFAULT_USER_ID, "subscription_id": str(doc_id)})
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.delete(f"/api/subscriptions/{doc_id}")
+        return response, await api_db.subscriptions.count_documents({}), await api_db.notification_settings.count_documents({})
+
+    monkeypatch.setattr(server, "safe_delete_many", failing)
+    response, subscriptions, settings = asyncio.run(scenario())
+    assert response.status_code == 200
+    assert subscriptions == 0
+    # Left for the sweeper
+    assert settings == 1
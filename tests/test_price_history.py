@@ -0,0 +1,53 @@
+"""Tests for price history stored in monthly buckets."""
+
+import asyncio
+from datetime import datetime
+
+import mongomock_motor
+
+from utils.constants import DEFAULT_USER_ID
+from utils.price_history import (
+    find_price_increases,
+    get_price_history,
+    months_back,
+    record_price_change,
+)
+from utils.tenancy import user_scope
+
+
+def test_months_back_crosses_year_boundaries():
+    assert months_back(datetime(2024, 1, 15), 1) == datetime(2023, 12, 1)
+    assert months_back(datetime(2024, 3, 31), 14) == datetime(2023, 1, 1)
+    assert months_back(datetime(2024, 3, 1), 0) == datetime(2024, 3, 1)
+
+
+def test_changes_share_a_bucket_per_month_and_increases_use_the_window():
+    now = datetime.utcnow()
+    this_month, last_month, long_ago = months_back(now, 0), months_back(now, 1), months_back(now, 24)
+
+    async def scenario():
+        db = mongomock_motor.AsyncMongoMockClient()["test"]
+        with user_scope(DEFAULT_USER_ID):
+            # A rise long ago does not count, the recent ones do
+            await record_price_change(db, "netflix", None, 999, at=long_ago)
+            await record_price_change(db, "netflix", 999, 1299, at=long_ago.replace(day=2))
+            await record_price_change(db, "netflix", 1299, 1499, at=last_month.replace(day=3))
+            await record_price_change(db, "netflix", 1499, 1799, at=this_month)
+            # Cheaper now: no increase to report
+            await record_price_change(db, "spotify", None, 999, at=last_month)
+            await record_price_change(db, "spotify", 999, 899, at=this_month)
+            buckets = await db.price_history.find({"subscription_id": "netflix"}).sort("bucket", 1).to_list(None)
+            history = await get_price_history(db, "netflix")
+            increases = await find_price_increases(db, 6)
+        return buckets, history, increases
+
+    buckets, history, increases = asyncio.run(scenario())
+    assert [(bucket["bucket"], bucket["count"], bucket["rises"]) for bucket in buckets] == [
+        (long_ago, 2, 1), (last_month, 1, 1), (this_month, 1, 1)
+    ]
+    assert [point["new_cents"] for point in history] == [999, 1299, 1499, 1799]
+    assert len(increases) == 1
+    increase = increases[0]
+    assert (increase["subscription_id"], increase["old_cents"], increase["new_cents"]) == ("netflix", 1299, 1799)
+    assert increase["change_percent"] == round(500 * 100 / 1299, 2)
+    assert increase["changed_at"] == this_month.isoformat()
@@ -0,0 +1,29 @@
+"""Tests for the client key of rate limits behind reverse proxies."""
+
+import pytest
+
+from utils.ratelimit import client_address, parse_networks
+
+PROXIES = parse_networks("10.0.0.0/8, 127.0.0.1")
+
+
+@pytest.mark.parametrize("peer, forwarded_for, expected", [
+    # Direct connections are keyed by their address, whatever they send
+    ("203.0.113.7", None, "203.0.113.7"),
+    ("203.0.113.7", "198.51.100.1", "203.0.113.7"),
+    # Behind the proxy the forwarded client counts
+    ("10.0.0.2", "198.51.100.1", "198.51.100.1"),
+    # Chained proxies are skipped, a spoofed left-most entry is not believed
+    ("10.0.0.2", "1.2.3.4, 198.51.100.1, 10.0.0.9", "198.51.100.1"),
+    ("127.0.0.1", "garbage, 198.51.100.1", "198.51.100.1"),
+    # Only proxies in the chain: the left-most hop
+    ("10.0.0.2", "10.0.0.5", "10.0.0.5"),
+    ("10.0.0.2", "", "10.0.0.2"),
+    (None, "198.51.100.1", "unknown"),
+])
+def test_forwarded_address_is_believed_only_from_trusted_proxies(peer, forwarded_for, expected):
+    assert client_address(peer, forwarded_for, PROXIES) == expected
+
+
+def test_nothing_is_trusted_without_configuration():
+    assert client_address("10.0.0.2", "198.51.100.1", parse_networks("")) == "10.0.0.2"
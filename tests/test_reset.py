@@ -0,0 +1,74 @@
+"""Tests for the factory reset by collection rename against the per-document delete."""
+
+import asyncio
+from datetime import datetime
+
+import mongomock_motor
+
+from utils.constants import DEFAULT_USER_ID, TENANT_FIELD, TRASH_PREFIX
+from utils.indexes import ensure_indexes
+
+
+async def _populate(db, collections):
+    await ensure_indexes(db)
+    for name in collections:
+        await db[name].insert_many([
+            # Distinct values for every unique per-user index
+            {
+                TENANT_FIELD: DEFAULT_USER_ID, "name": f"{name} {i}", "created_at": datetime(2024, 1, 1),
+                "subscription_id": str(i), "bucket": i, "day": datetime(2024, 1, i + 1), "category": str(i)
+            }
+            for i in range(3)
+        ])
+    await db.settings.insert_one({TENANT_FIELD: DEFAULT_USER_ID, "type": "app_settings", "currency": "USD"})
+
+
+async def _state(db, collections):
+    state = {}
+    for name in [*collections, "settings"]:
+        docs = await db[name].find({}, {"_id": 0}).to_list(None)
+        state[name] = sorted(docs, key=lambda doc: sorted(doc.items()))
+        state[f"{name} indexes"] = sorted(await db[name].index_information())
+    return state
+
+
+def _reset(monkeypatch, server, api_db, fast):
+    pre_images = []
+
+    async def enable_pre_images():
+        pre_images.append(True)
+        return True
+
+    monkeypatch.setattr(server.change_broker, "enable_pre_images", enable_pre_images)
+    if not fast:
+        async def no_fast_reset(*args):
+            return False
+        monkeypatch.setattr(server, "fast_reset", no_fast_reset)
+
+    collections = list(server.RESET_COLLECTIONS)
+
+    async def scenario():
+        await _populate(api_db, collections)
+        result = await server._reset_all_data()
+        trash = [name for name in await api_db.list_collection_names() if name.startswith(TRASH_PREFIX)]
+        return result, await _state(api_db, collections), trash
+
+    result, state, trash = asyncio.run(scenario())
+    return result, state, trash, pre_images
+
+
+def test_fast_reset_leaves_the_same_data_and_indexes_as_the_slow_one(monkeypatch, server, api_db):
+    fast = _reset(monkeypatch, server, api_db, fast=True)
+    other_db = mongomock_motor.AsyncMongoMockClient()["other"]
+    monkeypatch.setattr(server, "db", other_db)
+    slow = _reset(monkeypatch, server, other_db, fast=False)
+
+    assert fast[0] == slow[0]
+    assert fast[1] == slow[1]
+    assert all(fast[1][name] == [] for name in server.RESET_COLLECTIONS)
+    assert "tenant_id" in fast[1]["subscriptions indexes"]
+    settings = fast[1]["settings"][0]
+    assert settings["currency"] == server.AppSettings().currency
+    # Only the fast path swaps collections and has to re-enable pre-images
+    assert len(fast[2]) == len(server.RESET_COLLECTIONS) and slow[2] == []
+    assert fast[3] == [True] and slow[3] == []
@@ -0,0 +1,63 @@
+"""Tests for the synthetic data generator."""
+
+import asyncio
+import calendar
+import random
+from datetime import date
+
+import mongomock_motor
+
+from utils.constants import TENANT_FIELD
+from utils.seeding import _start_date, generate_subscriptions, seed_data
+
+
+def _without_timestamps(docs):
+    return [{key: value for key, value in doc.items() if key not in ("_id", "created_at")} for doc in docs]
+
+
+def test_same_seed_generates_the_same_documents():
+    def generate(seed):
+        return _without_timestamps(generate_subscriptions(500, random.Random(seed), "EUR"))
+
+    assert generate(42) == generate(42)
+    assert generate(42) != generate(43)
+
+
+def test_month_end_start_dates_exist_and_are_not_in_the_future():
+    today = date(2024, 3, 1)
+    rng = random.Random(1)
+    recent_days = [today.isoformat()]
+    month_ends = []
+    for _ in range(20000):
+        start = date.fromisoformat(_start_date(rng, today, recent_days))
+        assert start <= today
+        if start.day >= 29:
+            month_ends.append(start)
+            assert start.day <= calendar.monthrange(start.year, start.month)[1]
+    assert {start.day for start in month_ends} == {29, 30, 31}
+    # The 29th of February only in leap years
+    february = [start for start in month_ends if start.month == 2]
+    assert february and all(calendar.isleap(start.year) and start.day == 29 for start in february)
+
+
+def test_seed_data_is_reproducible_and_owned_by_the_user():
+    async def seed(db, seed_value):
+        counts = await seed_data(db, "alice", 300, 100, seed=seed_value)
+        docs = await db.subscriptions.find({}).sort("_id", 1).to_list(None)
+        return counts, docs
+
+    async def scenario():
+        first_db = mongomock_motor.AsyncMongoMockClient()["first"]
+        second_db = mongomock_motor.AsyncMongoMockClient()["second"]
+        first = await seed(first_db, 7)
+        second = await seed(second_db, 7)
+        # Seeding the same data again without clearing adds nothing
+        again = await seed_data(first_db, "alice", 300, 100, seed=7, clear=False)
+        return first, second, again
+
+    (counts, docs), (_, other_docs), again = asyncio.run(scenario())
+    assert counts == {"subscriptions": 300, "expenses": 100}
+    assert {doc[TENANT_FIELD] for doc in docs} == {"alice"}
+    assert _without_timestamps(docs) == _without_timestamps(other_docs)
+    assert len({doc["content_hash"] for doc in docs}) == 300
+    assert again == {"subscriptions": 0, "expenses": 0}
@@ -0,0 +1,132 @@
+"""Load tests for request coalescing of expensive reads."""
+
+import asyncio
+
+import httpx
+import pytest
+
+from utils import currency
+from utils.singleflight import SingleFlight
+
+
+class CountingCollection:
+    """Fake collection that counts full scans and takes time to answer."""
+
+    def __init__(self, delay: float = 0.01):
+        self.delay = delay
+        self.queries = 0
+
+    async def find_all(self):
+        self.queries += 1
+        await asyncio.sleep(self.delay)
+        return [{"amount_cents": 100}, {"amount_cents": 250}]
+
+
+async def _burst(flight: SingleFlight, collection: CountingCollection, concurrency: int):
+    async def load():
+        docs = await collection.find_all()
+        return sum(doc["amount_cents"] for doc in docs)
+
+    return await asyncio.gather(*(flight.do("dashboard", load) for _ in range(concurrency)))
+
+
+@pytest.mark.parametrize("concurrency", [1, 10, 100, 1000])
+def test_query_count_stays_flat_as_concurrency_grows(concurrency):
+    collection = CountingCollection()
+    results = asyncio.run(_burst(SingleFlight(), collection, concurrency))
+
+    assert results == [350] * concurrency
+    assert collection.queries == 1
+
+
+def test_sequential_bursts_recompute_without_cache():
+    collection = CountingCollection()
+    flight = SingleFlight()
+
+    async def run():
+        await _burst(flight, collection, 50)
+        await _burst(flight, collection, 50)
+
+    asyncio.run(run())
+    assert collection.queries == 2
+
+
+def test_micro_cache_reuses_finished_result():
+    collection = CountingCollection()
+    flight = SingleFlight(cache_ttl=60)
+
+    async def run():
+        await _burst(flight, collection, 50)
+        await _burst(flight, collection, 50)
+        flight.forget("dashboard")
+        await _burst(flight, collection, 50)
+
+    asyncio.run(run())
+    assert collection.queries == 2
+
+
+def test_different_keys_are_not_coalesced():
+    collection = CountingCollection()
+    flight = SingleFlight()
+
+    async def run():
+        await asyncio.gather(
+            flight.do("a", collection.find_all),
+            flight.do("b", collection.find_all),
+        )
+
+    asyncio.run(run())
+    assert collection.queries == 2
+
+
+def test_error_is_shared_and_not_cached():
+    calls = 0
+
+    async def failing():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    flight = SingleFlight(cache_ttl=60)
+
+    async def run():
+        results = await asyncio.gather(
+            *(flight.do("x", failing) for _ in range(20)), return_exceptions=True
+        )
+        assert all(isinstance(r, RuntimeError) for r in results)
+        with pytest.raises(RuntimeError):
+            await flight.do("x", failing)
+
+    asyncio.run(run())
+    assert calls == 2
+
+
+def test_concurrent_dashboard_requests_issue_one_query(monkeypatch, server):
+    queries = {"find": 0, "find_one": 0}
+
+    async def counting_find(collection, *args, **kwargs):
+        queries["find"] += 1
+        await asyncio.sleep(0.05)
+        return [{"category": "Streaming", "amount_cents": 1200, "billing_cycle": "MONTHLY"}]
+
+    async def counting_find_one(collection, *args, **kwargs):
+        queries["find_one"] += 1
+        await asyncio.sleep(0.05)
+        return None
+
+    monkeypatch.setattr(server, "safe_find", counting_find)
+    monkeypatch.setattr(currency, "safe_find_one", counting_find_one)
+    monkeypatch.setattr(server, "columnar_store", None)
+    monkeypatch.setattr(server, "read_coalescer", SingleFlight())
+
+    async def run():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(client.get("/api/dashboard") for _ in range(30)))
+
+    responses = asyncio.run(run())
+    assert all(response.status_code == 200 for response in responses)
+    assert len({response.text for response in responses}) == 1
+    # Subscriptions and expenses once each, settings once, however many requests
+    assert queries == {"find": 2, "find_one": 1}
@@ -0,0 +1,114 @@
+"""Tests for the isolation of users' data from each other."""
+
+import asyncio
+
+import httpx
+import jwt
+import mongomock_motor
+import pytest
+
+from utils.constants import DEFAULT_USER_ID, TENANT_FIELD
+from utils.database import (
+    safe_delete_many,
+    safe_delete_one,
+    safe_find,
+    safe_find_one,
+    safe_find_one_and_update,
+    safe_insert_one,
+    safe_update_one,
+)
+from utils.errors import AuthenticationError, NotFoundError
+from utils.tenancy import resolve_user_id, user_scope
+
+SECRET = "test-secret"
+
+NETFLIX = {
+    "name": "Netflix", "category": "Streaming", "amount_cents": 1299, "billing_cycle": "MONTHLY", "start_date": "2024-01-15"
+}
+
+
+def _token(payload: dict, secret: str = SECRET) -> str:
+    return jwt.encode(payload, secret, algorithm="HS256")
+
+
+def test_token_resolves_to_its_subject():
+    assert resolve_user_id(f"Bearer {_token({'sub': 'alice'})}", SECRET) == "alice"
+    # Without a secret every request belongs to the single user
+    assert resolve_user_id(None, None) == DEFAULT_USER_ID
+
+
+@pytest.mark.parametrize("authorization", [
+    None,
+    "",
+    "Bearer",
+    f"Basic {_token({'sub': 'alice'})}",
+    "Bearer kein-token",
+    f"Bearer {_token({'sub': 'alice'}, secret='other-secret')}",
+    f"Bearer {_token({'name': 'alice'})}",
+    f"Bearer {_token({'sub': ''})}",
+])
+def test_missing_invalid_and_subjectless_tokens_are_rejected(authorization):
+    with pytest.raises(AuthenticationError):
+        resolve_user_id(authorization, SECRET)
+
+
+def test_wrappers_do_not_reach_other_users_documents():
+    async def scenario():
+        db = mongomock_motor.AsyncMongoMockClient()["test"]
+        with user_scope("alice"):
+            doc_id = await safe_insert_one(db.subscriptions, dict(NETFLIX))
+        stored = await db.subscriptions.find_one({})
+
+        with user_scope("bob"):
+            found = await safe_find_one(db.subscriptions, {"_id": stored["_id"]})
+            listed = await safe_find(db.subscriptions)
+            for write in (
+                lambda: safe_update_one(db.subscriptions, {"_id": stored["_id"]}, {"name": "Bob"}),
+                lambda: safe_find_one_and_update(db.subscriptions, {"_id": stored["_id"]}, {"name": "Bob"}),
+                lambda: safe_delete_one(db.subscriptions, {"_id": stored["_id"]}),
+            ):
+                with pytest.raises(NotFoundError):
+                    await write()
+            deleted = await safe_delete_many(db.subscriptions)
+            # A filter naming another owner is overridden, not merged
+            smuggled = await safe_find(db.subscriptions, {TENANT_FIELD: "alice"})
+
+        with user_scope("alice"):
+            own = await safe_find_one(db.subscriptions, {"_id": stored["_id"]})
+        return doc_id, stored, found, listed, deleted, smuggled, own
+
+    doc_id, stored, found, listed, deleted, smuggled, own = asyncio.run(scenario())
+    assert stored[TENANT_FIELD] == "alice" and str(stored["_id"]) == doc_id
+    assert found is None
+    assert listed == []
+    assert deleted == 0
+    assert smuggled == []
+    assert own["name"] == "Netflix"
+
+
+def _request(server, method, url, user=None, **kwargs):
+    headers = {"Authorization": f"Bearer {_token({'sub': user})}"} if user else {}
+
+    async def run():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.request(method, url, headers=headers, **kwargs)
+
+    return asyncio.run(run())
+
+
+def test_endpoints_do_not_reach_other_users_documents(monkeypatch, server, api_db):
+    monkeypatch.setattr(server, "AUTH_SECRET", SECRET)
+    created = _request(server, "POST", "/api/subscriptions", user="alice", json=NETFLIX)
+    assert created.status_code == 200
+    url = f"/api/subscriptions/{created.json()['id']}"
+
+    assert _request(server, "GET", "/api/subscriptions").status_code == 401
+    assert _request(server, "GET", url, user="bob").status_code == 404
+    assert _request(server, "PUT", url, user="bob", json={**NETFLIX, "name": "Bob"}).status_code == 404
+    assert _request(server, "DELETE", url, user="bob").status_code == 404
+    assert _request(server, "GET", "/api/subscriptions", user="bob").json() == []
+
+    own = _request(server, "GET", url, user="alice")
+    assert own.status_code == 200
+    assert own.json()["name"] == "Netflix"
@@ -0,0 +1,64 @@
+"""Tests for the downsampled spending trend."""
+
+import asyncio
+from datetime import date, datetime, timedelta
+
+import mongomock_motor
+import pytest
+
+from utils.constants import DEFAULT_USER_ID, TENANT_FIELD
+from utils.errors import ValidationError
+from utils.trends import choose_granularity, spending_trend
+
+
+async def _snapshots(db, start: date, end: date):
+    day = start
+    while day <= end:
+        cents = 1000 + day.toordinal() % 7 * 10
+        await db.spending_snapshots.insert_one({
+            TENANT_FIELD: DEFAULT_USER_ID,
+            "day": datetime.combine(day, datetime.min.time()),
+            "currency": "EUR",
+            "total_cents": cents,
+            "categories": [{"category": "Streaming", "monthly_cents": cents}],
+        })
+        day += timedelta(days=1)
+
+
+def _weeks(start: date, end: date):
+    async def scenario():
+        db = mongomock_motor.AsyncMongoMockClient()["test"]
+        await _snapshots(db, start, end)
+        return await spending_trend(db, start, end, "week")
+
+    return asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("start, end, expected", [
+    # 2020 has an ISO week 53 that runs into January 2021
+    (date(2020, 12, 28), date(2021, 1, 4), [("2020-W53", 7), ("2021-W01", 1)]),
+    # The last days of December 2024 already belong to week 1 of 2025
+    (date(2024, 12, 29), date(2025, 1, 5), [("2024-W52", 1), ("2025-W01", 7)]),
+    # And the first days of January 2027 to the last week of 2026
+    (date(2026, 12, 27), date(2027, 1, 4), [("2026-W52", 1), ("2026-W53", 7), ("2027-W01", 1)]),
+])
+def test_weeks_follow_iso_years_across_new_year(start, end, expected):
+    points = _weeks(start, end)
+    assert [(point["period"], point["days"]) for point in points] == expected
+    for point in points:
+        year, week = point["period"].split("-W")
+        monday = date.fromisocalendar(int(year), int(week), 1)
+        days = [monday + timedelta(days=i) for i in range(7)]
+        days = [day for day in days if start <= day <= end]
+        average = sum(1000 + day.toordinal() % 7 * 10 for day in days) // len(days)
+        assert point["total_cents"] == average == point["categories"]["Streaming"]
+
+
+def test_granularity_is_the_finest_that_fits():
+    assert choose_granularity(date(2024, 1, 1), date(2024, 12, 31), None) == "day"
+    assert choose_granularity(date(2020, 1, 1), date(2024, 12, 31), None) == "week"
+    assert choose_granularity(date(2000, 1, 1), date(2024, 12, 31), None) == "month"
+    with pytest.raises(ValidationError):
+        choose_granularity(date(2020, 1, 1), date(2024, 12, 31), "day")
+    with pytest.raises(ValidationError):
+        choose_granularity(date(2024, 1, 1), date(2024, 1, 31), "quarter")
@@ -0,0 +1,80 @@
+"""Tests for updates in one round trip with optimistic concurrency."""
+
+import asyncio
+
+import httpx
+
+from utils.constants import DEFAULT_USER_ID, TENANT_FIELD
+from utils.dedupe import content_hash
+
+NETFLIX = {
+    "name": "Netflix", "category": "Streaming", "amount_cents": 1299, "billing_cycle": "MONTHLY",
+    "start_date": "2024-01-15", "currency": "EUR"
+}
+
+
+def _request(server, method, url, **kwargs):
+    async def run():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.request(method, url, **kwargs)
+
+    return asyncio.run(run())
+
+
+def _count_reads(monkeypatch, server):
+    reads = []
+    original = server.safe_find_one_or_404
+
+    async def counting(*args, **kwargs):
+        reads.append(args[1])
+        return await original(*args, **kwargs)
+
+    monkeypatch.setattr(server, "safe_find_one_or_404", counting)
+    return reads
+
+
+def _insert(db, doc):
+    return asyncio.run(db.subscriptions.insert_one({TENANT_FIELD: DEFAULT_USER_ID, "version": 3, **doc})).inserted_id
+
+
+def test_edit_of_whole_entry_is_one_write(monkeypatch, server, api_db):
+    doc_id = _insert(api_db, {**NETFLIX, "content_hash": content_hash(NETFLIX, "EUR")})
+    reads = _count_reads(monkeypatch, server)
+    edited = {**NETFLIX, "amount_cents": 1499, "notes": "Preiserhöhung"}
+
+    response = _request(server, "PUT", f"/api/subscriptions/{doc_id}", json=edited)
+
+    assert response.status_code == 200
+    assert reads == []
+    assert response.json()["amount_cents"] == 1499
+    assert response.headers["etag"] == '"4"'
+    stored = asyncio.run(api_db.subscriptions.find_one({"_id": doc_id}))
+    assert stored["content_hash"] == content_hash(edited, "EUR")
+    assert stored["version"] == 4
+    # The previous amount came back from the update itself
+    history = asyncio.run(api_db.price_history.find_one({}))
+    assert history is not None
+
+
+def test_partial_edit_of_hashed_field_hashes_the_merged_entry(monkeypatch, server, api_db):
+    doc_id = _insert(api_db, {**NETFLIX, "content_hash": content_hash(NETFLIX, "EUR")})
+    reads = _count_reads(monkeypatch, server)
+
+    response = _request(server, "PUT", f"/api/subscriptions/{doc_id}", json={"amount_cents": 1499})
+
+    assert response.status_code == 200
+    assert len(reads) == 1
+    stored = asyncio.run(api_db.subscriptions.find_one({"_id": doc_id}))
+    assert stored["content_hash"] == content_hash({**NETFLIX, "amount_cents": 1499}, "EUR")
+
+
+def test_stale_if_match_is_rejected_with_409(server, api_db):
+    doc_id = _insert(api_db, NETFLIX)
+
+    stale = _request(server, "PUT", f"/api/subscriptions/{doc_id}", json={"notes": "a"}, headers={"If-Match": '"2"'})
+    current = _request(server, "PUT", f"/api/subscriptions/{doc_id}", json={"notes": "b"}, headers={"If-Match": '"3"'})
+
+    assert stale.status_code == 409
+    assert current.status_code == 200
+    assert asyncio.run(api_db.subscriptions.find_one({"_id": doc_id}))["notes"] == "b"